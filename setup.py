@@ -8,6 +8,8 @@ setup(
     ext_modules = cythonize([
         "src/components.pyx"
         , "src/branching.pyx"
+        , "src/restarts.pyx"
+        , "src/sls.pyx"
         , "src/cdcl.pyx"
         ])
 )
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+from multiprocessing.connection import wait
+
+from cache import ResultCache, MAX_BYTES
+from cdcl import CDCL
+from dimacs import DimacsReader
+
+POLL_INTERVAL = 0.05 # seconds between checks for new paths while workers are busy
+KILL_GRACE = 1.0 # seconds a solver past its timeout gets to give up by itself, before it is killed
+
+# workers must not be forked from this process: the thread reading paths from stdin may
+# hold the lock of sys.stdin, which the child would then block on when closing it
+CTX = mp.get_context('forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn')
+
+
+def parseArg():
+    """
+    CMD argument parsing
+    :return: the parser
+    """
+    parser = argparse.ArgumentParser(description='Solve many CNF files on a pool of worker processes')
+    parser.add_argument('paths', nargs='*', help="CNF files or directories, '-' reads paths from stdin")
+    parser.add_argument('--manifest', action='append', default=[], help='file listing one CNF path per line')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count())
+    parser.add_argument('--timeout', type=float, default=None, help='seconds allowed per instance')
+    parser.add_argument('--models', action='store_true', help='include the model of sat instances')
+    parser.add_argument('--cache', metavar='FILE', help='reuse and record the results in this store')
+    parser.add_argument('--cache-size', type=float, default=MAX_BYTES / 2**20, metavar='MB',
+                        help='evict the least recently used results past this size')
+    parser.add_argument('--cache-rename', action='store_true',
+                        help='also recognize formulas whose variables were renamed')
+    return parser
+
+
+def read_manifest(f):
+    """Yield the paths listed in manifest f, relative to its directory"""
+    base = os.path.dirname(f)
+    with open(f) as lines:
+        for line in lines:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield os.path.join(base, line)
+
+
+def expand(paths, manifests):
+    """Yield the CNF files to solve, in order"""
+    for f in manifests:
+        yield from read_manifest(f)
+    if len(paths) == 0 and len(manifests) == 0:
+        paths = ['-']
+    for p in paths:
+        if p == '-':
+            for line in sys.stdin:
+                line = line.strip()
+                if line:
+                    yield line
+        elif os.path.isdir(p):
+            for root, dirs, files in os.walk(p):
+                dirs.sort()
+                for f in sorted(files):
+                    yield os.path.join(root, f)
+        else:
+            yield p
+
+
+def solve_one(path, models, timeout=None, log_file=os.devnull, cache=None):
+    """
+    Solve the CNF file at path, giving up after timeout seconds of search, and describe the outcome as a dict.
+    With cache, a ResultCache, the result of a formula solved before is reused, and new results are recorded.
+    """
+    start = time.perf_counter()
+    try:
+        reader = DimacsReader(path)
+        nss = reader
+        if cache is not None:
+            f = cache.formula(reader)
+            hit = cache.get(f)
+            if hit is not None:
+                res = dict(path=path, result="sat" if hit[0] else "unsat", time=time.perf_counter() - start, cached=True)
+                if models and hit[0]:
+                    res["model"] = hit[1]
+                return res
+            nss = f.clauses # the same models, without reading the file again
+        cnf = CDCL(reader.n_vars, nss, log_file, solve=False, simplify=True) # as main.py does by default
+        sat = cnf.solve(max_time=timeout)
+        if cache is not None and sat is not None:
+            cache.put(f, sat, [int(n) for n in str(cnf.m).split()] if sat else None)
+    except Exception as e:
+        return dict(path=path, result="error", error="{}: {}".format(type(e).__name__, e))
+    if sat is None:
+        s = cnf.stats
+        return dict(path=path, result="timeout", time=time.perf_counter() - start,
+                    conflicts=s.conflicts, decisions=s.decisions, propagations=s.propagations)
+    res = dict(path=path, result="sat" if sat else "unsat", time=time.perf_counter() - start)
+    if models and cnf.sat:
+        res["model"] = [int(n) for n in str(cnf.m).split()]
+    return res
+
+
+def serve(conn, models, cache):
+    """Worker loop: solve each (path, timeout) received on conn until None arrives"""
+    while True:
+        job = conn.recv()
+        if job is None:
+            if cache is not None:
+                cache.close()
+            return
+        path, timeout = job
+        conn.send(solve_one(path, models, timeout, cache=cache))
+
+
+class Worker:
+    """A long-lived solver process, replaced only when it has to be killed"""
+
+    def __init__(self, models, cache):
+        self.conn, child = CTX.Pipe()
+        self.proc = CTX.Process(target=serve, args=(child, models, cache), daemon=True)
+        self.proc.start()
+        child.close()
+        self.path = None
+        self.deadline = None
+
+    def submit(self, path, timeout):
+        self.path = path
+        # the solver gives up by itself, unless it is stuck before the search
+        self.deadline = None if timeout is None else time.monotonic() + timeout + KILL_GRACE
+        self.conn.send( (path, timeout) )
+
+    def stop(self):
+        self.conn.send(None)
+        self.proc.join()
+
+    def kill(self):
+        self.proc.kill()
+        self.proc.join()
+        self.conn.close()
+
+
+def feed(paths, pending):
+    for p in paths:
+        pending.put(p)
+    pending.put(None)
+
+
+def solve_all(paths, jobs=1, timeout=None, models=False, cache=None):
+    """
+    Solve every CNF file in paths (any iterable, consumed lazily) on jobs worker processes.
+    Yield one result dict per file, in the order in which they complete.
+    cache, a ResultCache, is shared by the workers.
+    """
+    if CTX.get_start_method() == 'forkserver':
+        CTX.set_forkserver_preload(['cdcl', 'dimacs'])
+    pending = queue.Queue(maxsize=4 * jobs)
+    threading.Thread(target=feed, args=(paths, pending), daemon=True).start()
+
+    idle = [Worker(models, cache) for _ in range(jobs)]
+    busy = dict() # connection -> worker
+    exhausted = False
+    try:
+        while not exhausted or busy:
+            # hand out work; only block for new paths when nothing is running
+            while idle and not exhausted:
+                try:
+                    path = pending.get(timeout=POLL_INTERVAL if busy else None)
+                except queue.Empty:
+                    break
+                if path is None:
+                    exhausted = True
+                    break
+                w = idle.pop()
+                w.submit(path, timeout)
+                busy[w.conn] = w
+            if not busy:
+                continue
+
+            wait_for = None if exhausted or not idle else POLL_INTERVAL
+            deadlines = [w.deadline for w in busy.values() if w.deadline is not None]
+            if deadlines:
+                left = max(0, min(deadlines) - time.monotonic())
+                wait_for = left if wait_for is None else min(wait_for, left)
+
+            for conn in wait(list(busy), timeout=wait_for):
+                w = busy.pop(conn)
+                try:
+                    res = conn.recv()
+                except EOFError: # the worker died
+                    res = dict(path=w.path, result="error", error="solver process exited")
+                    w.kill()
+                    w = Worker(models, cache)
+                idle.append(w)
+                yield res
+
+            now = time.monotonic()
+            for conn, w in list(busy.items()):
+                if w.deadline is not None and now >= w.deadline:
+                    del busy[conn]
+                    w.kill()
+                    idle.append(Worker(models, cache))
+                    yield dict(path=w.path, result="timeout", time=timeout)
+    finally:
+        for w in busy.values():
+            w.kill()
+        for w in idle:
+            w.stop()
+
+
+if __name__ == '__main__':
+    args = parseArg().parse_args()
+    cache = ResultCache(args.cache, int(args.cache_size * 2**20), args.cache_rename) if args.cache else None
+    for res in solve_all(expand(args.paths, args.manifest), max(1, args.jobs), args.timeout, args.models, cache):
+        print(json.dumps(res), flush=True)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import platform
+import sys
+import time
+
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
+import cdcl
+from dimacs import DimacsReader
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks')
+NAME_DIR = os.path.join(BENCH_DIR, 'groups', 'group')
+
+# benchmark set -> (directory, file naming its sat instances, file naming its unsat instances),
+# as in benchmarks/groups/group/bench*.sh
+SETS = {
+    'bench1': ('bench1', 'name1', 'name2'),
+    'bench2': ('bench2', 'name3', 'name4'),
+    'bench3': ('bench3', None, 'name5'),
+    'bench4': ('bench4', 'name4_s', 'name4_u'),
+    'bench5': ('bench5', 'name5_s', 'name5_u'),
+    'bench6': ('bench6', 'name6_s', 'name6_u'),
+    'bench7': ('bench4', 'name7_s', 'name7_u'),
+}
+
+FIELDS = ['set', 'name', 'expected', 'simplify', 'result', 'ok', 'time', 'conflicts', 'decisions', 'propagations', 'peak_rss_kb']
+
+# each instance is solved in its own process, so that its peak RSS is its own
+CTX = mp.get_context('forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn')
+
+
+def parseArg():
+    """
+    CMD argument parsing
+    :return: the parser
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the solver and compare benchmark runs')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='solve the benchmark sets and record the results')
+    run.add_argument('sets', nargs='*', default=sorted(SETS), help='benchmark sets, default all of them')
+    run.add_argument('--timeout', type=float, default=60, help='seconds allowed per instance')
+    run.add_argument('--json', help='write the results to this JSON file')
+    run.add_argument('--csv', help='write the results to this CSV file')
+    run.add_argument('--no-simplify', dest='simplify', action='store_false',
+                     help='skip subsumption and variable elimination before the search, as main.py does')
+
+    compare = sub.add_parser('compare', help='report the instances on which a run is worse than a baseline')
+    compare.add_argument('baseline', help='JSON results of the reference run')
+    compare.add_argument('current', help='JSON results of the run to check')
+    compare.add_argument('--threshold', type=float, default=1.25,
+                         help='slowdown ratio above which an instance regressed')
+    compare.add_argument('--min-delta', type=float, default=0.1,
+                         help='slowdowns of fewer seconds than this are noise')
+    return parser
+
+
+def instances(name):
+    """Yield (file name, path, expected result) for each instance of benchmark set name"""
+    d, sat_names, unsat_names = SETS[name]
+    for names, expected in [(sat_names, 'sat'), (unsat_names, 'unsat')]:
+        if names is None:
+            continue
+        with open(os.path.join(NAME_DIR, names)) as lines:
+            for line in lines:
+                f = line.strip()
+                if f:
+                    yield f, os.path.join(BENCH_DIR, d, expected, f), expected
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KiB, or None if unknown"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss # bytes on macOS
+
+
+def measure(path, conn, config):
+    """
+    Solve path in this (child) process, with the keyword arguments config of CDCL, and send
+    the measurements through conn
+    """
+    start = time.perf_counter()
+    try:
+        reader = DimacsReader(path)
+        cnf = cdcl.CDCL(reader.n_vars, reader, os.devnull, **config)
+    except Exception as e:
+        conn.send(dict(result="error", error="{}: {}".format(type(e).__name__, e)))
+        return
+    conn.send(dict(
+        result="sat" if cnf.sat else "unsat",
+        time=time.perf_counter() - start,
+        conflicts=cnf.n_conflicts,
+        decisions=cnf.n_decisions,
+        propagations=cnf.n_propagations,
+        peak_rss_kb=peak_rss_kb(),
+    ))
+
+
+def run_one(path, timeout, config):
+    """Solve path in a fresh process, killed after timeout seconds, see measure. Return the measurements."""
+    conn, child = CTX.Pipe(duplex=False)
+    proc = CTX.Process(target=measure, args=(path, child, config), daemon=True)
+    proc.start()
+    child.close()
+    try:
+        if conn.poll(timeout):
+            return conn.recv()
+        return dict(result="timeout", time=timeout)
+    except EOFError: # the solver process died
+        return dict(result="error", error="solver process exited with code {}".format(proc.exitcode))
+    finally:
+        proc.kill()
+        proc.join()
+        conn.close()
+
+
+def run(sets, timeout, config):
+    """
+    Benchmark every instance of sets with the keyword arguments config of CDCL, which are recorded
+    in the results, printing a summary per set. Return the list of results.
+    """
+    results = []
+    for s in sets:
+        start = time.time()
+        passed = total = 0
+        for f, path, expected in instances(s):
+            res = dict(set=s, name=f, expected=expected, **config)
+            res.update(run_one(path, timeout, config))
+            res['ok'] = res['result'] == expected
+            results.append(res)
+            total += 1
+            passed += res['ok']
+            if res['result'] not in (expected, 'timeout'):
+                print("{}/{}: {}".format(s, f, res.get('error', "Wrong!")), file=sys.stderr)
+        print("{}: Pass: {}/{}, took {:.1f} seconds".format(s, passed, total, time.time() - start), flush=True)
+    return results
+
+
+def meta(timeout):
+    """Describe the environment of a run, so that reports can be told apart"""
+    return dict(
+        date=time.strftime('%Y-%m-%dT%H:%M:%S'),
+        build='cython' if not cdcl.__file__.endswith('.py') else 'python',
+        python=platform.python_version(),
+        machine=platform.machine(),
+        timeout=timeout,
+    )
+
+
+def write_json(f, results, timeout):
+    with open(f, 'w') as out:
+        json.dump(dict(meta=meta(timeout), results=results), out, indent=1)
+
+
+def write_csv(f, results):
+    with open(f, 'w', newline='') as out:
+        writer = csv.DictWriter(out, FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def load(f):
+    """Map (set, name) to the result recorded in the JSON report f"""
+    with open(f) as report:
+        return {(r['set'], r['name']): r for r in json.load(report)['results']}
+
+
+def compare(baseline, current, threshold=1.25, min_delta=0.1):
+    """
+    Compare two runs instance by instance.
+    Return the list of regressions as (set, name, reason): instances that were solved
+    correctly in baseline but are not in current, or got slower by more than both
+    threshold times and min_delta seconds. Instances missing from either run are skipped.
+    """
+    regressions = []
+    for key in sorted(baseline.keys() & current.keys()):
+        old, new = baseline[key], current[key]
+        if not old['ok']:
+            continue
+        if not new['ok']:
+            regressions.append(key + ("{} -> {}".format(old['result'], new['result']),))
+        elif new['time'] > threshold * old['time'] and new['time'] - old['time'] > min_delta:
+            regressions.append(key + ("{:.3f}s -> {:.3f}s".format(old['time'], new['time']),))
+    return regressions
+
+
+def summary(results):
+    """Total time and pass count of a run, over the instances solved correctly"""
+    solved = [r for r in results if r['ok']]
+    return len(solved), len(results), sum(r['time'] for r in solved)
+
+
+if __name__ == '__main__':
+    args = parseArg().parse_args()
+    if args.command == 'run':
+        unknown = [s for s in args.sets if s not in SETS]
+        if unknown:
+            exit("unknown benchmark sets: {}".format(", ".join(unknown)))
+        results = run(args.sets, args.timeout, dict(simplify=args.simplify))
+        if args.json:
+            write_json(args.json, results, args.timeout)
+        if args.csv:
+            write_csv(args.csv, results)
+        exit(0)
+
+    baseline, current = load(args.baseline), load(args.current)
+    regressions = compare(baseline, current, args.threshold, args.min_delta)
+    for s, f, reason in regressions:
+        print("{}/{}: {}".format(s, f, reason))
+    common = baseline.keys() & current.keys()
+    for label, run_results in [('baseline', baseline), ('current', current)]:
+        print("{}: solved {}/{} in {:.1f} seconds".format(
+            label, *summary([run_results[k] for k in common])))
+    print("{} regressions".format(len(regressions)))
+    exit(1 if regressions else 0)
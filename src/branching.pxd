@@ -1,22 +1,48 @@
 # cython: language_level=3
 # cython: profile=False
 
-from random import choice
-from components cimport Literal, Clause
+from cpython cimport array
+from components cimport ClauseDB
 
 cdef class ERMA:
     cdef readonly:
         double alpha, alpha_dec, alpha_lb
         int learned_count
-        dict q, last_assigned, participated
-    
-    cdef after_conflict(self, Clause learned, Clause conflict)
+        array.array q, last_assigned, participated
+        VarHeap order
 
-    
-    cdef on_assign(self, int x)
+    cdef grow(self, int n_vars)
 
-    
-    cdef on_unassign(self, list xs)
+    cdef add_var(self, int x)
 
+    cdef after_conflict(self, ClauseDB db, int learned, int conflict)
 
-    cdef int pick(self, list free)
+
+    cdef void on_assign(self, int x) noexcept nogil
+
+
+    cdef void on_unassign(self, int* ls, int n) noexcept nogil
+
+
+    cdef int pick(self, array.array vals)
+
+
+    cdef int peek(self, array.array vals)
+
+
+cdef class VarHeap:
+    cdef readonly:
+        array.array score, heap, pos
+        int size
+
+    cdef bint contains(self, int x) noexcept nogil
+
+    cdef void push(self, int x) noexcept nogil
+
+    cdef void update(self, int x) noexcept nogil
+
+    cdef int pop(self) noexcept nogil
+
+    cdef void sift_up(self, int i) noexcept nogil
+
+    cdef void sift_down(self, int i) noexcept nogil
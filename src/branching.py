@@ -1,34 +1,145 @@
-from random import choice
+from array import array
+from components import UNASSIGNED
 
 class ERMA:
-    def __init__(self, xs, alpha=0.4, alpha_dec=10**(-6), alpha_lb=0.06):
+    def __init__(self, n_vars, xs, alpha=0.4, alpha_dec=10**(-6), alpha_lb=0.06):
         self.alpha = alpha
         self.alpha_dec = alpha_dec
         self.alpha_lb = alpha_lb
         self.learned_count = 0
-        self.q = {x: 0 for x in xs}
-        self.last_assigned = {x: 0 for x in xs}
-        self.participated = {x: 0 for x in xs}
+        self.q = array('d', [0]) * (n_vars + 1)
+        self.last_assigned = array('i', [0]) * (n_vars + 1)
+        self.participated = array('i', [0]) * (n_vars + 1)
+        self.order = VarHeap(self.q, xs)
 
-    
-    def after_conflict(self, learned, conflict):
+
+    def grow(self, n_vars):
+        """Make room for variables up to n_vars"""
+        n = n_vars + 1 - len(self.q)
+        self.q.extend(array('d', [0]) * n)
+        self.last_assigned.extend(array('i', [0]) * n)
+        self.participated.extend(array('i', [0]) * n)
+        self.order.pos.extend(array('i', [-1]) * n)
+
+    def add_var(self, x):
+        """Make x a candidate for branching"""
+        self.order.push(x)
+
+    def after_conflict(self, db, learned, conflict):
         self.learned_count += 1
-        for x in set(learned.xs()) | set(conflict.xs()):
+        for x in set(db.xs(learned)) | set(db.xs(conflict)):
             self.participated[x] += 1
         if self.alpha > self.alpha_lb:
             self.alpha -= self.alpha_dec
-    
+
     def on_assign(self, x):
         self.last_assigned[x] = self.learned_count
         self.participated[x] = 0
-    
+
     def on_unassign(self, xs):
+        order = self.order
         for x in xs:
             interval = self.learned_count - self.last_assigned[x]
             if interval > 0:
                 r = self.participated[x] / interval
                 self.q[x] = (1 - self.alpha) * self.q[x] + self.alpha * r
+            if x in order:
+                order.update(x)
+            else:
+                order.push(x)
+
+    def pick(self, vals):
+        """Return the free variable with the highest score, or 0 if every variable is assigned"""
+        # assigned variables are dropped lazily, and pushed back by on_unassign
+        order = self.order
+        while len(order) > 0:
+            x = order.pop()
+            if vals[x] == UNASSIGNED:
+                return x
+        return 0
+
+    def peek(self, vals):
+        """Return the variable that pick would return, without taking it out, or 0"""
+        order = self.order
+        while len(order) > 0:
+            x = order.heap[0]
+            if vals[x] == UNASSIGNED:
+                return x
+            order.pop()
+        return 0
+
+
+class VarHeap:
+    """Binary max-heap of variables ordered by score, indexed by variable"""
+
+    def __init__(self, score, xs):
+        self.score = score
+        self.heap = array('i')
+        self.pos = array('i', [-1]) * len(score) # position of each variable in heap, or -1
+        for x in xs:
+            self.push(x)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, x):
+        return self.pos[x] >= 0
+
+    def push(self, x):
+        if self.pos[x] >= 0:
+            return
+        self.pos[x] = len(self.heap)
+        self.heap.append(x)
+        self.sift_up(len(self.heap) - 1)
+
+    def update(self, x):
+        """Restore the heap order after the score of x has changed"""
+        self.sift_up(self.pos[x])
+        self.sift_down(self.pos[x])
+
+    def pop(self):
+        """Remove and return the variable with the highest score"""
+        heap, pos = self.heap, self.pos
+        x = heap[0]
+        last = heap.pop()
+        pos[x] = -1
+        if len(heap) > 0:
+            heap[0] = last
+            pos[last] = 0
+            self.sift_down(0)
+        return x
+
+    def sift_up(self, i):
+        heap, pos, score = self.heap, self.pos, self.score
+        x = heap[i]
+        s = score[x]
+        while i > 0:
+            p = (i - 1) >> 1
+            y = heap[p]
+            if score[y] >= s:
+                break
+            heap[i] = y
+            pos[y] = i
+            i = p
+        heap[i] = x
+        pos[x] = i
 
-    def pick(self, free):
-        q, x = max([(self.q[x], x) for x in free], key=lambda p:p[0])
-        return x
\ No newline at end of file
+    def sift_down(self, i):
+        heap, pos, score = self.heap, self.pos, self.score
+        n = len(heap)
+        x = heap[i]
+        s = score[x]
+        while True:
+            c = 2 * i + 1
+            if c >= n:
+                break
+            if c + 1 < n and score[heap[c + 1]] > score[heap[c]]:
+                c += 1
+            y = heap[c]
+            if score[y] <= s:
+                break
+            heap[i] = y
+            pos[y] = i
+            i = c
+        heap[i] = x
+        pos[x] = i
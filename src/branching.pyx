@@ -1,40 +1,182 @@
 # cython: language_level=3
 # cython: profile=False
 
-from random import choice
-from components cimport Literal, Clause
+from cpython cimport array
+import array
+from components cimport ClauseDB, UNASSIGNED, var
 
 cdef class ERMA:
 
-    def __init__(self, xs, alpha=0.4, alpha_dec=10**(-6), alpha_lb=0.06):
+    def __init__(self, int n_vars, xs, alpha=0.4, alpha_dec=10**(-6), alpha_lb=0.06):
         self.alpha = alpha
         self.alpha_dec = alpha_dec
         self.alpha_lb = alpha_lb
         self.learned_count = 0
-        self.q = {x: 0 for x in xs}
-        self.last_assigned = {x: 0 for x in xs}
-        self.participated = {x: 0 for x in xs}
+        self.q = array.array('d', [0]) * (n_vars + 1)
+        self.last_assigned = array.array('i', [0]) * (n_vars + 1)
+        self.participated = array.array('i', [0]) * (n_vars + 1)
+        self.order = VarHeap(self.q, xs)
 
-    
-    cdef after_conflict(self, Clause learned, Clause conflict):
+
+    cdef grow(self, int n_vars):
+        """Make room for variables up to n_vars"""
+        cdef int n = n_vars + 1 - len(self.q)
+        self.q.extend(array.array('d', [0]) * n)
+        self.last_assigned.extend(array.array('i', [0]) * n)
+        self.participated.extend(array.array('i', [0]) * n)
+        self.order.pos.extend(array.array('i', [-1]) * n)
+        self.order.heap.extend(array.array('i', [0]) * n)
+
+    cdef add_var(self, int x):
+        """Make x a candidate for branching"""
+        self.order.push(x)
+
+    cdef after_conflict(self, ClauseDB db, int learned, int conflict):
+        cdef int x
         self.learned_count += 1
-        for x in set(learned.xs()) | set(conflict.xs()):
-            self.participated[x] += 1
+        for x in set(db.xs(learned)) | set(db.xs(conflict)):
+            self.participated.data.as_ints[x] += 1
         if self.alpha > self.alpha_lb:
             self.alpha -= self.alpha_dec
-    
-    cdef on_assign(self, int x):
-        self.last_assigned[x] = self.learned_count
-        self.participated[x] = 0
-    
-    cdef on_unassign(self, list xs):
+
+    cdef void on_assign(self, int x) noexcept nogil:
+        self.last_assigned.data.as_ints[x] = self.learned_count
+        self.participated.data.as_ints[x] = 0
+
+    cdef void on_unassign(self, int* ls, int n) noexcept nogil:
+        """Update the scores of the variables of the n literals ls, which are being unassigned"""
+        cdef:
+            int i, x, interval
+            double r
+            double* q = self.q.data.as_doubles
+        for i in range(n):
+            x = var(ls[i])
+            interval = self.learned_count - self.last_assigned.data.as_ints[x]
+            if interval > 0:
+                r = self.participated.data.as_ints[x] / <double> interval
+                q[x] = (1 - self.alpha) * q[x] + self.alpha * r
+            if self.order.contains(x):
+                self.order.update(x)
+            else:
+                self.order.push(x)
+
+    cdef int pick(self, array.array vals):
+        """Return the free variable with the highest score, or 0 if every variable is assigned"""
+        cdef:
+            int x
+            VarHeap order = self.order
+        # assigned variables are dropped lazily, and pushed back by on_unassign
+        while order.size > 0:
+            x = order.pop()
+            if vals.data.as_schars[x] == UNASSIGNED:
+                return x
+        return 0
+
+    cdef int peek(self, array.array vals):
+        """Return the variable that pick would return, without taking it out, or 0"""
+        cdef:
+            int x
+            VarHeap order = self.order
+        while order.size > 0:
+            x = order.heap.data.as_ints[0]
+            if vals.data.as_schars[x] == UNASSIGNED:
+                return x
+            order.pop()
+        return 0
+
+
+cdef class VarHeap:
+    """
+    Binary max-heap of variables ordered by score, indexed by variable.
+    The heap is heap[:size], with room for every variable so that it never needs to grow.
+    """
+
+    def __init__(self, array.array score, xs):
         cdef int x
+        self.score = score
+        self.heap = array.array('i', [0]) * len(score)
+        self.size = 0
+        self.pos = array.array('i', [-1]) * len(score) # position of each variable in heap, or -1
         for x in xs:
-            interval = self.learned_count - self.last_assigned[x]
-            if interval > 0:
-                r = self.participated[x] / interval
-                self.q[x] = (1 - self.alpha) * self.q[x] + self.alpha * r
+            self.push(x)
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, int x):
+        return self.contains(x)
+
+    cdef bint contains(self, int x) noexcept nogil:
+        return self.pos.data.as_ints[x] >= 0
+
+    cdef void push(self, int x) noexcept nogil:
+        if self.pos.data.as_ints[x] >= 0:
+            return
+        self.pos.data.as_ints[x] = self.size
+        self.heap.data.as_ints[self.size] = x
+        self.size += 1
+        self.sift_up(self.size - 1)
+
+    cdef void update(self, int x) noexcept nogil:
+        """Restore the heap order after the score of x has changed"""
+        self.sift_up(self.pos.data.as_ints[x])
+        self.sift_down(self.pos.data.as_ints[x])
+
+    cdef int pop(self) noexcept nogil:
+        """Remove and return the variable with the highest score"""
+        cdef:
+            int* heap = self.heap.data.as_ints
+            int* pos = self.pos.data.as_ints
+            int n = self.size - 1
+            int x = heap[0]
+            int last = heap[n]
+        self.size = n
+        pos[x] = -1
+        if n > 0:
+            heap[0] = last
+            pos[last] = 0
+            self.sift_down(0)
+        return x
+
+    cdef void sift_up(self, int i) noexcept nogil:
+        cdef:
+            int* heap = self.heap.data.as_ints
+            int* pos = self.pos.data.as_ints
+            double* score = self.score.data.as_doubles
+            int x = heap[i]
+            int p, y
+            double s = score[x]
+        while i > 0:
+            p = (i - 1) >> 1
+            y = heap[p]
+            if score[y] >= s:
+                break
+            heap[i] = y
+            pos[y] = i
+            i = p
+        heap[i] = x
+        pos[x] = i
 
-    cdef int pick(self, list free):
-        q, x = max([(self.q[x], x) for x in free], key=lambda p:p[0])
-        return x
\ No newline at end of file
+    cdef void sift_down(self, int i) noexcept nogil:
+        cdef:
+            int* heap = self.heap.data.as_ints
+            int* pos = self.pos.data.as_ints
+            double* score = self.score.data.as_doubles
+            int n = self.size
+            int x = heap[i]
+            int c, y
+            double s = score[x]
+        while True:
+            c = 2 * i + 1
+            if c >= n:
+                break
+            if c + 1 < n and score[heap[c + 1]] > score[heap[c]]:
+                c += 1
+            y = heap[c]
+            if score[y] <= s:
+                break
+            heap[i] = y
+            pos[y] = i
+            i = c
+        heap[i] = x
+        pos[x] = i
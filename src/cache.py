@@ -0,0 +1,147 @@
+import hashlib
+import sqlite3
+import time
+
+MAX_BYTES = 64 << 20 # default size of the store
+ENTRY_OVERHEAD = 64 # bytes counted per entry on top of its model
+REFINE_ROUNDS = 16 # at most, for the colors of the variables to stabilize
+LOCK_TIMEOUT = 30 # seconds a process waits for another one writing to the store
+
+
+class Formula:
+    """
+    The canonical form of a formula, which identifies it in a ResultCache: its distinct
+    clauses without tautologies, as sorted tuples of DIMACS integers, sorted. With rename,
+    the variables are first renumbered by the order of their colors under refinement, each
+    variable being colored by the colors of the clauses it occurs in and each clause by
+    those of its literals, so that most renamings of a formula get the same form. Variables
+    of equal colors keep their relative order, which only costs missed hits: two formulas
+    with the same form always only differ by the renaming.
+    """
+
+    def __init__(self, nss, rename=False):
+        cs = {tuple(sorted(set(ns))) for ns in nss}
+        self.clauses = [c for c in cs if not any(-n in c for n in c)]
+        xs = sorted({abs(n) for c in self.clauses for n in c})
+        order = self.refine(xs) if rename else xs
+        self.to_canonical = {x: i + 1 for i, x in enumerate(order)}
+        self.from_canonical = {i + 1: x for i, x in enumerate(order)}
+        form = sorted(tuple(sorted(self.canonical(c))) for c in self.clauses)
+        h = hashlib.sha256()
+        for c in form:
+            h.update(" ".join(map(str, c + (0,))).encode() + b"\n")
+        self.digest = h.hexdigest()
+
+    def refine(self, xs):
+        """Return the variables xs sorted by color, then by number"""
+        color = dict.fromkeys(xs, 0)
+        n_colors = 1
+        for _ in range(REFINE_ROUNDS):
+            clause_color = [tuple(sorted((n > 0, color[abs(n)]) for n in c)) for c in self.clauses]
+            seen = {x: [] for x in xs}
+            for c, k in zip(self.clauses, clause_color):
+                for n in c:
+                    seen[abs(n)].append((n > 0, k))
+            signature = {x: (color[x], tuple(sorted(seen[x]))) for x in xs}
+            ranks = {s: i for i, s in enumerate(sorted(set(signature.values())))}
+            color = {x: ranks[signature[x]] for x in xs}
+            if len(ranks) == n_colors:
+                break
+            n_colors = len(ranks)
+        return sorted(xs, key=lambda x: (color[x], x))
+
+    def canonical(self, ns):
+        return [n // abs(n) * self.to_canonical[abs(n)] for n in ns]
+
+    def original(self, ns):
+        return [n // abs(n) * self.from_canonical[abs(n)] for n in ns]
+
+    def satisfied_by(self, model):
+        """Check that model, a list of DIMACS integers, satisfies every clause"""
+        true = set(model)
+        return all(any(n in true for n in c) for c in self.clauses)
+
+
+class ResultCache:
+    """
+    On-disk store of the results of solved formulas, keyed by the digest of their canonical
+    form (see Formula): the model of sat ones, in canonical variables, or the unsat verdict.
+    Once the entries take more than max_bytes, the least recently used are evicted.
+    The store is an SQLite file, which processes solving in parallel can share.
+    """
+
+    def __init__(self, path, max_bytes=MAX_BYTES, rename=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rename = rename
+        self.conn = None # opened on first use, so that the cache can be sent to worker processes
+        self.n_hits = 0
+        self.n_misses = 0
+
+    def __getstate__(self):
+        return dict(vars(self), conn=None)
+
+    def db(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS results "
+                              "(digest TEXT PRIMARY KEY, sat INTEGER, model TEXT, size INTEGER, used REAL)")
+        return self.conn
+
+    def formula(self, nss):
+        """The canonical form of the clauses nss (lists of DIMACS integers) used by this cache"""
+        return Formula(nss, self.rename)
+
+    def get(self, f):
+        """
+        Return (True, model) or (False, None) if Formula f was solved before, or None. The
+        model, in the variables of f, is checked against its clauses: if it is wrong, the
+        entry is dropped and it counts as a miss.
+        """
+        db = self.db()
+        row = db.execute("SELECT sat, model FROM results WHERE digest = ?", (f.digest,)).fetchone()
+        if row is not None and row[0]:
+            model = f.original(map(int, row[1].split()))
+            if not f.satisfied_by(model):
+                db.execute("DELETE FROM results WHERE digest = ?", (f.digest,))
+                row = None
+        if row is None:
+            self.n_misses += 1
+            return None
+        db.execute("UPDATE results SET used = ? WHERE digest = ?", (time.time(), f.digest))
+        self.n_hits += 1
+        return (True, model) if row[0] else (False, None)
+
+    def put(self, f, sat, model=None):
+        """Record that Formula f is sat, with model, a list of DIMACS integers, or unsat"""
+        text = " ".join(map(str, f.canonical([n for n in model if abs(n) in f.to_canonical]))) if sat else ""
+        size = ENTRY_OVERHEAD + len(text)
+        db = self.db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                       (f.digest, int(sat), text, size, time.time()))
+            self.evict()
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def evict(self):
+        """Delete the least recently used entries until the others fit in max_bytes"""
+        db = self.db()
+        excess = db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for digest, size in db.execute("SELECT digest, size FROM results ORDER BY used"):
+            victims.append((digest,))
+            excess -= size
+            if excess <= 0:
+                break
+        db.executemany("DELETE FROM results WHERE digest = ?", victims)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
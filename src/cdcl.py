@@ -2,17 +2,38 @@
 # cython: profile=False
 
 import logging as logging
-from collections import defaultdict, deque, Counter
-from random import choice, seed, sample
-from copy import copy
-from itertools import chain
+from array import array
+from collections import deque, Counter
+from random import Random
+from time import perf_counter
+from itertools import chain, product
 from branching import ERMA
+from stats import Stats, MEMORY
+from simplify import Simplifier
+from sls import SLS, SLS_FLIPS
+from restarts import RestartPolicy, make_policy
+from events import ASSIGN, CONFLICT, LEARN, BACKJUMP, RESTART
+from components import ClauseDB, normalize, from_dimacs, to_dimacs, CREF_UNDEF, UNASSIGNED
 
 # seed(10)
 
 RESTART_MULTIPLIER = 1
+SHARE_SIZE = 2 # longest learned clause given to export_clause
 
-clause_counter = 0
+LEVEL_BASE = -2 # lowest decision level
+
+# learned clause database reduction
+CORE_GLUE = 2 # learned clauses of at most this glue are never forgotten
+TIER2_GLUE = 6 # learned clauses of at most this glue survive a reduction if used since the last one
+LEARNING_LIMIT_INC = 300 # increase of the number of learned clauses allowed after each reduction
+GARBAGE_FRACTION = 0.2 # compact the clause arena when deleted learned clauses take this fraction of it
+CLAUSE_DECAY = 0.999
+
+PROBE_BUDGET = 10**6 # propagations allowed for failed literal probing
+SLS_INTERVAL = 2000 # conflicts before warm starting the phases again, doubled after each time
+
+# indices of phase_time, in the order of stats.PHASES
+T_PREPROCESS, T_UNIT_PROP, T_ANALYZE, T_FORGET, T_SIMPLIFY, T_LOCAL_SEARCH = range(6)
 
 
 class CDCL:
@@ -22,194 +43,674 @@ class CDCL:
         if dl is None:
             dl = self.dl
         logging.info('  ' * max(0,dl) + str(msg()))
-    
+
     def DEBUG(self, msg, dl=None):
         if self.log_level > logging.DEBUG: return
         if dl is None:
             dl = self.dl
         logging.debug('  ' * max(0,dl) + str(msg()).replace('\n', '\n' + '  ' * dl))
-    
 
-    def __init__(self, n_vars, nss, log_file="log", log_level=logging.WARN):
-        logging.basicConfig(level=log_level, filemode='w', filename=log_file, format='%(message)s')
+
+    def __init__(self, n_vars=0, nss=(), log_file="log", log_level=logging.WARN, solve=True,
+                 seed=None, restart_multiplier=RESTART_MULTIPLIER, erma_alpha=0.4,
+                 probe_budget=PROBE_BUDGET, probe_time=None, simplify=False,
+                 restart='luby', reuse_trail=False, proof=None, trace=None, max_memory=None,
+                 warm_start=False, sls_flips=SLS_FLIPS):
+        """
+        Build a solver for the clauses nss (lists of DIMACS integers) and solve it,
+        unless solve is False. More clauses can be added with add_clause, and solve
+        can be called repeatedly, under different assumptions.
+        seed, restart_multiplier and erma_alpha diversify the search.
+        restart is the name of a restart policy of restarts.POLICIES, whose intervals are
+        scaled by restart_multiplier, or a restarts.RestartPolicy. With reuse_trail, restarts
+        keep the decisions that the branching heuristic would make again.
+        proof, a proof.DRAT, receives the clauses derived and forgotten, which certify unsat answers.
+        trace, an events.EventTrace, receives the assignments, conflicts, backjumps and restarts.
+        max_memory bounds the bytes taken by the clauses, watch lists and trail, by forgetting
+        learned clauses whenever they are over it, on top of the limit on their number.
+        With warm_start, local search of sls_flips flips sets the saved phases before each
+        search, and again at restarts after SLS_INTERVAL conflicts, then twice as many, and so on.
+        Preprocessing stops probing after probe_budget propagations or probe_time seconds.
+        If simplify is set, the clauses are simplified before the first search, which
+        eliminates variables: these can not appear in later clauses or assumptions, unless
+        they are added to the set frozen beforehand.
+        """
+        if log_level <= logging.INFO: # nothing is logged above, so the log file is not even created
+            logging.basicConfig(level=log_level, filemode='w', filename=log_file, format='%(message)s')
         self.log_level = log_level
 
+        self.n_vars = n_vars
+        self.db = ClauseDB() # every clause, original or learned, lives in this arena
         self.xs = list()
         self.cs0 = list() # includes trivial clauses
         self.cs = list() # non-trivial clauses
-        self.learned = set()
-        self.watched = dict() # map literal l to clauses that are watching l
+        self.learned = dict() # map each forgettable learned clause to its glue
+        self.n_core = 0 # learned clauses with glue at most CORE_GLUE
+        self.clause_activity = dict() # map each learned clause to how often it took part in conflicts, recently
+        self.clause_inc = 1.0
+        self.used = set() # tier 2 clauses that took part in a conflict since the last reduction
+        self.max_memory = max_memory
+        self.peak_memory = dict.fromkeys(MEMORY, 0) # bytes, see memory
+        self.memory_check = 0 # size of the clause arena from which over_memory measures again
+        self.n_collections = 0
+        # map literal l to the clauses of 3 or more literals that are watching l, as a flat array of
+        # (clause, blocker) pairs, the blocker being a literal of the clause whose truth satisfies it
+        self.watched = [array('i') for _ in range(2 * n_vars + 2)]
+        # map literal l to the binary clauses containing l, as a flat array of (other literal, clause) pairs
+        self.binary = [array('i') for _ in range(2 * n_vars + 2)]
         self.assertions = list() # literals to be assigned true
         self.conflict_count = 0
+        # totals over the whole run
+        self.n_conflicts = 0
+        self.n_decisions = 0
+        self.n_propagations = 0
+        self.n_minimized = 0 # literals removed from learned clauses by minimize
+        self.n_restarts = 0
+        self.n_learned = 0
+        self.n_forgotten = 0
+        self.learned_lits = 0 # total length of the learned clauses
+        self.phase_time = array('d', [0]) * 6 # seconds spent in each of stats.PHASES
+        self.start_time = perf_counter()
+        self.progress = None # called with the solver every 256 conflicts and when solve returns, see stats.Progress
+
+        if not isinstance(restart, RestartPolicy):
+            restart = make_policy(restart, restart_multiplier)
+        self.restart_policy = restart
+        self.reuse_trail = reuse_trail
+        self.n_reused = 0 # decision levels kept by restarts
+        self.rng = Random(seed)
+
+        # clause sharing with other solvers: export_clause receives each short learned
+        # clause, and import_clauses returns the clauses to add at the next restart
+        self.export_clause = None
+        self.import_clauses = None
+        self.proof = proof
+        self.trace = trace
 
-        # restart using Knuth's reluctant doubleing sequence
-        self.restart_counter = (1, 1)
-        
         # decision levels:
         #   -2 :: assertions of singleton clauses and implied literals in pre-processing stage
         #   -1 :: decision level for pre-processing stage
-        #  > 0 :: normal decisions
-        self.m = Model()
+        #    0 :: literals implied after backjumping to the root, kept between calls to solve
+        #  > 0 :: normal decisions, starting with one level per assumption
+        self.m = Model(n_vars)
         self.sat = False
         self.dl = -2
-        
-        xs_set = set()
-        # process clauses and variables
-        for ns in nss:
-            c = Clause.from_ns(ns)
-            self.cs0.append(c)
-            if not c.trivial:
-                if c.singleton: # singleton clause
-                    self.assertions.append( (c.get_only(), c) )
-                else:
-                    self.cs.append(c)
-                    for x in c.xs():
-                        if x not in xs_set:
-                            xs_set.add(x)
-                            self.xs.append(x)
-        
-        self.saved_phase = {x: 0 for x in self.xs}
-        
-        self.learning_limit = max(len(self.cs) // 3, 100)
-        
-        self.branching_heuristics = ERMA(self.xs)
+        self.ok = True # False once the clauses alone are known to be unsatisfiable
+        self.preprocessed = False
+        self.core = list() # failed assumptions of the last unsat call to solve
+        self.unknown = False # whether the last call to solve stopped before an answer
+        self.interrupted = False
+        self.best = array('i') # longest trail reached by the last call to solve
+        # limits of the current call to solve, as totals over the whole run; negative for none
+        self.conflict_limit = self.propagation_limit = -1
+        self.deadline = float('inf')
+
+        self.saved_phase = dict()
+        self.warm_start = warm_start
+        self.sls_flips = sls_flips
+        self.sls_next = SLS_INTERVAL # conflicts before the next warm start at a restart
+        self.n_local_searches = 0
+        self.n_flips = 0
+
+        self.branching_heuristics = ERMA(n_vars, self.xs, alpha=erma_alpha)
 
         self.n_iter = 0
-        self.sat = self.preprocess()
-
-        if self.sat:
-            self.sat = self.run()
-        
-        stats = []
-        stats.append("Statistics")
-        stats.append("Pre-propcessing iterations: %d" % self.n_iter)
-        stats.append("Learned clauses: %d" % len(self.learned))
-        self.INFO("\n".join(stats), 0)
-    
+        self.probe_budget = probe_budget
+        self.probe_time = probe_time
+        self.probes = dict() # map each probed literal to the set of literals it implied
+        self.equivalences = list() # pairs of literals found equivalent by probing
+        self.n_failed = 0
+        self.n_necessary = 0
+        self.simplify = simplify
+        self.elim_stack = list() # clauses removed by variable elimination, see Simplifier
+        self.eliminated = set()
+        self.frozen = set() # variables that simplification must not eliminate
+        self.n_subsumed = 0
+        self.n_strengthened = 0
+
+        for ns in nss:
+            self.add_clause(ns)
+
+        if solve:
+            self.solve()
+
+
+    def add_clause(self, ns):
+        """Add the clause ns, a list of DIMACS integers, and return its reference"""
+        if self.preprocessed:
+            self.cancel()
+        ls, trivial = normalize(ns)
+        self.check_eliminated(ls)
+        top = max([l >> 1 for l in ls], default=0)
+        if top > self.n_vars:
+            self.grow(top)
+        c = self.db.add(ls)
+        self.cs0.append(c)
+        if not trivial:
+            if len(ls) == 0: # empty clause
+                self.ok = False
+            elif len(ls) == 1: # singleton clause
+                self.assertions.append( (ls[0], c) )
+            else:
+                self.cs.append(c)
+                for l in ls:
+                    x = l >> 1
+                    if x not in self.saved_phase:
+                        self.saved_phase[x] = 0
+                        self.xs.append(x)
+                        self.branching_heuristics.add_var(x)
+                if self.preprocessed:
+                    self.watch(c)
+        return c
+
+
+    def grow(self, n_vars):
+        """Make room for variables up to n_vars"""
+        self.memory_check = 0
+        self.watched.extend(array('i') for _ in range(2 * (n_vars - self.n_vars)))
+        self.binary.extend(array('i') for _ in range(2 * (n_vars - self.n_vars)))
+        self.m.grow(n_vars)
+        self.branching_heuristics.grow(n_vars)
+        self.n_vars = n_vars
+
+
+    def watch(self, c):
+        """Set up the watched literals of a clause added at the root level"""
+        m = self.m
+        # move the literals that are not false to the front
+        k = 0
+        for i, l in enumerate(self.db.clause(c)):
+            if l not in m or m[l]:
+                self.db.swap(c, i, k)
+                k += 1
+        l0, l1 = self.db.clause(c)[:2]
+        if k == 0:
+            self.ok = False # falsified at the root level
+        elif k == 1 and l0 not in m:
+            self.assertions.append( (l0, c) )
+        self.attach(c)
+
+
+    def attach(self, c):
+        """Watch the first two literals of clause c"""
+        lits = self.db.lits
+        l0, l1 = lits[c + 2], lits[c + 3]
+        if lits[c] == 2:
+            self.binary[l0].extend((l1, c))
+            self.binary[l1].extend((l0, c))
+        else:
+            self.watched[l0].extend((c, l1))
+            self.watched[l1].extend((c, l0))
+
+
+    def detach(self, cs):
+        """Stop watching the clauses in the set cs, none of which is binary"""
+        lits = self.db.lits
+        for l in {lits[c + k] for c in cs for k in (2, 3)}:
+            ws = self.watched[l]
+            self.watched[l] = array('i', chain.from_iterable(
+                (ws[i], ws[i + 1]) for i in range(0, len(ws), 2) if ws[i] not in cs))
+
+
+    def cancel(self):
+        """Backtrack to the root level, where the formula can be modified"""
+        uv = self.m.undo(0)
+        self.branching_heuristics.on_unassign(uv)
+        self.dl = 0
+
+
+    def solve(self, assumptions=(), max_conflicts=None, max_propagations=None, max_time=None, local=False):
+        """
+        Decide satisfiability under assumptions, a list of DIMACS integers. Learned
+        clauses, watches, saved phases and branching scores carry over between calls.
+        Return True if sat (the model is in m); otherwise the subset of assumptions
+        responsible is left in core, which is empty if the clauses alone are unsat.
+        The search gives up after max_conflicts conflicts, max_propagations propagations
+        or max_time seconds in this call, or when interrupt is called: solve then returns
+        None, and the longest trail it reached is in partial.
+        With local, only local search runs, in rounds of sls_flips flips, until it finds a model
+        or reaches a limit: it can not prove unsatisfiability, so solve returns None instead.
+        """
+        self.core = list()
+        self.unknown = False
+        self.best = array('i')
+        self.conflict_limit = -1 if max_conflicts is None else self.n_conflicts + max_conflicts
+        self.propagation_limit = -1 if max_propagations is None else self.n_propagations + max_propagations
+        self.deadline = float('inf') if max_time is None else perf_counter() + max_time
+        ls = [from_dimacs(n) for n in assumptions]
+        self.check_eliminated(ls)
+        top = max([l >> 1 for l in ls], default=0)
+        if top > self.n_vars:
+            self.grow(top)
+
+        if self.preprocessed:
+            self.cancel()
+            if self.ok and self.unit_prop() != CREF_UNDEF:
+                self.ok = False
+        elif self.ok:
+            if self.simplify:
+                t = perf_counter()
+                self.ok = self.simplify_clauses({l >> 1 for l in ls} | self.frozen)
+                self.phase_time[T_SIMPLIFY] += perf_counter() - t
+            self.learning_limit = max(len(self.cs) // 3, 100)
+            if self.ok:
+                t = perf_counter()
+                self.ok = self.preprocess()
+                self.phase_time[T_PREPROCESS] += perf_counter() - t
+            self.preprocessed = True
+
+        if self.ok and (self.warm_start or local):
+            found = self.local_search(self.sls_flips, ls)
+            while local and not found and not self.out_of_budget():
+                found = self.local_search(self.sls_flips, ls)
+            # a model found sets every phase, and the search follows them without conflict
+            self.unknown = local and not found
+        self.sat = self.ok and not self.unknown and self.run(ls) is not None
+        self.interrupted = False
+        if not self.sat and not self.unknown and len(self.core) == 0 and self.proof is not None:
+            self.proof.add([]) # the clauses alone are unsat
+
+        if self.log_level <= logging.INFO:
+            self.INFO(lambda: self.stats, 0)
+        if self.progress is not None:
+            self.progress(self, force=True)
+        return None if self.unknown else self.sat
+
+
+    def interrupt(self):
+        """Make the running call to solve, or else the next one, give up as soon as possible"""
+        self.interrupted = True
+
+
+    def models(self, projection=None, limit=None, assumptions=(), max_conflicts=None, max_propagations=None,
+               max_time=None):
+        """
+        Enumerate the models under assumptions, as lists of DIMACS integers over the variables
+        of projection (every variable if None), any two of which differ on these variables.
+        After each model, the solver keeps its state and gets a clause blocking it, which stays
+        once the enumeration is over. It stops after limit models, when none is left, or on the
+        search limits of solve, which apply to the whole enumeration: unknown is then set.
+        The variables of projection are frozen, and can not have been eliminated already.
+        """
+        xs = range(1, self.n_vars + 1) if projection is None else list(projection)
+        self.check_eliminated([2 * x for x in xs])
+        if max(xs, default=0) > self.n_vars:
+            self.grow(max(xs))
+        self.frozen.update(xs)
+        conflict_limit = None if max_conflicts is None else self.n_conflicts + max_conflicts
+        propagation_limit = None if max_propagations is None else self.n_propagations + max_propagations
+        deadline = None if max_time is None else perf_counter() + max_time
+        n = 0
+        while limit is None or n < limit:
+            if not self.solve(assumptions,
+                              None if conflict_limit is None else max(0, conflict_limit - self.n_conflicts),
+                              None if propagation_limit is None else max(0, propagation_limit - self.n_propagations),
+                              None if deadline is None else deadline - perf_counter()):
+                return
+            model = [x if self.m.vals[x] == 1 else -x for x in xs if self.m.has_var(x)]
+            # variables in no clause are unassigned, and each of their values gives a model
+            free = [x for x in xs if not self.m.has_var(x)]
+            values = {abs(k): k for k in model}
+            for signs in product((1, -1), repeat=len(free)):
+                if limit is not None and n >= limit:
+                    return
+                values.update((x, sign * x) for x, sign in zip(free, signs))
+                n += 1
+                yield [values[x] for x in xs]
+            self.add_clause([-k for k in model])
+
+
+    @property
+    def partial(self):
+        """The longest trail reached by the last call to solve, as DIMACS integers"""
+        return [to_dimacs(l) for l in self.best]
+
+
+    def local_search(self, max_flips, assumptions=()):
+        """
+        Look for a model of the clauses by local search from the saved phases, for at most
+        max_flips flips, with the root level assignments and the assumption literals fixed.
+        Save the phases of the best assignment found, and return True if it is a model.
+        """
+        t = perf_counter()
+        fixed = array('b', self.m.vals)
+        for l in assumptions:
+            if fixed[l >> 1] == UNASSIGNED:
+                fixed[l >> 1] = 1 - (l & 1)
+        sls = SLS(self.n_vars, self.db, self.cs, fixed, self.rng)
+        found = sls.run([self.saved_phase.get(x, 0) for x in range(self.n_vars + 1)], max_flips)
+        for x in self.saved_phase:
+            if fixed[x] == UNASSIGNED:
+                self.saved_phase[x] = 1 if sls.best[x] else -1
+        self.n_local_searches += 1
+        self.n_flips += sls.n_flips
+        if self.log_level <= logging.INFO:
+            self.INFO(lambda: "Local search: {} flips, model found: {}".format(sls.n_flips, found), 0)
+        self.phase_time[T_LOCAL_SEARCH] += perf_counter() - t
+        return found
+
+
+    def check_eliminated(self, ls):
+        for l in ls:
+            if l >> 1 in self.eliminated:
+                raise ValueError("variable {} was eliminated by simplification".format(l >> 1))
+
+
+    def simplify_clauses(self, frozen):
+        """
+        Replace the clauses by their simplification, keeping the variables in frozen and those
+        of singleton clauses. Eliminated variables are given a placeholder value at level -2,
+        corrected by Simplifier.extend once a model is found. Return False if unsat.
+        """
+        db = self.db
+        frozen = frozen | {t[0] >> 1 for t in self.assertions}
+        s = Simplifier(self.n_vars, [db.clause(c) for c in self.cs], frozen, proof=self.proof,
+                       stop=self.out_of_budget)
+        ok = s.run()
+        self.n_subsumed += s.n_subsumed
+        self.n_strengthened += s.n_strengthened
+        for c in self.cs:
+            db.delete(c)
+        self.cs = list()
+        for ls in s.clauses.values():
+            c = db.add(ls)
+            if len(ls) == 1:
+                self.assertions.append( (ls[0], c) )
+            elif len(ls) > 1:
+                self.cs.append(c)
+        self.elim_stack.extend(s.stack)
+        self.eliminated.update(s.eliminated)
+        for x in s.eliminated:
+            self.assertions.append( (2 * x, CREF_UNDEF, -2) )
+        if self.log_level <= logging.INFO:
+            self.INFO(lambda: "Simplified: {} eliminated variables, {} subsumed and {} strengthened clauses".format(
+                len(s.eliminated), s.n_subsumed, s.n_strengthened), 0)
+        return ok
+
+
+    @property
+    def stats(self):
+        """Cumulative statistics of the solver, as a stats.Stats snapshot"""
+        return Stats(self)
+
 
     def preprocess(self):
         """Set up watched literals, and infer as much as possible without decision"""
-        cs_trivial = list()
+        db = self.db
         for c in self.cs:
-            for l in c.start_watching():
-                if l not in self.watched:
-                    self.watched[l] = set()
-                self.watched[l].add(c)
+            self.attach(c)
 
-        if self.unit_prop():
+        if self.unit_prop() != CREF_UNDEF:
             return False
-        
-        # try both polarities of each variable
+
+        # failed literal probing, within a budget of propagations and time
         self.dl = -1
-        fixpoint = 2 # needs 2 iterations to detect fixpoint
-        while fixpoint > 0:
-            # if self.n_iter > 10:
-                # break
+        budget = self.n_propagations + self.probe_budget
+        deadline = None if self.probe_time is None else perf_counter() + self.probe_time
+        occurs = [[] for _ in range(self.n_vars + 1)] # clauses of each variable
+        for c in self.cs:
+            for x in db.xs(c):
+                occurs[x].append(c)
+        dirty = None # variables whose neighbourhood changed in the last round, None to probe all
+        while dirty is None or len(dirty) > 0:
+            start = len(self.m.trail)
+            changed = set() # variables of the binary clauses added in this round
+            roots = self.probe_roots()
             for x in self.xs:
-                if x in self.m.alpha:
+                if self.n_propagations >= budget or (deadline is not None and perf_counter() >= deadline):
+                    if self.log_level <= logging.INFO:
+                        self.INFO(lambda: "Probing budget exhausted")
+                    return True
+                if self.out_of_budget(): # the search gives up right away
+                    return True
+                if self.m.has_var(x):
                     continue
-                pos, neg = Literal(x), Literal(-x)
-                
-                # try pos
-                self.INFO(lambda: "Try {}".format(pos))
-                self.assertions.append( (pos, None) )
-                conflict = self.unit_prop()
-                uv = self.m.undo(-2)
-                self.branching_heuristics.on_unassign(uv)
-                
-                # pos bad ==> assert neg
-                if conflict:
-                    fixpoint = 2
-                    self.INFO(lambda: "pos bad ==> assert neg")
-                    self.assertions.append( (neg, Clause([neg]), -2) )
-                    # neg also bad
-                    conflict = self.unit_prop()
-                    if conflict:
-                        self.INFO(lambda: "neg also bad")
-                        return False
-                
-                # pos good ==> try neg
-                else:
-                    self.INFO(lambda: "pos ok ==> try neg")
-                    self.assertions.append( (neg, None) )
-                    conflict = self.unit_prop()
-                    uv = self.m.undo(-2)
-                    self.branching_heuristics.on_unassign(uv)
-
-                    # neg bad ==> assert pos
-                    if conflict:
-                        fixpoint = 2
-                        self.INFO(lambda: "neg bad ==> assert pos")
-                        self.assertions.append( (pos, Clause([pos]), -2) )
-                        assert(not self.unit_prop())
-                    # neg good ==> no info
-                    else:
-                        pass
-                        self.INFO(lambda: "neg ok ==> no info")
-
-                # DEBUG(self.dl, str(self.m))
-                # DEBUG(self.dl, "")
-            fixpoint -= 1
-            self.INFO(lambda: "fixpoint={}".format(fixpoint))
+                if not self.probe_var(x, roots, dirty, changed):
+                    return False
             self.n_iter += 1
+            # only probes close to the newly fixed variables may give something new
+            dirty = set(changed)
+            for l in self.m.trail[start:]:
+                for c in occurs[l >> 1]:
+                    dirty.update(db.xs(c))
+            if self.log_level <= logging.INFO:
+                self.INFO(lambda: "{} variables changed".format(len(dirty)))
         return True
 
 
-    def run(self):
-        """Run CDCL. Return the model if SAT, or None otherwise"""
-        
+    def probe_roots(self):
+        """
+        Return the literals worth probing, each mapped to the set of literals equivalent to it: one
+        of each strongly connected component of the binary implication graph that no literal out
+        of it implies, found by Tarjan's algorithm. Probing it implies the whole component, and
+        all that the others imply. Most are roots, in no binary clause, but the literals of a
+        cycle are all implied, by each other.
+        """
+        n = 2 * self.n_vars + 2
+        binary = self.binary
+        index, low, comp = [-1] * n, [0] * n, [-1] * n
+        stack = []
+        n_index = n_comps = 0
+        for r in range(2, n):
+            if index[r] >= 0:
+                continue
+            index[r] = low[r] = n_index
+            n_index += 1
+            stack.append(r)
+            path = [(r, 0)] # the literals on the search path, with the position of their next edge
+            while path:
+                l, i = path[-1]
+                ws = binary[l ^ 1] # l implies the other literal of each binary clause of -l
+                if i < len(ws):
+                    path[-1] = (l, i + 2)
+                    k = ws[i]
+                    if index[k] < 0:
+                        index[k] = low[k] = n_index
+                        n_index += 1
+                        stack.append(k)
+                        path.append((k, 0))
+                    elif comp[k] < 0: # on the stack
+                        low[l] = min(low[l], index[k])
+                    continue
+                path.pop()
+                if path:
+                    low[path[-1][0]] = min(low[path[-1][0]], low[l])
+                if low[l] == index[l]:
+                    while True:
+                        k = stack.pop()
+                        comp[k] = n_comps
+                        if k == l:
+                            break
+                    n_comps += 1
+        implied = [False] * n_comps
+        for l in range(2, n):
+            for i in range(0, len(binary[l]), 2): # -k implies l
+                if comp[binary[l][i] ^ 1] != comp[l]:
+                    implied[comp[l]] = True
+        members = dict()
+        for l in range(2, n):
+            if not implied[comp[l]]:
+                members.setdefault(comp[l], set()).add(l)
+        return {min(ls): ls for ls in members.values()}
+
+
+    def probe_var(self, x, roots, dirty, changed):
+        """
+        Probe the polarities of x that are in roots, see probe_roots, and assert
+        at level -2 the literals found to be failed or necessary. Literals found equivalent
+        to x are linked by binary clauses, whose variables are added to changed.
+        Return False if the clauses are unsatisfiable.
+        """
+        implied = dict()
+        for l in (2 * x, 2 * x + 1):
+            # the other literals are implied by one of roots, probed instead
+            if l not in roots:
+                continue
+            if dirty is not None and l in self.probes and \
+                    x not in dirty and dirty.isdisjoint(k >> 1 for k in self.probes[l]):
+                implied[l] = self.probes[l]
+                continue
+            if self.log_level <= logging.INFO:
+                self.INFO(lambda: "Try {}".format(to_dimacs(l)))
+            conflict, ls = self.probe(l)
+            if conflict != CREF_UNDEF: # l failed
+                if self.log_level <= logging.INFO:
+                    self.INFO(lambda: "{} failed".format(to_dimacs(l)))
+                self.n_failed += 1
+                self.probes.pop(l, None)
+                self.assertions.append( (l ^ 1, self.derive([l ^ 1], learned=False), -2) )
+                return self.unit_prop() == CREF_UNDEF
+            implied[l] = self.probes[l] = set(ls)
+
+        if len(implied) < 2:
+            return True
+        pos, neg = implied[2 * x], implied[2 * x + 1]
+        # implied by both polarities
+        for k in pos & neg:
+            if k not in self.m:
+                if self.log_level <= logging.INFO:
+                    self.INFO(lambda: "{} necessary".format(to_dimacs(k)))
+                self.n_necessary += 1
+                # x implies k and -x implies k, which imply k
+                if self.proof is not None:
+                    self.proof.add([2 * x + 1, k])
+                    self.proof.add([2 * x, k])
+                self.assertions.append( (k, self.derive([k], learned=False), -2) )
+                if self.proof is not None:
+                    self.proof.delete([2 * x + 1, k])
+                    self.proof.delete([2 * x, k])
+        if self.unit_prop() != CREF_UNDEF:
+            return False
+        # x implies k, and -x implies -k
+        for k in pos:
+            if k ^ 1 in neg and k not in roots[2 * x] and k not in self.m:
+                if self.log_level <= logging.INFO:
+                    self.INFO(lambda: "{} equivalent to {}".format(to_dimacs(k), to_dimacs(2 * x)))
+                self.equivalences.append( (2 * x, k) )
+                for ls in ([2 * x + 1, k], [2 * x, k ^ 1]):
+                    self.attach(self.derive(ls))
+                changed.update((x, k >> 1))
+        return True
+
+
+    def probe(self, l):
+        """Propagate l at level -1 and take it back. Return the conflict, if any, and the literals implied."""
+        m = self.m
+        start = len(m.trail)
+        self.assertions.append( (l, CREF_UNDEF) )
+        conflict = self.unit_prop()
+        implied = m.trail[start + 1:]
+        uv = m.undo(-2)
+        self.branching_heuristics.on_unassign(uv)
+        return conflict, implied
+
+
+    def run(self, assumptions=()):
+        """Run CDCL under the given assumption literals. Return the model if SAT, or None otherwise"""
+
         self.dl = 1
         while True:
-            free = self.free_vars()
-            if len(free) == 0:
-                break
-            l = self.branch(free)
-            self.assertions.append( (l, None) )
-            
+            if self.out_of_budget():
+                self.unknown = True
+                self.keep_partial()
+                return None
+            if self.dl <= len(assumptions):
+                # assumption i is decided at level i + 1
+                l = assumptions[self.dl - 1]
+                if l in self.m:
+                    if not self.m[l]:
+                        self.core = [to_dimacs(k) for k in self.analyze_final(l)]
+                        return None
+                    self.dl += 1 # already true, leave its level empty
+                    continue
+            else:
+                l = self.branch()
+                if l == 0: # every variable is assigned
+                    break
+            self.assertions.append( (l, CREF_UNDEF) )
+            self.n_decisions += 1
+
             conflict = self.unit_prop()
 
             # DEBUG(self.dl, self.m)
 
-            while conflict:
+            while conflict != CREF_UNDEF:
+                self.keep_partial()
                 self.conflict_count += 1
-                beta, only_true, learned = self.analyze(conflict)
-                if beta < 0:
+                self.n_conflicts += 1
+                if self.trace is not None:
+                    self.trace.event(CONFLICT, conflict, self.dl, self.n_conflicts)
+                if self.dl <= 0: # conflict without any decision, so the clauses alone are unsat
+                    self.ok = False
                     return None
-                else:
+                t = perf_counter()
+                beta, only_true, learned = self.analyze(conflict)
+                self.phase_time[T_ANALYZE] += perf_counter() - t
+                self.n_learned += 1
+                self.learned_lits += self.db.size(learned)
+                self.restart_policy.after_conflict(self.learned.get(learned, 1), len(self.m.trail))
+                if self.progress is not None and self.n_conflicts % 256 == 0:
+                    self.progress(self)
+                if self.trace is not None:
+                    self.trace.event(LEARN, learned, self.db.size(learned), self.learned.get(learned, 1))
+                    self.trace.event(BACKJUMP, self.dl, beta, to_dimacs(only_true))
+                if self.log_level <= logging.INFO:
                     self.INFO(lambda: "Backtrack to level {}".format(beta))
-                    if not learned.singleton:
-                        self.learned.add(learned)
-                    self.branching_heuristics.after_conflict(learned, conflict)
-                    # assert(self.m[only_true])
-                    uv = self.m.undo(beta)
-                    self.branching_heuristics.on_unassign(uv)
-                    self.dl = beta
-                    self.INFO(lambda: "Assert {}".format(only_true))
-                    self.assertions.append( (only_true, learned) )
-                    conflict = self.unit_prop()
+                if self.export_clause is not None and self.db.size(learned) <= SHARE_SIZE:
+                    self.export_clause(self.db.to_dimacs(learned))
+                self.branching_heuristics.after_conflict(self.db, learned, conflict)
+                # assert(self.m[only_true])
+                uv = self.m.undo(beta)
+                self.branching_heuristics.on_unassign(uv)
+                self.dl = beta
+                if self.log_level <= logging.INFO:
+                    self.INFO(lambda: "Assert {}".format(to_dimacs(only_true)))
+                self.assertions.append( (only_true, learned) )
+                conflict = self.unit_prop()
 
                 # DEBUG(self.dl, self.m)
 
-            if self.should_restart():
-                self.restart()
+            if self.restart_policy.should_restart():
+                self.restart(len(assumptions))
+                if self.import_clauses is not None and not self.receive():
+                    return None
             else:
                 self.dl += 1
-        
+
         assert(self.modeled_by()) # make sure that, if sat, the model is indeed correct
-        
+        Simplifier.extend(self.elim_stack, self.m)
+
         return self.m
 
-    
+
     def watch_correct(self):
-        assert(all([c in self.watched[l] for c in self.cs for l in [c[0], c[1]]]))
-        assert(all([l in c[:2] for (l, cs) in self.watched.items() for c in cs]))
-        
-    
+        db = self.db
+        for c in self.cs:
+            for l in db.clause(c)[:2]:
+                if db.size(c) == 2:
+                    assert(c in self.binary[l][1::2])
+                else:
+                    assert(c in self.watched[l][0::2])
+        assert(all([l in db.clause(c)[:2] for l, ws in enumerate(self.watched) for c in ws[0::2]]))
+
+
     def unit_prop(self):
         """Attempt to apply unit propagation using the current model. Return a conflict, if any"""
+        t = perf_counter()
+        conflict = self.propagate()
+        self.phase_time[T_UNIT_PROP] += perf_counter() - t
+        return conflict
+
+
+    def propagate(self):
+        """Body of unit_prop, which times it"""
+        lits = self.db.lits
+        watched = self.watched
+        binary = self.binary
+        m = self.m
 
         while len(self.assertions) > 0: # exit loop when no more literal is pending
-            
+
             t = self.assertions.pop()
 
             if len(t) == 2:
@@ -218,428 +719,584 @@ class CDCL:
             elif len(t) == 3:
                 l, reason, dl = t
 
-            if l in self.m:
-                if not self.m[l]:
+            if l in m:
+                if not m[l]:
                     self.assertions = list()
                     return reason # conflict
                 else:
                     continue # inferred literal is consistent with the model
-            
+
             # update the model
-            if reason: # implied
-                self.m.commit(l, dl, reason)
-                self.INFO(lambda: "{:>3}  @  {}  {}".format(str(l), self.dl, reason))
+            if reason != CREF_UNDEF: # implied
+                m.commit(l, dl, reason)
             else: # guessed
-                self.m.assign(l, dl)
-                self.INFO(lambda: "{:>3}  @  {}  ----------d----------".format(str(l), self.dl))
-            
-            self.saved_phase[l.var] = l.sign()
-            self.branching_heuristics.on_assign(l.var)
-
-            if -l not in self.watched:
-                continue # nothing is watching -l
-            
-            watched_new = set() # unit clauses
-            for c in self.watched[-l]:
-                
+                m.assign(l, dl)
+            if self.log_level <= logging.INFO:
+                if reason != CREF_UNDEF:
+                    self.INFO(lambda: "{:>3}  @  {}  {}".format(to_dimacs(l), self.dl, self.db.to_dimacs(reason)))
+                else:
+                    self.INFO(lambda: "{:>3}  @  {}  ----------d----------".format(to_dimacs(l), self.dl))
+            if self.trace is not None:
+                self.trace.event(ASSIGN, to_dimacs(l), dl, reason)
+
+            self.n_propagations += 1
+            self.saved_phase[l >> 1] = -1 if l & 1 else 1
+            self.branching_heuristics.on_assign(l >> 1)
+
+            nl = l ^ 1
+
+            # binary clauses imply their other literal without looking at clause memory
+            bs = binary[nl]
+            for i in range(0, len(bs), 2):
+                k = bs[i]
+                if k not in m or not m[k]:
+                    self.assertions.append( (k, bs[i + 1]) )
+
+            # the watch list of nl is compacted in place: j is where the next kept entry goes
+            ws = watched[nl]
+            i = j = 0
+            n = len(ws)
+            while i < n:
+                c, b = ws[i], ws[i + 1]
+                i += 2
+                if b in m and m[b]: # satisfied by the blocker
+                    ws[j], ws[j + 1] = c, b
+                    j += 2
+                    continue
+
+                # make nl the second watched literal
+                start = c + 2
+                if lits[start] == nl:
+                    lits[start], lits[start + 1] = lits[start + 1], nl
+                l_other = lits[start]
+                if l_other != b and l_other in m and m[l_other]: # satisfied by the other watch
+                    ws[j], ws[j + 1] = c, l_other
+                    j += 2
+                    continue
+
                 # clause c looks for a substitute literal to watch
-                i = 0 if c[0] == -l else 1
-                j = None
-                for k in range(2, len(c)):
-                    lk = c[k]
-                    if lk not in self.m or self.m[lk]:
-                        j = k
+                for k in range(start + 2, start + lits[c]):
+                    lk = lits[k]
+                    if lk not in m or m[lk]:
+                        lits[start + 1], lits[k] = lk, nl
+                        watched[lk].extend((c, l_other))
                         break
 
-                if j:
-                    if c[j] not in self.watched:
-                        self.watched[c[j]] = set()
-                    self.watched[c[j]].add(c)
-                    c[i], c[j] = c[j], c[i]
-                    
-                
                 # clause c becomes unit, and implies the only remaining watched literal
                 else:
-                    watched_new.add(c) # c still watches -l and the other literal
-                    l_other = c[1 - i]
+                    ws[j], ws[j + 1] = c, l_other # c still watches -l and the other literal
+                    j += 2
                     self.assertions.append( (l_other, c) )
 
-            self.watched[-l] = watched_new
-        
-        return None
-    
-    
-    def branch(self, free):
-        """Choose a free variable and a polarity to branch on"""
-        x = self.branching_heuristics.pick(free)
+            del ws[j:]
+
+        return CREF_UNDEF
+
+
+    def branch(self):
+        """Choose a free variable and a polarity to branch on. Return 0 if there is none."""
+        x = self.branching_heuristics.pick(self.m.vals)
+        if x == 0:
+            return 0
         sign = self.saved_phase[x]
         if sign == 0: # no previously saved phase
-            sign = choice([-1,1])
-        return Literal(sign * x)
-
-
-    def free_vars(self):
-        """Return the list of free variables (those that are not in model m)"""
-        return [x for x in self.xs if not self.m.has_var(x)]
-    
-
-    def should_restart(self):
-        """Check if we should restart search"""
-        return self.conflict_count >= self.restart_counter[1] * RESTART_MULTIPLIER
-    
-    def reluctant_doubling(self):
-        u, v = self.restart_counter
-        self.restart_counter = (u+1,1) if (u & -u == v) else (u,2*v)
-    
-
-    def restart(self):
-        """Restart search"""
-        self.INFO(lambda: "Restart after {} conflicts\n\n\n".format(self.conflict_count), 0)
-        self.INFO(lambda: self.m, 0)
-        uv = self.m.undo(0)
-        self.branching_heuristics.on_unassign(uv)
+            sign = self.rng.choice([-1,1])
+        return 2 * x + (sign < 0)
+
+
+    def receive(self):
+        """Add the clauses learned by other solvers at the root level. Return False on conflict."""
+        self.dl = 0
+        for ns in self.import_clauses():
+            ls, trivial = normalize(ns)
+            # the sender may not have eliminated the variables that this solver did, whose values are only
+            # given by the extension of the model, and clauses over them would constrain the search wrongly
+            if trivial or len(ls) == 0 or any(l >> 1 in self.eliminated for l in ls):
+                continue
+            c = self.db.add(ls, learned=True)
+            if len(ls) == 1:
+                self.assertions.append( (ls[0], c) )
+            else:
+                self.watch(c)
+        if self.ok and self.unit_prop() != CREF_UNDEF:
+            self.ok = False
         self.dl = 1
+        return self.ok
+
+
+    def out_of_budget(self):
+        """Check if the current call to solve must give up, on a limit or an interrupt"""
+        return (self.interrupted
+                or 0 <= self.conflict_limit <= self.n_conflicts
+                or 0 <= self.propagation_limit <= self.n_propagations
+                or perf_counter() >= self.deadline)
+
+
+    def keep_partial(self):
+        """Record the trail if it is the longest reached by this call to solve"""
+        if len(self.m.trail) > len(self.best):
+            self.best = self.m.trail[:]
+
+
+    def reuse_level(self, n_assumptions):
+        """
+        Return the highest decision level a restart can keep: that of the last assumption, then
+        of the decisions on variables scored above the next one to branch on, which would be
+        picked again in the same order
+        """
+        m = self.m
+        level = min(self.dl, n_assumptions)
+        x = self.branching_heuristics.peek(m.vals)
+        if x == 0: # every variable is assigned
+            return self.dl
+        q = self.branching_heuristics.q
+        while level < self.dl and q[m.trail[m.lim[level + 1 - LEVEL_BASE]] >> 1] > q[x]:
+            level += 1
+        return level
+
+
+    def restart(self, n_assumptions=0):
+        """Restart search, keeping the decision levels that would be made again if reuse_trail is set"""
+        if self.log_level <= logging.INFO:
+            self.INFO(lambda: "Restart after {} conflicts\n\n\n".format(self.conflict_count), 0)
+            self.INFO(lambda: self.m, 0)
+        # clauses received from other solvers are asserted at the root, which needs a full restart
+        keep = 0
+        if self.reuse_trail and self.import_clauses is None:
+            keep = self.reuse_level(n_assumptions)
+            self.n_reused += max(0, keep - n_assumptions)
+        uv = self.m.undo(keep)
+        self.branching_heuristics.on_unassign(uv)
+        self.dl = keep + 1
         self.assertions = list()
-        self.reluctant_doubling()
+        self.restart_policy.on_restart()
+        self.n_restarts += 1
+        if self.trace is not None:
+            self.trace.event(RESTART, keep, self.n_restarts)
         self.conflict_count = 0
-        if len(self.learned) > self.learning_limit:
+        if len(self.learned) - self.n_core > self.learning_limit or self.over_memory():
+            t = perf_counter()
             self.forget()
-
-    def forget(self):
-        num_keep = self.learning_limit * 2 // 3
-        num_forget = len(self.learned) - num_keep
-        to_forget = sample(self.learned, k=num_forget)
-        self.INFO(lambda: "Learned {} out of {} allowed, keep {}".format(len(self.learned), self.learning_limit, num_keep))
+            if self.over_memory(): # the clauses kept are still too many
+                self.forget(core=True)
+            self.phase_time[T_FORGET] += perf_counter() - t
+        if self.warm_start and keep == 0 and self.n_conflicts >= self.sls_next:
+            self.sls_next = 2 * self.n_conflicts
+            self.local_search(self.sls_flips)
+
+    def forget(self, core=False):
+        """
+        Forget the worse half of the learned clauses. Core clauses (glue <= CORE_GLUE),
+        tier 2 clauses used since the last reduction and clauses that are reasons of
+        current assignments are kept; the others are ranked by glue, then activity.
+        If core is set, only the binary clauses and the reasons are kept out of the ranking.
+        """
+        self.memory() # the peak is reached before a reduction
+        learned, activity = self.learned, self.clause_activity
+        if core:
+            candidates = [c for c in learned if self.db.size(c) > 2 and not self.locked(c)]
+        else:
+            candidates = [c for c, glue in learned.items() if glue > CORE_GLUE and not self.locked(c)
+                          and not (glue <= TIER2_GLUE and c in self.used)]
+        candidates.sort(key=lambda c: (learned[c], -activity[c]))
+        to_forget = candidates[len(candidates) // 2:]
+        self.n_forgotten += len(to_forget)
+        if self.log_level <= logging.INFO:
+            self.INFO(lambda: "Learned {} out of {} allowed, forget {}".format(len(learned), self.learning_limit, len(to_forget)))
+        self.detach(set(to_forget)) # binary clauses are core, and never forgotten
         for c in to_forget:
-            for i in range(2):
-                l = c[i]
-                self.watched[l].remove(c)
-            self.learned.remove(c)
-        self.learning_limit *= 2
-        
+            if learned[c] <= CORE_GLUE:
+                self.n_core -= 1
+            del learned[c]
+            del activity[c]
+            if self.proof is not None:
+                self.proof.delete(self.db.clause(c))
+            self.db.delete(c)
+        self.used = set()
+        if not core:
+            self.learning_limit += LEARNING_LIMIT_INC
+        if self.max_memory is not None or self.db.wasted > GARBAGE_FRACTION * len(self.db.lits):
+            self.collect_garbage()
+        self.memory_check = 0
+
+
+    def collect_garbage(self):
+        """Compact the clause arena, and update the references to the clauses it moves"""
+        moved = self.db.collect()
+        self.n_collections += 1
+        if len(moved) == 0:
+            return
+        at = lambda c: moved.get(c, c)
+        self.cs0 = [at(c) for c in self.cs0]
+        self.cs = [at(c) for c in self.cs]
+        self.learned = {at(c): glue for c, glue in self.learned.items()}
+        self.clause_activity = {at(c): a for c, a in self.clause_activity.items()}
+        self.used = {at(c) for c in self.used}
+        for ws in self.watched:
+            for i in range(0, len(ws), 2):
+                ws[i] = at(ws[i])
+        for ws in self.binary:
+            for i in range(1, len(ws), 2):
+                ws[i] = at(ws[i])
+        reasons = self.m.reasons
+        for l in self.m.trail:
+            reasons[l >> 1] = at(reasons[l >> 1])
+        self.assertions = [(t[0], at(t[1])) + t[2:] for t in self.assertions]
+
+
+    def memory(self):
+        """Return the bytes taken by each of stats.MEMORY, and record the peaks in peak_memory"""
+        m = self.m
+        res = dict(
+            clauses=self.db.memory(),
+            watches=sum(len(ws) * ws.itemsize for ws in chain(self.watched, self.binary)),
+            trail=sum(len(a) * a.itemsize for a in (m.vals, m.levels, m.reasons, m.trail, m.lim)))
+        for k in MEMORY:
+            self.peak_memory[k] = max(self.peak_memory[k], res[k])
+        return res
+
+
+    def over_memory(self):
+        """
+        Check if the solver takes more than max_memory bytes. Measuring is linear in the number
+        of variables: under the limit, it is only done again once the clause arena has taken
+        half the room left, which the watch lists, growing slower, can not fill before it
+        """
+        if self.max_memory is None or len(self.db.lits) < self.memory_check:
+            return False
+        room = self.max_memory - sum(self.memory().values())
+        self.memory_check = len(self.db.lits) + room // (2 * self.db.lits.itemsize)
+        return room < 0
+
+
+    def derive(self, ls, learned=True):
+        """Add the clause ls, implied by the others, to the database and to the proof"""
+        if self.proof is not None:
+            self.proof.add(ls)
+        return self.db.add(ls, learned)
+
+
+    def locked(self, c):
+        """Check if clause c is the reason of a current assignment"""
+        lits = self.db.lits
+        return self.m.predecessor(lits[c + 2]) == c or self.m.predecessor(lits[c + 3]) == c
+
+
+    def glue(self, ls):
+        """Literal block distance of clause ls: the number of decision levels among its literals"""
+        return len({self.m.level_of(l) for l in ls})
+
+
+    def bump_clause(self, c):
+        """Reward learned clause c for taking part in a conflict, and tighten its glue"""
+        glue = self.learned.get(c)
+        if glue is None: # an original clause, or one that can not be forgotten
+            return
+        activity = self.clause_activity
+        activity[c] += self.clause_inc
+        if activity[c] > 1e20:
+            for k in activity:
+                activity[k] *= 1e-20
+            self.clause_inc *= 1e-20
+        if glue > CORE_GLUE:
+            glue = min(glue, self.glue(self.db.clause(c)))
+            self.learned[c] = glue
+            if glue <= CORE_GLUE:
+                self.n_core += 1
+            elif glue <= TIER2_GLUE:
+                self.used.add(c)
+
+
+    def clause_str(self, ls):
+        return "[" + ",  ".join(["{}  @{}".format(to_dimacs(l), self.m.level_of(l)) for l in ls]) + "]"
 
 
     def uip_fast(self, conflict):
-        clause_str = lambda c: "[" + ",  ".join(["{}  @{}".format(l, self.m.level_of(l)) for l in c]) + "]"
-        frontier = deque(conflict)
+        self.bump_clause(conflict)
+        frontier = deque(self.db.clause(conflict))
         frontier_set = set(frontier)
         level_count = Counter()
         for l in frontier:
             level_count[self.m.level_of(l)] += 1
 
-        end = None
+        end = -1
         frontier.append(end)
         changes = 0 # change since last seen end
         while True:
             if level_count[self.dl] == 1: break
             l = frontier.popleft()
-            if l is end and changes == 0:
+            if l == end and changes == 0:
                 break
-            
-            if l is end:
+
+            if l == end:
                 changes = 0 # reset
                 frontier.append(end)
             else:
                 reason = self.m.predecessor(l)
-                if not reason: # decision variable
+                if reason == CREF_UNDEF: # decision variable
                     frontier.append(l)
                 else:
+                    self.bump_clause(reason)
                     level_count[self.m.level_of(l)] -= 1
-                    for m in reason:
-                        if m != -l and m not in frontier_set:
+                    for m in self.db.clause(reason):
+                        if m != l ^ 1 and m not in frontier_set:
                             frontier.append(m)
                             frontier_set.add(m)
                             changes += 1
                             level_count[self.m.level_of(m)] += 1
-        
+
         assert(level_count[self.dl] == 1)
-        learned = Clause([l for l in frontier if l is not end])
-        self.INFO(lambda: "Learned {}".format(clause_str(learned)))
+        learned = [l for l in frontier if l != end]
+        if self.log_level <= logging.INFO:
+            self.INFO(lambda: "Learned {}".format(self.clause_str(learned)))
         only_true = next(filter(lambda l: self.m.level_of(l) == self.dl, learned))
         return learned, only_true
-        
-        
+
+
     def uip(self, conflict):
 
-        frontier, old_frontier = conflict, None
+        frontier, old_frontier = set(self.db.clause(conflict)), None
         at_curr_level = lambda l: self.m.level_of(l) == self.dl
-        clause_str = lambda c: "[" + ",  ".join(["{}  @{}".format(l, self.m.level_of(l)) for l in c]) + "]"
-        self.INFO(lambda: "Conflict frontier {}".format(clause_str(frontier)))
-        
+        if self.log_level <= logging.INFO:
+            self.INFO(lambda: "Conflict frontier {}".format(self.clause_str(frontier)))
+
         while True:
 
             for l in list(frontier):
                 assert(l in self.m)
                 reason = self.m.predecessor(l)
-                if reason: # not a decision literal
-                    assert(-l in reason)
-                    if reason.singleton:
+                if reason != CREF_UNDEF: # not a decision literal
+                    ls = self.db.clause(reason)
+                    assert(l ^ 1 in ls)
+                    if len(ls) == 1:
                         pass
-                        self.INFO(lambda: "Trace {} to singleton {}".format(-l, clause_str(reason)))
+                        if self.log_level <= logging.INFO:
+                            self.INFO(lambda: "Trace {} to singleton {}".format(to_dimacs(l ^ 1), self.clause_str(ls)))
                     else:
-                        self.INFO(lambda: "Trace {} to {}".format(-l, clause_str(reason)))
-                        frontier = frontier.resolve(reason, l.var)
-                        self.INFO(lambda: "Resolvent {}".format(clause_str(frontier)))
+                        if self.log_level <= logging.INFO:
+                            self.INFO(lambda: "Trace {} to {}".format(to_dimacs(l ^ 1), self.clause_str(ls)))
+                        # resolve on the variable of l
+                        frontier = {k for k in chain(frontier, ls) if k >> 1 != l >> 1}
+                        if self.log_level <= logging.INFO:
+                            self.INFO(lambda: "Resolvent {}".format(self.clause_str(frontier)))
 
             ls_curr = [l for l in frontier if at_curr_level(l)]
-            if old_frontier and old_frontier.equiv(frontier) or len(ls_curr) == 1:
+            if old_frontier == frontier or len(ls_curr) == 1:
                 break
             old_frontier = frontier
-                    
+
             # if not actual.equiv(expected):
             #     self.INFO(lambda: "expected = {}, actual = {}".format(expected, actual))
             #     assert(False)
-        
+
 
         assert(len(ls_curr) == 1)
-        learned = Clause(frontier)
+        learned = list(frontier)
         only_true = ls_curr[0]
-        self.INFO(lambda: "Learned {}".format(clause_str(learned)))
+        if self.log_level <= logging.INFO:
+            self.INFO(lambda: "Learned {}".format(self.clause_str(learned)))
         return learned, only_true
-    
+
 
     def analyze(self, conflict):
         """Analyze the conflict and return the level to which to backtrack"""
-    
+
         # learned, only_true = self.uip(conflict)
-        learned, only_true = self.uip_fast(conflict)
-        i = learned.index(only_true)
-        
-        if learned.singleton:
-            beta = self.dl - 1
+        ls, only_true = self.uip_fast(conflict)
+        ls = self.minimize(ls, only_true)
+        i = ls.index(only_true)
+
+        if len(ls) == 1:
+            beta = 0 # a learned unit holds at the root level
         else:
             # only one literal is true after backjump
-            # put that literal at index 0
-            learned[0], learned[i] = learned[i], learned[0]
+            # put that literal at index 0, and the one that is false at the highest level at index 1
+            ls[0], ls[i] = ls[i], ls[0]
+            i = max(range(1, len(ls)), key=lambda i: self.m.level_of(ls[i]))
+            ls[1], ls[i] = ls[i], ls[1]
+            beta = max(0, self.m.level_of(ls[1]))
+        learned = self.derive(ls)
+        if len(ls) > 1:
             # set up watch list for the newly learned clause
-            for i in range(2):
-                l = learned[i]
-                if l not in self.watched:
-                    self.watched[l] = set()
-                self.watched[l].add(learned)
-            beta = max(0, max([self.m.level_of(l) for l in learned if l != only_true]))
+            self.attach(learned)
+            glue = self.glue(ls)
+            self.learned[learned] = glue
+            self.clause_activity[learned] = self.clause_inc
+            if glue <= CORE_GLUE:
+                self.n_core += 1
+        self.clause_inc /= CLAUSE_DECAY
         return beta, only_true, learned
 
 
+    def minimize(self, ls, only_true):
+        """
+        Remove from the learned clause ls the literals that are false at the root level,
+        and those implied false by the other literals through their reason clauses
+        (recursive self-subsumption)
+        """
+        m = self.m
+        seen = {l >> 1 for l in ls} # variables of ls, and those known to be implied by ls
+        levels = {m.level_of(l) for l in ls}
+        res = [l for l in ls if l == only_true or
+               (m.level_of(l) > 0 and (m.predecessor(l) == CREF_UNDEF or not self.redundant(l, seen, levels)))]
+        self.n_minimized += len(ls) - len(res)
+        if len(res) < len(ls) and self.log_level <= logging.INFO:
+            self.INFO(lambda: "Minimized {}".format(self.clause_str(res)))
+        return res
+
+
+    def redundant(self, l, seen, levels):
+        """Check if the false literal l is implied by the literals whose variables are in seen"""
+        m = self.m
+        db = self.db
+        stack = [l]
+        marked = [] # variables added to seen by this call
+        while len(stack) > 0:
+            p = stack.pop()
+            for k in db.clause(m.predecessor(p)):
+                x = k >> 1
+                if x == p >> 1 or x in seen or m.level_of(k) <= 0:
+                    continue
+                # a literal decided, or implied at a level absent from the clause, cannot be removed
+                if m.predecessor(k) == CREF_UNDEF or m.level_of(k) not in levels:
+                    for y in marked:
+                        seen.remove(y)
+                    return False
+                seen.add(x)
+                marked.append(x)
+                stack.append(k)
+        return True
+
+
+    def analyze_final(self, p):
+        """Return the assumptions that imply the negation of assumption p, including p"""
+        m = self.m
+        core = [p]
+        seen = {p >> 1}
+        for l in reversed(m.trail):
+            if m.level_of(l) <= 0:
+                break
+            x = l >> 1
+            if x not in seen:
+                continue
+            reason = m.predecessor(l)
+            if reason == CREF_UNDEF: # decisions above the root are all assumptions here
+                core.append(l)
+            else:
+                for k in self.db.clause(reason):
+                    if m.level_of(k) > 0:
+                        seen.add(k >> 1)
+        return core
+
+
     def modeled_by(self):
         """Check if the CNF formula is modeled by m"""
-        return all(c.modeled_by(self.m) for c in self.cs)
+        return all(self.db.modeled_by(c, self.m) for c in self.cs)
 
 
     def __str__(self):
-        meta = "p cnf {} {}".format(len(self.vs), len(self.cs0))
-        return "\n".join([meta] + [str(c) + " 0" for c in self.cs0])
-    
+        meta = "p cnf {} {}".format(self.n_vars, len(self.cs0))
+        return "\n".join([meta] + [" ".join(map(str, self.db.to_dimacs(c) + [0])) for c in self.cs0])
+
 
     def __repr__(self):
         return str(self)
 
 
 class Model:
+    """
+    Assignment store. Each variable has a slot in the value/level/reason arrays,
+    and assigned literals are kept on a trail in assignment order, together with
+    the trail index at which each decision level starts.
+    """
+
+    def __init__(self, n_vars):
+        self.vals = array('b', [UNASSIGNED]) * (n_vars + 1) # 1 if the variable is true, 0 if false
+        self.levels = array('i', [0]) * (n_vars + 1)
+        self.reasons = array('i', [CREF_UNDEF]) * (n_vars + 1)
+        self.trail = array('i')
+        self.lim = array('i') # lim[dl - LEVEL_BASE] is where level dl starts on the trail
+
+    def grow(self, n_vars):
+        """Make room for variables up to n_vars"""
+        n = n_vars + 1 - len(self.vals)
+        self.vals.extend(array('b', [UNASSIGNED]) * n)
+        self.levels.extend(array('i', [0]) * n)
+        self.reasons.extend(array('i', [CREF_UNDEF]) * n)
 
-    def __init__(self):
-        self.alpha = dict()
-        self.at_level = defaultdict(list)
-        self.dv = set()
-    
     def has_var(self, x):
-        return x in self.alpha
-        
+        return self.vals[x] != UNASSIGNED
+
     def __contains__(self, l):
-        return l.var in self.alpha
-    
+        return self.vals[l >> 1] != UNASSIGNED
+
     def __getitem__(self, l):
         """Return the truth value of literal l under this model"""
-        return l.is_neg ^ self.alpha[l.var][0]
+        return (l & 1) ^ self.vals[l >> 1]
 
     def __len__(self):
-        return len(self.alpha)
-    
+        return len(self.trail)
+
 
     def predecessor(self, l):
-        _, _, reason = self.alpha[l.var]
-        return reason
-    
+        return self.reasons[l >> 1]
+
 
     def level_of(self, l):
-        _, dl, _ = self.alpha[l.var]
-        return dl
+        return self.levels[l >> 1]
 
 
     def commit(self, l, dl, reason):
         """Set literal l to True at level dl according to the given reason clause"""
-        x = l.var
+        x = l >> 1
         assert(x != 0)
-        self.alpha[x] = (l.is_pos, dl, reason)
-        self.at_level[dl].append(x)
-        if reason:
-            assert(l in reason)
-    
+        # open the trail segment of level dl (and of any skipped level below it)
+        while len(self.lim) <= dl - LEVEL_BASE:
+            self.lim.append(len(self.trail))
+        self.vals[x] = 1 - (l & 1)
+        self.levels[x] = dl
+        self.reasons[x] = reason
+        self.trail.append(l)
+
 
     def assign(self, l, dl):
         """Mark v as decision variable, and guess it's True"""
-        self.commit(l, dl, None)
-        self.dv.add(l.var)
-        
-    
+        self.commit(l, dl, CREF_UNDEF)
+
+
+    def flip(self, x):
+        """Negate the value of the assigned variable x, in place on the trail"""
+        i = self.trail.index(2 * x + 1 - self.vals[x])
+        self.trail[i] ^= 1
+        self.vals[x] ^= 1
+
+
     def undo(self, beta):
         """Undo assignments at level > beta"""
-        levels = [level for level in self.at_level if level > beta]
+        k = beta + 1 - LEVEL_BASE
+        if k >= len(self.lim):
+            return list()
+        start = self.lim[k]
         unassigned = list()
-        for lvl in levels:
-            for x in self.at_level[lvl]:
-                if x in self.dv:
-                    self.dv.remove(x)
-                del(self.alpha[x])
-                unassigned.append(x)
-            del(self.at_level[lvl])
+        for l in self.trail[start:]:
+            x = l >> 1
+            self.vals[x] = UNASSIGNED
+            self.reasons[x] = CREF_UNDEF
+            unassigned.append(x)
+        del self.trail[start:]
+        del self.lim[k:]
         return unassigned
-    
+
     def __str__(self):
-        to_lit = lambda x: (1 if self.alpha[x][0] else -1) * x
-        return " ".join(map(str, map(to_lit, self.alpha.keys())))
+        return " ".join(map(str, map(to_dimacs, self.trail)))
+
 
-    
     def __repr__(self):
-        is_dv = lambda x: "d" if x in self.dv else ""
-        to_lit = lambda x: (1 if self.alpha[x][0] else -1) * x
+        is_dv = lambda x: "d" if self.reasons[x] == CREF_UNDEF else ""
+        to_lit = lambda x: (1 if self.vals[x] else -1) * x
         sep = ["-"*5 + "(model)" + "-"*5]
-        if len(self.alpha) > 0:
-            return "\n".join(sep + ["{:>3}  @  {:>2}  {}".format(to_lit(x), self.alpha[x][1], is_dv(x)) \
-                for x in sorted(list(self.alpha.keys()))] + sep)
+        if len(self.trail) > 0:
+            return "\n".join(sep + ["{:>3}  @  {:>2}  {}".format(to_lit(x), self.levels[x], is_dv(x)) \
+                for x in sorted([l >> 1 for l in self.trail])] + sep)
         else:
             return "(empty model)"
-
-
-class Clause:
-
-    def __init__(self, ls):
-        global clause_counter
-        self.id = clause_counter
-        clause_counter += 1
-
-        self.ls = [l for l in ls]
-        self.singleton = len(self.ls) == 1
-        # assume non-triviality
-        self.trivial = False
-
-    @classmethod
-    def from_ns(cls, ns):
-        """ns - a list of integers representing literals"""
-
-        ls = set()
-        trivial = False
-        for n in ns:
-            l = Literal(n)
-            ls.add(l)
-            # check if both n and -n are present
-            if -l in ls:
-                trivial = True
-
-        c = cls(ls)
-        c.trivial = trivial
-        return c
-    
-    def resolve(self, other, on):
-        ls = set()
-        for l in self.ls:
-            if l.var != on:
-                ls.add(l)
-        for l in other.ls:
-            if l.var != on:
-                ls.add(l)
-        return Clause(ls)
-    
-    def equiv(self, other):
-        return len(self) == len(other) and all([l in other for l in self])
-    
-    
-    def has_var(self, x):
-        l = Literal(x)
-        return l in self.ls or -l in self.ls
-    
-    def xs(self):
-        return (l.var for l in self.ls)
-    
-    def start_watching(self):
-        res = list()
-        for l in self.ls:
-            res.append(l)
-            if len(res) == 2:
-                break
-        assert(len(res) == 2)
-        return res
-    
-    def get_only(self):
-        assert(len(self.ls) == 1)
-        return self.ls[0]
-
-    def index(self, l):
-        return self.ls.index(l)
-    
-    def __len__(self):
-        return len(self.ls)
-    
-    def __iter__(self):
-        return iter(self.ls)
-    
-    def __eq__(self, other):
-        return self.id == other.id
-    
-    def __lt__(self, other):
-        return self.id < other.id
-    
-    def __hash__(self):
-        return self.id
-
-    def __getitem__(self, i):
-        return self.ls[i]
-    
-    def __setitem__(self, i, l):
-        self.ls[i] = l
-    
-    def modeled_by(self, m):
-        """Determine if clause c can be modeled by m"""
-        # m can always model clause c if c contains free vars not captured by m
-        return any(l not in m or m[l] for l in self.ls)
-    
-    def modeled_by_modulo(self, m, v):
-        """Determine if clause c could be modeled by m if variable v were absent"""
-        return any(l not in m or m[l] for l in self.ls if l.var != v)
-
-    def __str__(self):
-        return repr(self)
-    
-    def __repr__(self):
-        return repr(self.ls)
-
-
-
-class Literal:
-    
-    def __init__(self, n):
-        self.n = n
-        self.var = abs(n)
-        self.is_pos = n > 0
-        self.is_neg = n < 0
-
-    def sign(self):
-        return 1 if self.is_pos else -1
-    
-    def __neg__(self):
-        return Literal(-self.n)
-
-    def __str__(self):
-        return str(self.n)
-    
-    def __repr__(self):
-        return str(self.n)
-    
-    def __eq__(self, other):
-        return self.n == other.n
-    
-    def __lt__(self, other):
-        return self.var < other.var and self.is_neg < other.is_neg
-    
-    def __hash__(self):
-        return self.n
\ No newline at end of file
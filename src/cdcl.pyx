@@ -1,575 +1,1747 @@
 # cython: language_level=3
 # cython: profile=False
+# cython: cdivision=True
 
 import logging as logging
-from collections import defaultdict, deque, Counter
-from random import choice, seed, sample
-from copy import copy
+from cpython cimport array
+import array
+from libc.stdlib cimport calloc, realloc, free
+from libc.string cimport memset
+from cpython.exc cimport PyErr_CheckSignals
+from random import Random
+from time import perf_counter
+from itertools import chain, product
 
-from components cimport Literal, Clause
-from components import Literal, Clause
+from components cimport ClauseDB, HEADER, LEARNED, CREF_UNDEF, UNASSIGNED, neg, var
+from components import ClauseDB, normalize, from_dimacs, to_dimacs
 from branching cimport ERMA
 from branching import ERMA
+from stats import Stats, MEMORY
+from simplify import Simplifier
+from sls import SLS, SLS_FLIPS
+from restarts cimport RestartPolicy
+from restarts import RestartPolicy, make_policy
+from events import ASSIGN, CONFLICT, LEARN, BACKJUMP, RESTART
 
 # seed(10)
 
 cdef:
-    int RESTART_MULTIPLIER = 1
+    int SHARE_SIZE = 2 # longest learned clause given to export_clause
     int LVL_DEBUG = 0
     int LVL_INFO = 1
     int LVL_WARN = 2
+    int LEVEL_BASE = -2 # lowest decision level
+    # learned clause database reduction
+    int CORE_GLUE = 2 # learned clauses of at most this glue are never forgotten
+    int TIER2_GLUE = 6 # learned clauses of at most this glue survive a reduction if used since the last one
+    int LEARNING_LIMIT_INC = 300 # increase of the number of learned clauses allowed after each reduction
+    double GARBAGE_FRACTION = 0.2 # compact the clause arena when deleted learned clauses take this fraction of it
+    double CLAUSE_DECAY = 0.999
+    # indices of phase_time, in the order of stats.PHASES
+    int T_PREPROCESS = 0
+    int T_UNIT_PROP = 1
+    int T_ANALYZE = 2
+    int T_FORGET = 3
+    int T_SIMPLIFY = 4
+    int T_LOCAL_SEARCH = 5
+    int UNSEEN = 2 # saved phase of the variables not met in any clause or assignment yet
+    int END = -1 # end of a round of the breadth-first conflict analysis
+
+RESTART_MULTIPLIER = 1
+PROBE_BUDGET = 10**6 # propagations allowed for failed literal probing
+SLS_INTERVAL = 2000 # conflicts before warm starting the phases again, doubled after each time
+
+
+cdef inline bint is_true(signed char* vals, int l) noexcept nogil:
+    return vals[var(l)] == 1 - (l & 1)
+
+cdef inline bint is_false(signed char* vals, int l) noexcept nogil:
+    return vals[var(l)] == (l & 1)
+
+
+# The propagation and conflict analysis loops run without the GIL, on C buffers only:
+# the per-variable arrays, which never move during a search, and growable vectors.
+cdef struct Vec:
+    int* data
+    int size
+    int cap
+
+cdef int reserve(Vec* v, int n) except -1 nogil:
+    """Make room for n more ints in v"""
+    cdef:
+        int cap = v.cap
+        int* data
+    if v.size + n <= cap:
+        return 0
+    while cap < v.size + n:
+        cap = 2 * cap + 8
+    data = <int*> realloc(v.data, cap * sizeof(int))
+    if data == NULL:
+        with gil:
+            raise MemoryError()
+    v.data = data
+    v.cap = cap
+    return 0
+
+cdef inline int push1(Vec* v, int x) except -1 nogil:
+    reserve(v, 1)
+    v.data[v.size] = x
+    v.size += 1
+    return 0
+
+cdef inline int push2(Vec* v, int x, int y) except -1 nogil:
+    reserve(v, 2)
+    v.data[v.size] = x
+    v.data[v.size + 1] = y
+    v.size += 2
+    return 0
+
+cdef inline int push3(Vec* v, int x, int y, int z) except -1 nogil:
+    reserve(v, 3)
+    v.data[v.size] = x
+    v.data[v.size + 1] = y
+    v.data[v.size + 2] = z
+    v.size += 3
+    return 0
+
+cdef Vec* new_vecs(int n) except NULL:
+    """Allocate n empty vectors"""
+    cdef Vec* vs = <Vec*> calloc(n, sizeof(Vec))
+    if vs == NULL:
+        raise MemoryError()
+    return vs
+
+cdef Vec* grow_vecs(Vec* vs, int n, int m) except NULL:
+    """Extend the n vectors vs with empty ones, up to m"""
+    vs = <Vec*> realloc(vs, m * sizeof(Vec))
+    if vs == NULL:
+        raise MemoryError()
+    memset(vs + n, 0, (m - n) * sizeof(Vec))
+    return vs
+
+cdef void shrink(Vec* v) noexcept:
+    """Give back the memory of v beyond its size, if that is most of it"""
+    cdef int* data
+    if v.cap <= 2 * v.size + 8:
+        return
+    data = <int*> realloc(v.data, v.size * sizeof(int)) if v.size > 0 else NULL
+    if v.size > 0 and data == NULL:
+        return # v is left as it was
+    if v.size == 0:
+        free(v.data)
+    v.data = data
+    v.cap = v.size
+
+cdef void free_vecs(Vec* vs, int n) noexcept:
+    cdef int i
+    if vs == NULL:
+        return
+    for i in range(n):
+        free(vs[i].data)
+    free(vs)
+
 
 cdef class CDCL:
+    cdef:
+        Vec* watched
+        Vec* binary
+        Vec pending # (literal, reason, level) triples waiting to be assigned, the last one first
+        Vec queue, learnt, bumped, stack, marked # conflict analysis buffers, see find_uip and redundant
+        array.array seen # per variable, for conflict analysis
+        array.array level_count, level_stamp # per decision level, for conflict analysis
+        int stamp
     cdef readonly:
         int log_level
+        int n_vars
+        ClauseDB db
         list xs, cs0, cs
-        set learned
-        dict watched
-        dict saved_phase
+        dict learned
+        int n_core
+        dict clause_activity
+        double clause_inc
+        set used
+        array.array saved_phase
+        bint warm_start
+        long sls_flips, sls_next, n_local_searches, n_flips
         list assertions
         int conflict_count
+        long n_conflicts, n_decisions, n_propagations
+        long n_minimized, n_restarts, n_learned, n_forgotten, learned_lits
+        array.array phase_time
+        double start_time
         int learning_limit
-        tuple restart_counter
+        object max_memory
+        dict peak_memory
+        long memory_check
+        long n_collections
+        RestartPolicy restart_policy
+        bint reuse_trail
+        long n_reused
         Model m
         bint sat
         int dl
         list ns
         ERMA branching_heuristics
         int n_iter
+        long probe_budget
+        object probe_time
+        dict probes
+        list equivalences
+        int n_failed, n_necessary
+        bint simplify
+        list elim_stack
+        set eliminated, frozen
+        long n_subsumed, n_strengthened
+        bint ok, preprocessed
+        list core
+        bint unknown, interrupted
+        array.array best
+        long conflict_limit, propagation_limit
+        double deadline
+        object rng
+    cdef public:
+        object export_clause, import_clauses
+        object progress
+        object proof
+        object trace
+
 
-        
     cdef INFO(self, msg, dl=None):
         if self.log_level > LVL_INFO: return
         if dl is None:
             dl = self.dl
         logging.info('  ' * max(0,dl) + str(msg()))
-    
+
     cdef DEBUG(self, msg, dl=None):
         if self.log_level > LVL_DEBUG: return
         if dl is None:
             dl = self.dl
         logging.debug('  ' * max(0,dl) + str(msg()).replace('\n', '\n' + '  ' * dl))
-    
 
-    def __init__(self, n_vars, nss, log_file="log", log_level=LVL_WARN):
-        cdef:
-            Clause c
-            bint sat
-            set xs_set
-            list stats
-            
 
-        logging.basicConfig(level=log_level, filemode='w', filename=log_file, format='%(message)s')
+    def __init__(self, n_vars=0, nss=(), log_file="log", log_level=LVL_WARN, solve=True,
+                 seed=None, restart_multiplier=RESTART_MULTIPLIER, erma_alpha=0.4,
+                 probe_budget=PROBE_BUDGET, probe_time=None, simplify=False,
+                 restart='luby', reuse_trail=False, proof=None, trace=None, max_memory=None,
+                 warm_start=False, sls_flips=SLS_FLIPS):
+        """
+        Build a solver for the clauses nss (lists of DIMACS integers) and solve it,
+        unless solve is False. More clauses can be added with add_clause, and solve
+        can be called repeatedly, under different assumptions.
+        seed, restart_multiplier and erma_alpha diversify the search.
+        restart is the name of a restart policy of restarts.POLICIES, whose intervals are
+        scaled by restart_multiplier, or a restarts.RestartPolicy. With reuse_trail, restarts
+        keep the decisions that the branching heuristic would make again.
+        proof, a proof.DRAT, receives the clauses derived and forgotten, which certify unsat answers.
+        trace, an events.EventTrace, receives the assignments, conflicts, backjumps and restarts.
+        max_memory bounds the bytes taken by the clauses, watch lists and trail, by forgetting
+        learned clauses whenever they are over it, on top of the limit on their number.
+        With warm_start, local search of sls_flips flips sets the saved phases before each
+        search, and again at restarts after SLS_INTERVAL conflicts, then twice as many, and so on.
+        Preprocessing stops probing after probe_budget propagations or probe_time seconds.
+        If simplify is set, the clauses are simplified before the first search, which
+        eliminates variables: these can not appear in later clauses or assumptions, unless
+        they are added to the set frozen beforehand.
+        """
+
+        if log_level <= LVL_INFO: # nothing is logged above, so the log file is not even created
+            logging.basicConfig(level=log_level, filemode='w', filename=log_file, format='%(message)s')
         self.log_level = log_level
 
+        self.n_vars = n_vars
+        self.db = ClauseDB() # every clause, original or learned, lives in this arena
         self.xs = list()
         self.cs0 = list() # includes trivial clauses
         self.cs = list() # non-trivial clauses
-        self.learned = set()
-        self.watched = dict() # map literal l to clauses that are watching l
+        self.learned = dict() # map each forgettable learned clause to its glue
+        self.n_core = 0 # learned clauses with glue at most CORE_GLUE
+        self.clause_activity = dict() # map each learned clause to how often it took part in conflicts, recently
+        self.clause_inc = 1.0
+        self.used = set() # tier 2 clauses that took part in a conflict since the last reduction
+        self.max_memory = max_memory
+        self.peak_memory = dict.fromkeys(MEMORY, 0) # bytes, see memory
+        self.memory_check = 0 # size of the clause arena from which over_memory measures again
+        self.n_collections = 0
+        # map literal l to the clauses of 3 or more literals that are watching l, as a flat vector of
+        # (clause, blocker) pairs, the blocker being a literal of the clause whose truth satisfies it
+        self.watched = new_vecs(2 * n_vars + 2)
+        # map literal l to the binary clauses containing l, as a flat vector of (other literal, clause) pairs
+        self.binary = new_vecs(2 * n_vars + 2)
+        self.seen = array.array('b', [0]) * (n_vars + 1)
+        self.level_count = array.array('i')
+        self.level_stamp = array.array('i')
+        self.stamp = 0
         self.assertions = list() # literals to be assigned true
         self.conflict_count = 0
+        # totals over the whole run
+        self.n_conflicts = 0
+        self.n_decisions = 0
+        self.n_propagations = 0
+        self.n_minimized = 0 # literals removed from learned clauses by minimize
+        self.n_restarts = 0
+        self.n_learned = 0
+        self.n_forgotten = 0
+        self.learned_lits = 0 # total length of the learned clauses
+        self.phase_time = array.array('d', [0]) * 6 # seconds spent in each of stats.PHASES
+        self.start_time = perf_counter()
+        self.progress = None # called with the solver every 256 conflicts and when solve returns, see stats.Progress
 
-        
+        if not isinstance(restart, RestartPolicy):
+            restart = make_policy(restart, restart_multiplier)
+        self.restart_policy = restart
+        self.reuse_trail = reuse_trail
+        self.n_reused = 0 # decision levels kept by restarts
+        self.rng = Random(seed)
+
+        # clause sharing with other solvers: export_clause receives each short learned
+        # clause, and import_clauses returns the clauses to add at the next restart
+        self.export_clause = None
+        self.import_clauses = None
+        self.proof = proof
+        self.trace = trace
 
-        # restart using Knuth's reluctant doubleing sequence
-        self.restart_counter = (1, 1)
-        
         # decision levels:
         #   -2 :: assertions of singleton clauses and implied literals in pre-processing stage
         #   -1 :: decision level for pre-processing stage
-        #  > 0 :: normal decisions
-        self.m = Model()
+        #    0 :: literals implied after backjumping to the root, kept between calls to solve
+        #  > 0 :: normal decisions, starting with one level per assumption
+        self.m = Model(n_vars)
         self.sat = False
         self.dl = -2
-        
-        xs_set = set()
-        # process clauses and variables
-        for ns in nss:
-            c = Clause.from_ns(ns)
-            self.cs0.append(c)
-            if not c.trivial:
-                if c.singleton: # singleton clause
-                    self.assertions.append( (c.get_only(), c) )
-                else:
-                    self.cs.append(c)
-                    for x in c.xs():
-                        if x not in xs_set:
-                            xs_set.add(x)
-                            self.xs.append(x)
-        
-        self.saved_phase = {x: 0 for x in self.xs}
-        
-        self.learning_limit = max(len(self.cs) // 2, 100)
-
-        self.branching_heuristics = ERMA(self.xs)
+        self.ok = True # False once the clauses alone are known to be unsatisfiable
+        self.preprocessed = False
+        self.core = list() # failed assumptions of the last unsat call to solve
+        self.unknown = False # whether the last call to solve stopped before an answer
+        self.interrupted = False
+        self.best = array.array('i') # longest trail reached by the last call to solve
+        # limits of the current call to solve, as totals over the whole run; negative for none
+        self.conflict_limit = self.propagation_limit = -1
+        self.deadline = float('inf')
+
+        # 1 or -1 for the last value of each variable, 0 if it has none yet, UNSEEN if it is in no clause
+        self.saved_phase = array.array('b', [UNSEEN]) * (n_vars + 1)
+        self.warm_start = warm_start
+        self.sls_flips = sls_flips
+        self.sls_next = SLS_INTERVAL # conflicts before the next warm start at a restart
+        self.n_local_searches = 0
+        self.n_flips = 0
+
+        self.branching_heuristics = ERMA(n_vars, self.xs, alpha=erma_alpha)
 
         self.n_iter = 0
-        self.sat = self.preprocess()
-
-        if self.sat:
-            self.sat = self.run()
-        
-        stats = []
-        stats.append("Statistics")
-        stats.append("Pre-propcessing iterations: %d" % self.n_iter)
-        stats.append("Learned clauses: %d" % len(self.learned))
-        self.INFO("\n".join(stats), 0)
-    
+        self.probe_budget = probe_budget
+        self.probe_time = probe_time
+        self.probes = dict() # map each probed literal to the set of literals it implied
+        self.equivalences = list() # pairs of literals found equivalent by probing
+        self.n_failed = 0
+        self.n_necessary = 0
+        self.simplify = simplify
+        self.elim_stack = list() # clauses removed by variable elimination, see Simplifier
+        self.eliminated = set()
+        self.frozen = set() # variables that simplification must not eliminate
+        self.n_subsumed = 0
+        self.n_strengthened = 0
+
+        for ns in nss:
+            self.add_clause(ns)
+
+        if solve:
+            self.solve()
+
+
+    def __dealloc__(self):
+        free_vecs(self.watched, 2 * self.n_vars + 2)
+        free_vecs(self.binary, 2 * self.n_vars + 2)
+        free(self.pending.data)
+        free(self.queue.data)
+        free(self.learnt.data)
+        free(self.bumped.data)
+        free(self.stack.data)
+        free(self.marked.data)
+
+
+    def add_clause(self, ns):
+        """Add the clause ns, a list of DIMACS integers, and return its reference"""
+        cdef:
+            int c, l, x, top
+            list ls
+            bint trivial
+
+        if self.preprocessed:
+            self.cancel()
+        ls, trivial = normalize(ns)
+        self.check_eliminated(ls)
+        top = max([var(l) for l in ls], default=0)
+        if top > self.n_vars:
+            self.grow(top)
+        c = self.db.add(ls)
+        self.cs0.append(c)
+        if not trivial:
+            if len(ls) == 0: # empty clause
+                self.ok = False
+            elif len(ls) == 1: # singleton clause
+                self.assertions.append( (ls[0], c) )
+            else:
+                self.cs.append(c)
+                for l in ls:
+                    x = var(l)
+                    if self.saved_phase.data.as_schars[x] == UNSEEN:
+                        self.saved_phase.data.as_schars[x] = 0
+                        self.xs.append(x)
+                        self.branching_heuristics.add_var(x)
+                if self.preprocessed:
+                    self.watch(c)
+        return c
+
+
+    cdef grow(self, int n_vars):
+        """Make room for variables up to n_vars"""
+        self.memory_check = 0
+        self.watched = grow_vecs(self.watched, 2 * self.n_vars + 2, 2 * n_vars + 2)
+        self.binary = grow_vecs(self.binary, 2 * self.n_vars + 2, 2 * n_vars + 2)
+        self.seen.extend(array.array('b', [0]) * (n_vars - self.n_vars))
+        self.saved_phase.extend(array.array('b', [UNSEEN]) * (n_vars - self.n_vars))
+        self.m.grow(n_vars)
+        self.branching_heuristics.grow(n_vars)
+        self.n_vars = n_vars
+
+
+    cdef watch(self, int c):
+        """Set up the watched literals of a clause added at the root level"""
+        cdef:
+            Model m = self.m
+            int i, k, l, l0, l1
+        # move the literals that are not false to the front
+        k = 0
+        for i, l in enumerate(self.db.clause(c)):
+            if l not in m or m[l]:
+                self.db.swap(c, i, k)
+                k += 1
+        l0, l1 = self.db.clause(c)[:2]
+        if k == 0:
+            self.ok = False # falsified at the root level
+        elif k == 1 and l0 not in m:
+            self.assertions.append( (l0, c) )
+        self.attach(c)
+
+
+    cdef attach(self, int c):
+        """Watch the first two literals of clause c"""
+        cdef:
+            int* lits = self.db.lits.data.as_ints
+            int l0 = lits[c + HEADER], l1 = lits[c + HEADER + 1]
+        if lits[c] == 2:
+            push2(&self.binary[l0], l1, c)
+            push2(&self.binary[l1], l0, c)
+        else:
+            push2(&self.watched[l0], c, l1)
+            push2(&self.watched[l1], c, l0)
+
+
+    cdef detach(self, set cs):
+        """Stop watching the clauses in the set cs, none of which is binary"""
+        cdef:
+            int* lits = self.db.lits.data.as_ints
+            int* w
+            Vec* ws
+            int c, l, i, j
+        for l in {lits[c + HEADER + i] for c in cs for i in range(2)}:
+            ws = &self.watched[l]
+            w = ws.data
+            j = 0
+            for i in range(0, ws.size, 2):
+                if w[i] not in cs:
+                    w[j] = w[i]
+                    w[j + 1] = w[i + 1]
+                    j += 2
+            ws.size = j
+
+
+    cdef cancel(self):
+        """Backtrack to the root level, where the formula can be modified"""
+        self.backtrack(0)
+        self.dl = 0
+
+
+    cdef void backtrack(self, int beta) noexcept nogil:
+        """Undo the assignments above level beta, and hand their variables back to the branching heuristic"""
+        cdef int k = beta + 1 - LEVEL_BASE, start
+        if k >= self.m.n_levels:
+            return
+        start = self.m.lim.data.as_ints[k]
+        self.branching_heuristics.on_unassign(self.m.trail.data.as_ints + start, self.m.size - start)
+        self.m.undo(beta)
+
+
+    def solve(self, assumptions=(), max_conflicts=None, max_propagations=None, max_time=None, local=False):
+        """
+        Decide satisfiability under assumptions, a list of DIMACS integers. Learned
+        clauses, watches, saved phases and branching scores carry over between calls.
+        Return True if sat (the model is in m); otherwise the subset of assumptions
+        responsible is left in core, which is empty if the clauses alone are unsat.
+        The search gives up after max_conflicts conflicts, max_propagations propagations
+        or max_time seconds in this call, or when interrupt is called: solve then returns
+        None, and the longest trail it reached is in partial.
+        With local, only local search runs, in rounds of sls_flips flips, until it finds a model
+        or reaches a limit: it can not prove unsatisfiability, so solve returns None instead.
+        """
+        cdef:
+            list ls, stats
+            int l, top
+            bint found
+
+        self.core = list()
+        self.unknown = False
+        self.best = array.array('i')
+        self.conflict_limit = -1 if max_conflicts is None else self.n_conflicts + max_conflicts
+        self.propagation_limit = -1 if max_propagations is None else self.n_propagations + max_propagations
+        self.deadline = float('inf') if max_time is None else perf_counter() + max_time
+        ls = [from_dimacs(n) for n in assumptions]
+        self.check_eliminated(ls)
+        top = max([var(l) for l in ls], default=0)
+        if top > self.n_vars:
+            self.grow(top)
+
+        if self.preprocessed:
+            self.cancel()
+            if self.ok and self.unit_prop() != CREF_UNDEF:
+                self.ok = False
+        elif self.ok:
+            if self.simplify:
+                t = perf_counter()
+                self.ok = self.simplify_clauses({var(l) for l in ls} | self.frozen)
+                self.phase_time[T_SIMPLIFY] += perf_counter() - t
+            self.learning_limit = max(len(self.cs) // 2, 100)
+            if self.ok:
+                t = perf_counter()
+                self.ok = self.preprocess()
+                self.phase_time[T_PREPROCESS] += perf_counter() - t
+            self.preprocessed = True
+
+        if self.ok and (self.warm_start or local):
+            found = self.local_search(self.sls_flips, ls)
+            while local and not found and not self.out_of_budget():
+                found = self.local_search(self.sls_flips, ls)
+            # a model found sets every phase, and the search follows them without conflict
+            self.unknown = local and not found
+        self.sat = self.ok and not self.unknown and self.run(ls) is not None
+        self.interrupted = False
+        if not self.sat and not self.unknown and len(self.core) == 0 and self.proof is not None:
+            self.proof.add([]) # the clauses alone are unsat
+
+        if self.log_level <= LVL_INFO:
+            self.INFO(lambda: self.stats, 0)
+        if self.progress is not None:
+            self.progress(self, force=True)
+        return None if self.unknown else self.sat
+
+
+    def interrupt(self):
+        """Make the running call to solve, or else the next one, give up as soon as possible"""
+        self.interrupted = True
+
+
+    def models(self, projection=None, limit=None, assumptions=(), max_conflicts=None, max_propagations=None,
+               max_time=None):
+        """
+        Enumerate the models under assumptions, as lists of DIMACS integers over the variables
+        of projection (every variable if None), any two of which differ on these variables.
+        After each model, the solver keeps its state and gets a clause blocking it, which stays
+        once the enumeration is over. It stops after limit models, when none is left, or on the
+        search limits of solve, which apply to the whole enumeration: unknown is then set.
+        The variables of projection are frozen, and can not have been eliminated already.
+        """
+        xs = range(1, self.n_vars + 1) if projection is None else list(projection)
+        self.check_eliminated([2 * x for x in xs])
+        if max(xs, default=0) > self.n_vars:
+            self.grow(max(xs))
+        self.frozen.update(xs)
+        conflict_limit = None if max_conflicts is None else self.n_conflicts + max_conflicts
+        propagation_limit = None if max_propagations is None else self.n_propagations + max_propagations
+        deadline = None if max_time is None else perf_counter() + max_time
+        n = 0
+        while limit is None or n < limit:
+            if not self.solve(assumptions,
+                              None if conflict_limit is None else max(0, conflict_limit - self.n_conflicts),
+                              None if propagation_limit is None else max(0, propagation_limit - self.n_propagations),
+                              None if deadline is None else deadline - perf_counter()):
+                return
+            model = [x if self.m.vals[x] == 1 else -x for x in xs if self.m.has_var(x)]
+            # variables in no clause are unassigned, and each of their values gives a model
+            free = [x for x in xs if not self.m.has_var(x)]
+            values = {abs(k): k for k in model}
+            for signs in product((1, -1), repeat=len(free)):
+                if limit is not None and n >= limit:
+                    return
+                values.update((x, sign * x) for x, sign in zip(free, signs))
+                n += 1
+                yield [values[x] for x in xs]
+            self.add_clause([-k for k in model])
+
+
+    @property
+    def partial(self):
+        """The longest trail reached by the last call to solve, as DIMACS integers"""
+        return [to_dimacs(l) for l in self.best]
+
+
+    def local_search(self, long max_flips, assumptions=()):
+        """
+        Look for a model of the clauses by local search from the saved phases, for at most
+        max_flips flips, with the root level assignments and the assumption literals fixed.
+        Save the phases of the best assignment found, and return True if it is a model.
+        """
+        cdef:
+            int l, x
+            array.array fixed = array.array('b', self.m.vals)
+            signed char* phase = self.saved_phase.data.as_schars
+            bint found
+        t = perf_counter()
+        for l in assumptions:
+            if fixed.data.as_schars[var(l)] == UNASSIGNED:
+                fixed.data.as_schars[var(l)] = 1 - (l & 1)
+        sls = SLS(self.n_vars, self.db, self.cs, fixed, self.rng)
+        found = sls.run(self.saved_phase, max_flips)
+        for x in range(1, self.n_vars + 1):
+            if phase[x] != UNSEEN and fixed.data.as_schars[x] == UNASSIGNED:
+                phase[x] = 1 if sls.best[x] else -1
+        self.n_local_searches += 1
+        self.n_flips += sls.n_flips
+        if self.log_level <= LVL_INFO:
+            self.INFO(lambda: "Local search: {} flips, model found: {}".format(sls.n_flips, found), 0)
+        self.phase_time[T_LOCAL_SEARCH] += perf_counter() - t
+        return found
+
+
+    cdef check_eliminated(self, list ls):
+        cdef int l
+        for l in ls:
+            if var(l) in self.eliminated:
+                raise ValueError("variable {} was eliminated by simplification".format(var(l)))
+
+
+    cdef bint simplify_clauses(self, set frozen):
+        """
+        Replace the clauses by their simplification, keeping the variables in frozen and those
+        of singleton clauses. Eliminated variables are given a placeholder value at level -2,
+        corrected by Simplifier.extend once a model is found. Return False if unsat.
+        """
+        cdef:
+            ClauseDB db = self.db
+            int c, x
+            list ls
+            bint ok
+        frozen = frozen | {var(t[0]) for t in self.assertions}
+        s = Simplifier(self.n_vars, [db.clause(c) for c in self.cs], frozen, proof=self.proof,
+                       stop=lambda: self.out_of_budget())
+        ok = s.run()
+        self.n_subsumed += s.n_subsumed
+        self.n_strengthened += s.n_strengthened
+        for c in self.cs:
+            db.delete(c)
+        self.cs = list()
+        for ls in s.clauses.values():
+            c = db.add(ls)
+            if len(ls) == 1:
+                self.assertions.append( (ls[0], c) )
+            elif len(ls) > 1:
+                self.cs.append(c)
+        self.elim_stack.extend(s.stack)
+        self.eliminated.update(s.eliminated)
+        for x in s.eliminated:
+            self.assertions.append( (2 * x, CREF_UNDEF, -2) )
+        if self.log_level <= LVL_INFO:
+            self.INFO(lambda: "Simplified: {} eliminated variables, {} subsumed and {} strengthened clauses".format(
+                len(s.eliminated), s.n_subsumed, s.n_strengthened), 0)
+        return ok
+
+
+    @property
+    def stats(self):
+        """Cumulative statistics of the solver, as a stats.Stats snapshot"""
+        return Stats(self)
+
 
     cdef bint preprocess(self):
         """Set up watched literals, and infer as much as possible without decision"""
         cdef:
-            Clause c
-            Literal l
-            list cs_trivial = list()
-            int fixpoint
-            int x
-            Literal pos, neg
-            
-        
+            ClauseDB db = self.db
+            int c, l, x, start
+            long budget
+            list occurs
+            set dirty, changed
+            dict roots
+            object deadline
+
         for c in self.cs:
-            for l in c.start_watching():
-                if l not in self.watched:
-                    self.watched[l] = set()
-                self.watched[l].add(c)
+            self.attach(c)
 
-        if self.unit_prop():
+        if self.unit_prop() != CREF_UNDEF:
             return False
-        
-        # try both polarities of each variable
+
+        # failed literal probing, within a budget of propagations and time
         self.dl = -1
-        fixpoint = 2 # needs 2 iterations to detect fixpoint
-        while fixpoint > 0:
-            # if self.n_iter > 10:
-                # break
+        budget = self.n_propagations + self.probe_budget
+        deadline = None if self.probe_time is None else perf_counter() + self.probe_time
+        occurs = [[] for _ in range(self.n_vars + 1)] # clauses of each variable
+        for c in self.cs:
+            for x in db.xs(c):
+                (<list> occurs[x]).append(c)
+        dirty = None # variables whose neighbourhood changed in the last round, None to probe all
+        while dirty is None or len(dirty) > 0:
+            start = self.m.size
+            changed = set() # variables of the binary clauses added in this round
+            roots = self.probe_roots()
             for x in self.xs:
-                if x in self.m.alpha:
+                if self.n_propagations >= budget or (deadline is not None and perf_counter() >= deadline):
+                    if self.log_level <= LVL_INFO:
+                        self.INFO(lambda: "Probing budget exhausted")
+                    return True
+                if self.out_of_budget(): # the search gives up right away
+                    return True
+                if self.m.has_var(x):
                     continue
-                pos, neg = Literal(x), Literal(-x)
-                
-                # try pos
-                self.INFO(lambda: "Try {}".format(pos))
-                self.assertions.append( (pos, None) )
-                conflict = self.unit_prop()
-                uv = self.m.undo(-2)
-                self.branching_heuristics.on_unassign(uv)
-                
-                # pos bad ==> assert neg
-                if conflict:
-                    fixpoint = 2
-                    self.INFO(lambda: "pos bad ==> assert neg")
-                    self.assertions.append( (neg, Clause([neg]), -2) )
-                    # neg also bad
-                    conflict = self.unit_prop()
-                    if conflict:
-                        self.INFO(lambda: "neg also bad")
-                        return False
-                
-                # pos good ==> try neg
-                else:
-                    self.INFO(lambda: "pos ok ==> try neg")
-                    self.assertions.append( (neg, None) )
-                    conflict = self.unit_prop()
-                    uv = self.m.undo(-2)
-                    self.branching_heuristics.on_unassign(uv)
-
-                    # neg bad ==> assert pos
-                    if conflict:
-                        fixpoint = 2
-                        self.INFO(lambda: "neg bad ==> assert pos")
-                        self.assertions.append( (pos, Clause([pos]), -2) )
-                        assert(not self.unit_prop())
-                    # neg good ==> no info
-                    else:
-                        pass
-                        self.INFO(lambda: "neg ok ==> no info")
-
-                # DEBUG(self.dl, str(self.m))
-                # DEBUG(self.dl, "")
-            fixpoint -= 1
-            self.INFO(lambda: "fixpoint={}".format(fixpoint))
+                if not self.probe_var(x, roots, dirty, changed):
+                    return False
             self.n_iter += 1
+            # only probes close to the newly fixed variables may give something new
+            dirty = set(changed)
+            for l in self.m.trail[start:self.m.size]:
+                for c in occurs[var(l)]:
+                    dirty.update(db.xs(c))
+            if self.log_level <= LVL_INFO:
+                self.INFO(lambda: "{} variables changed".format(len(dirty)))
+        return True
+
+
+    cdef dict probe_roots(self):
+        """
+        Return the literals worth probing, each mapped to the set of literals equivalent to it: one
+        of each strongly connected component of the binary implication graph that no literal out
+        of it implies, found by Tarjan's algorithm. Probing it implies the whole component, and
+        all that the others imply. Most are roots, in no binary clause, but the literals of a
+        cycle are all implied, by each other.
+        """
+        cdef:
+            int n = 2 * self.n_vars + 2
+            Vec* binary = self.binary
+            array.array index_ = array.array('i', [-1]) * n, low_ = array.array('i', [0]) * n
+            array.array comp_ = array.array('i', [-1]) * n, stack_ = array.array('i', [0]) * n
+            array.array path_ = array.array('i', [0]) * n, next_ = array.array('i', [0]) * n
+            int* index = index_.data.as_ints
+            int* low = low_.data.as_ints
+            int* comp = comp_.data.as_ints
+            int* stack = stack_.data.as_ints
+            int* path = path_.data.as_ints # the literals on the search path
+            int* next = next_.data.as_ints # the position of the next edge of each literal on the path
+            int n_stack = 0, n_path, n_index = 0, n_comps = 0
+            int r, l, k, i
+            Vec* ws
+            array.array implied
+            dict members = dict()
+        for r in range(2, n):
+            if index[r] >= 0:
+                continue
+            index[r] = low[r] = n_index
+            n_index += 1
+            stack[n_stack] = r
+            n_stack += 1
+            path[0], next[0], n_path = r, 0, 1
+            while n_path > 0:
+                l = path[n_path - 1]
+                ws = &binary[neg(l)] # l implies the other literal of each binary clause of -l
+                i = next[n_path - 1]
+                if i < ws.size:
+                    next[n_path - 1] = i + 2
+                    k = ws.data[i]
+                    if index[k] < 0:
+                        index[k] = low[k] = n_index
+                        n_index += 1
+                        stack[n_stack] = k
+                        n_stack += 1
+                        path[n_path], next[n_path] = k, 0
+                        n_path += 1
+                    elif comp[k] < 0: # on the stack
+                        low[l] = min(low[l], index[k])
+                    continue
+                n_path -= 1
+                if n_path > 0:
+                    low[path[n_path - 1]] = min(low[path[n_path - 1]], low[l])
+                if low[l] == index[l]:
+                    while True:
+                        n_stack -= 1
+                        k = stack[n_stack]
+                        comp[k] = n_comps
+                        if k == l:
+                            break
+                    n_comps += 1
+        implied = array.array('b', [0]) * n_comps
+        for l in range(2, n):
+            ws = &binary[l]
+            for i in range(0, ws.size, 2): # -k implies l
+                if comp[neg(ws.data[i])] != comp[l]:
+                    implied.data.as_schars[comp[l]] = 1
+        for l in range(2, n):
+            if not implied.data.as_schars[comp[l]]:
+                members.setdefault(comp[l], set()).add(l)
+        return {min(ls): ls for ls in members.values()}
+
+
+    cdef bint probe_var(self, int x, dict roots, set dirty, set changed):
+        """
+        Probe the polarities of x that are in roots, see probe_roots, and assert
+        at level -2 the literals found to be failed or necessary. Literals found equivalent
+        to x are linked by binary clauses, whose variables are added to changed.
+        Return False if the clauses are unsatisfiable.
+        """
+        cdef:
+            dict implied = dict()
+            set pos, neg_
+            int l, k, conflict
+            list ls
+        for l in (2 * x, 2 * x + 1):
+            # the other literals are implied by one of roots, probed instead
+            if l not in roots:
+                continue
+            if dirty is not None and l in self.probes and \
+                    x not in dirty and dirty.isdisjoint(var(k) for k in self.probes[l]):
+                implied[l] = self.probes[l]
+                continue
+            if self.log_level <= LVL_INFO:
+                self.INFO(lambda: "Try {}".format(to_dimacs(l)))
+            conflict, ls = self.probe(l)
+            if conflict != CREF_UNDEF: # l failed
+                if self.log_level <= LVL_INFO:
+                    self.INFO(lambda: "{} failed".format(to_dimacs(l)))
+                self.n_failed += 1
+                self.probes.pop(l, None)
+                self.assertions.append( (neg(l), self.derive([neg(l)], learned=False), -2) )
+                return self.unit_prop() == CREF_UNDEF
+            implied[l] = self.probes[l] = set(ls)
+
+        if len(implied) < 2:
+            return True
+        pos, neg_ = implied[2 * x], implied[2 * x + 1]
+        # implied by both polarities
+        for k in pos & neg_:
+            if k not in self.m:
+                if self.log_level <= LVL_INFO:
+                    self.INFO(lambda: "{} necessary".format(to_dimacs(k)))
+                self.n_necessary += 1
+                # x implies k and -x implies k, which imply k
+                if self.proof is not None:
+                    self.proof.add([2 * x + 1, k])
+                    self.proof.add([2 * x, k])
+                self.assertions.append( (k, self.derive([k], learned=False), -2) )
+                if self.proof is not None:
+                    self.proof.delete([2 * x + 1, k])
+                    self.proof.delete([2 * x, k])
+        if self.unit_prop() != CREF_UNDEF:
+            return False
+        # x implies k, and -x implies -k
+        for k in pos:
+            if neg(k) in neg_ and k not in <set> roots[2 * x] and k not in self.m:
+                if self.log_level <= LVL_INFO:
+                    self.INFO(lambda: "{} equivalent to {}".format(to_dimacs(k), to_dimacs(2 * x)))
+                self.equivalences.append( (2 * x, k) )
+                for ls in ([2 * x + 1, k], [2 * x, neg(k)]):
+                    self.attach(self.derive(ls))
+                changed.update((x, var(k)))
         return True
 
 
-    def run(self):
-        """Run CDCL. Return the model if SAT, or None otherwise"""
-        
+    cdef tuple probe(self, int l):
+        """Propagate l at level -1 and take it back. Return the conflict, if any, and the literals implied."""
+        cdef:
+            Model m = self.m
+            int start = m.size
+            int conflict
+            list implied
+        self.assertions.append( (l, CREF_UNDEF) )
+        conflict = self.unit_prop()
+        implied = m.trail[start + 1:m.size].tolist()
+        self.backtrack(-2)
+        return conflict, implied
+
+
+    def run(self, assumptions=()):
+        """Run CDCL under the given assumption literals. Return the model if SAT, or None otherwise"""
+        cdef:
+            int l, k, conflict, beta, only_true, learned
+
         self.dl = 1
         while True:
-            free = self.free_vars()
-            if len(free) == 0:
-                break
-            l = self.branch(free)
-            self.assertions.append( (l, None) )
-            
+            if self.out_of_budget():
+                self.unknown = True
+                self.keep_partial()
+                return None
+            if self.dl <= len(assumptions):
+                # assumption i is decided at level i + 1
+                l = assumptions[self.dl - 1]
+                if l in self.m:
+                    if not self.m[l]:
+                        self.core = [to_dimacs(k) for k in self.analyze_final(l)]
+                        return None
+                    self.dl += 1 # already true, leave its level empty
+                    continue
+            else:
+                l = self.branch()
+                if l == 0: # every variable is assigned
+                    break
+            self.assertions.append( (l, CREF_UNDEF) )
+            self.n_decisions += 1
+
             conflict = self.unit_prop()
 
             # DEBUG(self.dl, self.m)
 
-            while conflict:
+            while conflict != CREF_UNDEF:
+                self.keep_partial()
                 self.conflict_count += 1
-                beta, only_true, learned = self.analyze(conflict)
-                if beta < 0:
+                self.n_conflicts += 1
+                if self.trace is not None:
+                    self.trace.event(CONFLICT, conflict, self.dl, self.n_conflicts)
+                if self.dl <= 0: # conflict without any decision, so the clauses alone are unsat
+                    self.ok = False
                     return None
-                else:
+                t = perf_counter()
+                beta, only_true, learned = self.analyze(conflict)
+                self.phase_time[T_ANALYZE] += perf_counter() - t
+                self.n_learned += 1
+                self.learned_lits += self.db.size(learned)
+                self.restart_policy.after_conflict(self.learned.get(learned, 1), self.m.size)
+                if self.progress is not None and self.n_conflicts % 256 == 0:
+                    self.progress(self)
+                if self.trace is not None:
+                    self.trace.event(LEARN, learned, self.db.size(learned), self.learned.get(learned, 1))
+                    self.trace.event(BACKJUMP, self.dl, beta, to_dimacs(only_true))
+                if self.log_level <= LVL_INFO:
                     self.INFO(lambda: "Backtrack to level {}".format(beta))
-                    if not learned.singleton:
-                        self.learned.add(learned)
-                    self.branching_heuristics.after_conflict(learned, conflict)
-                    # assert(self.m[only_true])
-                    uv = self.m.undo(beta)
-                    self.branching_heuristics.on_unassign(uv)
-                    self.dl = beta
-                    self.INFO(lambda: "Assert {}".format(only_true))
-                    self.assertions.append( (only_true, learned) )
-                    conflict = self.unit_prop()
+                if self.export_clause is not None and self.db.size(learned) <= SHARE_SIZE:
+                    self.export_clause(self.db.to_dimacs(learned))
+                self.branching_heuristics.after_conflict(self.db, learned, conflict)
+                # assert(self.m[only_true])
+                self.backtrack(beta)
+                self.dl = beta
+                if self.log_level <= LVL_INFO:
+                    self.INFO(lambda: "Assert {}".format(to_dimacs(only_true)))
+                self.assertions.append( (only_true, learned) )
+                conflict = self.unit_prop()
 
                 # DEBUG(self.dl, self.m)
 
-            if self.should_restart():
-                self.restart()
+            if self.restart_policy.should_restart():
+                self.restart(len(assumptions))
+                if self.import_clauses is not None and not self.receive():
+                    return None
             else:
                 self.dl += 1
-        
+
         assert(self.modeled_by()) # make sure that, if sat, the model is indeed correct
-        
+        Simplifier.extend(self.elim_stack, self.m)
+
         return self.m
 
-    
+
     def watch_correct(self):
-        assert(all([c in self.watched[l] for c in self.cs for l in [c[0], c[1]]]))
-        assert(all([l in c[:2] for (l, cs) in self.watched.items() for c in cs]))
-        
-    
-    cdef unit_prop(self):
+        db = self.db
+        binary = [[self.binary[l].data[i] for i in range(self.binary[l].size)] for l in range(2 * self.n_vars + 2)]
+        watched = [[self.watched[l].data[i] for i in range(self.watched[l].size)] for l in range(2 * self.n_vars + 2)]
+        for c in self.cs:
+            for l in db.clause(c)[:2]:
+                if db.size(c) == 2:
+                    assert(c in binary[l][1::2])
+                else:
+                    assert(c in watched[l][0::2])
+        assert(all([l in db.clause(c)[:2] for l, ws in enumerate(watched) for c in ws[0::2]]))
+
+
+    cdef int unit_prop(self):
         """Attempt to apply unit propagation using the current model. Return a conflict, if any"""
         cdef:
-            Literal l, l_other, lk
-            Clause reason
+            double t = perf_counter()
+            int conflict = self.propagate()
+        self.phase_time[T_UNIT_PROP] += perf_counter() - t
+        return conflict
+
+
+    cdef int propagate(self) except -2:
+        """Body of unit_prop, which times it"""
+        cdef:
+            Model m = self.m
+            int start = m.size, conflict, i, l
             tuple t
-            int dl
-            set watched_new
-            int i, j, k
-            
-
-        while len(self.assertions) > 0: # exit loop when no more literal is pending
-            
-            t = self.assertions.pop()
-
-            if len(t) == 2:
-                l, reason = t
-                dl = self.dl
-            elif len(t) == 3:
-                l, reason, dl = t
-
-            if l in self.m:
-                if not self.m[l]:
-                    self.assertions = list()
+        m.reserve_levels(self.dl)
+        # the pending assertions move to a C stack in the same order, so the last one is assigned first
+        for t in self.assertions:
+            push3(&self.pending, t[0], t[1], t[2] if len(t) == 3 else self.dl)
+        self.assertions = list()
+        with nogil:
+            conflict = self.propagate_pending()
+        if self.log_level <= LVL_INFO:
+            for i in range(start, m.size):
+                l = m.trail.data.as_ints[i]
+                if m.predecessor(l) != CREF_UNDEF: # implied
+                    self.INFO(lambda: "{:>3}  @  {}  {}".format(to_dimacs(l), self.dl, self.db.to_dimacs(m.predecessor(l))))
+                else: # guessed
+                    self.INFO(lambda: "{:>3}  @  {}  ----------d----------".format(to_dimacs(l), self.dl))
+        if self.trace is not None:
+            for i in range(start, m.size):
+                l = m.trail.data.as_ints[i]
+                self.trace.event(ASSIGN, to_dimacs(l), m.level_of(l), m.predecessor(l))
+        return conflict
+
+
+    cdef int propagate_pending(self) except -2 nogil:
+        """Assign the pending literals and those they imply. Return a conflict, if any."""
+        cdef:
+            Vec* pending = &self.pending
+            Vec* ws
+            int* lits = self.db.lits.data.as_ints
+            signed char* vals = self.m.vals.data.as_schars
+            signed char* phase = self.saved_phase.data.as_schars
+            int* w
+            int l, nl, l_other, lk, reason, b, dl
+            int c, start, i, j, k, n
+
+        while pending.size > 0: # exit loop when no more literal is pending
+
+            pending.size -= 3
+            l = pending.data[pending.size]
+            reason = pending.data[pending.size + 1]
+            dl = pending.data[pending.size + 2]
+
+            if vals[var(l)] != UNASSIGNED:
+                if is_false(vals, l):
+                    pending.size = 0
                     return reason # conflict
                 else:
                     continue # inferred literal is consistent with the model
-            
-            # update the model
-            if reason: # implied
-                self.m.commit(l, dl, reason)
-                self.INFO(lambda: "{:>3}  @  {}  {}".format(str(l), self.dl, reason))
-            else: # guessed
-                self.m.assign(l, dl)
-                self.INFO(lambda: "{:>3}  @  {}  ----------d----------".format(str(l), self.dl))
-            
-            self.saved_phase[l.var] = l.sign()
-            self.branching_heuristics.on_assign(l.var)
-
-            if -l not in self.watched:
-                continue # nothing is watching -l
-            
-            watched_new = set() # unit clauses
-            for c in self.watched[-l]:
-                
+
+            # update the model; decisions have no reason
+            self.m.commit(l, dl, reason)
+
+            self.n_propagations += 1
+            phase[var(l)] = -1 if l & 1 else 1
+            self.branching_heuristics.on_assign(var(l))
+
+            nl = neg(l)
+
+            # binary clauses imply their other literal without looking at clause memory
+            ws = &self.binary[nl]
+            w = ws.data
+            for i in range(0, ws.size, 2):
+                if not is_true(vals, w[i]):
+                    push3(pending, w[i], w[i + 1], self.dl)
+
+            # the watch list of nl is compacted in place: j is where the next kept entry goes
+            ws = &self.watched[nl]
+            w = ws.data
+            n = ws.size
+            i = j = 0
+            while i < n:
+                c = w[i]
+                b = w[i + 1]
+                i += 2
+                if is_true(vals, b): # satisfied by the blocker
+                    w[j] = c
+                    w[j + 1] = b
+                    j += 2
+                    continue
+
+                # make nl the second watched literal
+                start = c + HEADER
+                if lits[start] == nl:
+                    lits[start] = lits[start + 1]
+                    lits[start + 1] = nl
+                l_other = lits[start]
+                if l_other != b and is_true(vals, l_other): # satisfied by the other watch
+                    w[j] = c
+                    w[j + 1] = l_other
+                    j += 2
+                    continue
+
                 # clause c looks for a substitute literal to watch
-                i = 0 if c[0] == -l else 1
-                j = -1
-                for k in range(2, len(c)):
-                    lk = c[k]
-                    if lk not in self.m or self.m[lk]:
-                        j = k
+                for k in range(start + 2, start + lits[c]):
+                    lk = lits[k]
+                    if not is_false(vals, lk):
+                        lits[start + 1] = lk
+                        lits[k] = nl
+                        push2(&self.watched[lk], c, l_other) # lk is not nl, so w does not move
                         break
 
-                if j >= 0:
-                    if c[j] not in self.watched:
-                        self.watched[c[j]] = set()
-                    self.watched[c[j]].add(c)
-                    c[i], c[j] = c[j], c[i]
-                    
-                
                 # clause c becomes unit, and implies the only remaining watched literal
                 else:
-                    watched_new.add(c) # c still watches -l and the other literal
-                    l_other = c[1 - i]
-                    self.assertions.append( (l_other, c) )
-
-            self.watched[-l] = watched_new
-        
-        return None
-    
-    
-    cdef Literal branch(self, list free):
-        """Choose a random free variable and a polarity to branch on"""
+                    w[j] = c # c still watches -l and the other literal
+                    w[j + 1] = l_other
+                    j += 2
+                    push3(pending, l_other, c, self.dl)
+
+            ws.size = j
+
+        return CREF_UNDEF
+
+
+    cdef int branch(self):
+        """Choose a free variable and a polarity to branch on. Return 0 if there is none."""
         cdef:
             int x
             int sign
-        x = self.branching_heuristics.pick(free)
-        sign = self.saved_phase[x]
+        x = self.branching_heuristics.pick(self.m.vals)
+        if x == 0:
+            return 0
+        sign = self.saved_phase.data.as_schars[x]
         if sign == 0: # no previously saved phase
-            sign = choice([-1,1])
-        return Literal(sign * x)
-
-
-    cdef list free_vars(self):
-        """Return the list of free variables (those that are not in model m)"""
-        return [x for x in self.xs if not self.m.has_var(x)]
-    
-
-    cdef bint should_restart(self):
-        """Check if we should restart search"""
-        return self.conflict_count >= self.restart_counter[1] * RESTART_MULTIPLIER
-    
-    cdef reluctant_doubling(self):
-        u, v = self.restart_counter
-        self.restart_counter = (u+1,1) if (u & -u == v) else (u,2*v)
-    
-
-    cdef restart(self):
-        """Restart search"""
-        self.INFO(lambda: "Restart after {} conflicts\n\n\n".format(self.conflict_count), 0)
-        self.INFO(lambda: self.m, 0)
-        uv = self.m.undo(0)
-        self.branching_heuristics.on_unassign(uv)
+            sign = self.rng.choice([-1,1])
+        return 2 * x + (sign < 0)
+
+
+    cdef bint receive(self):
+        """Add the clauses learned by other solvers at the root level. Return False on conflict."""
+        cdef:
+            int c
+            list ls
+            bint trivial
+        self.dl = 0
+        for ns in self.import_clauses():
+            ls, trivial = normalize(ns)
+            # the sender may not have eliminated the variables that this solver did, whose values are only
+            # given by the extension of the model, and clauses over them would constrain the search wrongly
+            if trivial or len(ls) == 0 or any(var(l) in self.eliminated for l in ls):
+                continue
+            c = self.db.add(ls, learned=True)
+            if len(ls) == 1:
+                self.assertions.append( (ls[0], c) )
+            else:
+                self.watch(c)
+        if self.ok and self.unit_prop() != CREF_UNDEF:
+            self.ok = False
         self.dl = 1
+        return self.ok
+
+
+    cdef bint out_of_budget(self) except -1:
+        """Check if the current call to solve must give up, on a limit or an interrupt"""
+        PyErr_CheckSignals() # run the Python signal handlers, which may call interrupt
+        return (self.interrupted
+                or 0 <= self.conflict_limit <= self.n_conflicts
+                or 0 <= self.propagation_limit <= self.n_propagations
+                or perf_counter() >= self.deadline)
+
+
+    cdef keep_partial(self):
+        """Record the trail if it is the longest reached by this call to solve"""
+        if self.m.size > len(self.best):
+            self.best = self.m.trail[:self.m.size]
+
+
+    cdef int reuse_level(self, int n_assumptions):
+        """
+        Return the highest decision level a restart can keep: that of the last assumption, then
+        of the decisions on variables scored above the next one to branch on, which would be
+        picked again in the same order
+        """
+        cdef:
+            Model m = self.m
+            int level = min(self.dl, n_assumptions)
+            int x = self.branching_heuristics.peek(m.vals)
+            double* q = self.branching_heuristics.q.data.as_doubles
+            int* trail = m.trail.data.as_ints
+            int* lim = m.lim.data.as_ints
+        if x == 0: # every variable is assigned
+            return self.dl
+        while level < self.dl and q[var(trail[lim[level + 1 - LEVEL_BASE]])] > q[x]:
+            level += 1
+        return level
+
+
+    cdef restart(self, int n_assumptions=0):
+        """Restart search, keeping the decision levels that would be made again if reuse_trail is set"""
+        cdef int keep = 0
+        if self.log_level <= LVL_INFO:
+            self.INFO(lambda: "Restart after {} conflicts\n\n\n".format(self.conflict_count), 0)
+            self.INFO(lambda: self.m, 0)
+        # clauses received from other solvers are asserted at the root, which needs a full restart
+        if self.reuse_trail and self.import_clauses is None:
+            keep = self.reuse_level(n_assumptions)
+            self.n_reused += max(0, keep - n_assumptions)
+        self.backtrack(keep)
+        self.dl = keep + 1
         self.assertions = list()
-        self.reluctant_doubling()
+        self.restart_policy.on_restart()
+        self.n_restarts += 1
+        if self.trace is not None:
+            self.trace.event(RESTART, keep, self.n_restarts)
         self.conflict_count = 0
-        if len(self.learned) > self.learning_limit:
+        if len(self.learned) - self.n_core > self.learning_limit or self.over_memory():
+            t = perf_counter()
             self.forget()
+            if self.over_memory(): # the clauses kept are still too many
+                self.forget(core=True)
+            self.phase_time[T_FORGET] += perf_counter() - t
+        if self.warm_start and keep == 0 and self.n_conflicts >= self.sls_next:
+            self.sls_next = 2 * self.n_conflicts
+            self.local_search(self.sls_flips)
 
-    cdef forget(self):
+    cdef forget(self, bint core=False):
+        """
+        Forget the worse half of the learned clauses. Core clauses (glue <= CORE_GLUE),
+        tier 2 clauses used since the last reduction and clauses that are reasons of
+        current assignments are kept; the others are ranked by glue, then activity.
+        If core is set, only the binary clauses and the reasons are kept out of the ranking.
+        """
         cdef:
-            int num_keep, num_forget
-            list to_forget
-            Clause c
-            int i
-            Literal l
-
-        num_keep = self.learning_limit // 2
-        num_forget = len(self.learned) - num_keep
-        to_forget = sample(self.learned, k=num_forget)
-        self.INFO(lambda: "Learned {} out of {} allowed, keep {}".format(len(self.learned), self.learning_limit, num_keep))
+            dict learned = self.learned, activity = self.clause_activity
+            list candidates, to_forget
+            int c, l, glue
+
+        self.memory() # the peak is reached before a reduction
+        if core:
+            candidates = [c for c in learned if self.db.size(c) > 2 and not self.locked(c)]
+        else:
+            candidates = [c for c, glue in learned.items() if glue > CORE_GLUE and not self.locked(c)
+                          and not (glue <= TIER2_GLUE and c in self.used)]
+        candidates.sort(key=lambda c: (learned[c], -activity[c]))
+        to_forget = candidates[len(candidates) // 2:]
+        self.n_forgotten += len(to_forget)
+        if self.log_level <= LVL_INFO:
+            self.INFO(lambda: "Learned {} out of {} allowed, forget {}".format(len(learned), self.learning_limit, len(to_forget)))
+        self.detach(set(to_forget)) # binary clauses are core, and never forgotten
         for c in to_forget:
-            for i in range(2):
-                l = c[i]
-                self.watched[l].remove(c)
-            self.learned.remove(c)
-
-
-    def uip_fast(self, conflict):
-        clause_str = lambda c: "[" + ",  ".join(["{}  @{}".format(l, self.m.level_of(l)) for l in c]) + "]"
-        frontier = deque(conflict)
-        frontier_set = set(frontier)
-        level_count = Counter()
-        for l in frontier:
-            level_count[self.m.level_of(l)] += 1
-
-        end = None
-        frontier.append(end)
-        changes = 0 # change since last seen end
+            if learned[c] <= CORE_GLUE:
+                self.n_core -= 1
+            del learned[c]
+            del activity[c]
+            if self.proof is not None:
+                self.proof.delete(self.db.clause(c))
+            self.db.delete(c)
+        self.used = set()
+        if not core:
+            self.learning_limit += LEARNING_LIMIT_INC
+        if self.max_memory is not None or self.db.wasted > GARBAGE_FRACTION * len(self.db.lits):
+            self.collect_garbage()
+        self.memory_check = 0
+
+
+    cdef collect_garbage(self):
+        """Compact the clause arena, and update the references to the clauses it moves"""
+        cdef:
+            dict moved = self.db.collect()
+            int* w
+            int* reasons = self.m.reasons.data.as_ints
+            int* trail = self.m.trail.data.as_ints
+            int i, l, x
+            tuple t
+        self.n_collections += 1
+        for l in range(2 * self.n_vars + 2):
+            shrink(&self.watched[l])
+        if len(moved) == 0:
+            return
+        self.cs0 = [moved.get(c, c) for c in self.cs0]
+        self.cs = [moved.get(c, c) for c in self.cs]
+        self.learned = {moved.get(c, c): glue for c, glue in self.learned.items()}
+        self.clause_activity = {moved.get(c, c): a for c, a in self.clause_activity.items()}
+        self.used = {moved.get(c, c) for c in self.used}
+        for l in range(2 * self.n_vars + 2):
+            w = self.watched[l].data
+            for i in range(0, self.watched[l].size, 2):
+                w[i] = moved.get(w[i], w[i])
+            w = self.binary[l].data
+            for i in range(1, self.binary[l].size, 2):
+                w[i] = moved.get(w[i], w[i])
+        for i in range(self.m.size):
+            x = var(trail[i])
+            if reasons[x] != CREF_UNDEF:
+                reasons[x] = moved.get(reasons[x], reasons[x])
+        self.assertions = [(t[0], moved.get(t[1], t[1])) + t[2:] for t in self.assertions]
+
+
+    def memory(self):
+        """Return the bytes taken by each of stats.MEMORY, and record the peaks in peak_memory"""
+        cdef:
+            Model m = self.m
+            long watches = 2 * (2 * self.n_vars + 2) * sizeof(Vec)
+            int l
+        for l in range(2 * self.n_vars + 2):
+            watches += (self.watched[l].cap + self.binary[l].cap) * sizeof(int)
+        res = dict(
+            clauses=self.db.memory(),
+            watches=watches,
+            trail=sum(len(a) * a.itemsize for a in (m.vals, m.levels, m.reasons, m.trail, m.lim)))
+        for k in MEMORY:
+            self.peak_memory[k] = max(self.peak_memory[k], res[k])
+        return res
+
+
+    cdef bint over_memory(self):
+        """
+        Check if the solver takes more than max_memory bytes. Measuring is linear in the number
+        of variables: under the limit, it is only done again once the clause arena has taken
+        half the room left, which the watch lists, growing slower, can not fill before it
+        """
+        if self.max_memory is None or len(self.db.lits) < self.memory_check:
+            return False
+        room = self.max_memory - sum(self.memory().values())
+        self.memory_check = len(self.db.lits) + room // (2 * self.db.lits.itemsize)
+        return room < 0
+
+
+    cdef int derive(self, list ls, bint learned=True):
+        """Add the clause ls, implied by the others, to the database and to the proof"""
+        if self.proof is not None:
+            self.proof.add(ls)
+        return self.db.add(ls, learned)
+
+
+    cdef bint locked(self, int c):
+        """Check if clause c is the reason of a current assignment"""
+        cdef int* lits = self.db.lits.data.as_ints
+        return self.m.predecessor(lits[c + HEADER]) == c or self.m.predecessor(lits[c + HEADER + 1]) == c
+
+
+    cdef int glue(self, list ls):
+        """Literal block distance of clause ls: the number of decision levels among its literals"""
+        cdef:
+            int* levels = self.m.levels.data.as_ints
+            int* stamps
+            int stamp = self.new_stamp()
+            int l, k, res = 0
+        stamps = self.level_stamp.data.as_ints
+        for l in ls:
+            k = levels[var(l)] - LEVEL_BASE
+            if stamps[k] != stamp:
+                stamps[k] = stamp
+                res += 1
+        return res
+
+
+    cdef int new_stamp(self) except -1:
+        """Make room for the current decision levels in the per level arrays, and return a fresh stamp"""
+        cdef int n = self.dl + 1 - LEVEL_BASE - len(self.level_stamp)
+        if n > 0:
+            self.level_stamp.extend(array.array('i', [0]) * n)
+            self.level_count.extend(array.array('i', [0]) * n)
+        if self.stamp == 1 << 30:
+            self.stamp = 0
+            self.level_stamp[:] = array.array('i', [0]) * len(self.level_stamp)
+        self.stamp += 1
+        return self.stamp
+
+
+    cdef bump_clause(self, int c):
+        """Reward learned clause c for taking part in a conflict, and tighten its glue"""
+        cdef:
+            dict activity = self.clause_activity
+            int glue
+            object k
+        if c not in self.learned: # an original clause, or one that can not be forgotten
+            return
+        glue = self.learned[c]
+        activity[c] += self.clause_inc
+        if activity[c] > 1e20:
+            for k in activity:
+                activity[k] *= 1e-20
+            self.clause_inc *= 1e-20
+        if glue > CORE_GLUE:
+            glue = min(glue, self.glue(self.db.clause(c)))
+            self.learned[c] = glue
+            if glue <= CORE_GLUE:
+                self.n_core += 1
+            elif glue <= TIER2_GLUE:
+                self.used.add(c)
+
+
+    def clause_str(self, ls):
+        return "[" + ",  ".join(["{}  @{}".format(to_dimacs(l), self.m.level_of(l)) for l in ls]) + "]"
+
+
+    cdef tuple uip_fast(self, int conflict):
+        cdef:
+            int* lits = self.db.lits.data.as_ints
+            signed char* seen = self.seen.data.as_schars
+            list learned
+            int c, i, l
+        self.new_stamp() # level_count has a slot per decision level
+        with nogil:
+            self.find_uip(conflict)
+        # the clauses that took part in the conflict, in the order they were met
+        for i in range(self.bumped.size):
+            c = self.bumped.data[i]
+            if lits[c + 1] & LEARNED:
+                self.bump_clause(c)
+        learned = [self.learnt.data[i] for i in range(self.learnt.size)]
+        for i in range(self.marked.size):
+            seen[self.marked.data[i]] = 0
+        if self.log_level <= LVL_INFO:
+            self.INFO(lambda: "Learned {}".format(self.clause_str(learned)))
+        only_true = next(filter(lambda l: self.m.level_of(l) == self.dl, learned))
+        return learned, only_true
+
+
+    cdef int find_uip(self, int conflict) except -1 nogil:
+        """
+        Resolve the conflict clause with the reasons of its literals, breadth first, until a
+        single literal is left at the current level. The literals left are in queue, the
+        clauses resolved in bumped, and the variables met in marked.
+        """
+        cdef:
+            int* lits = self.db.lits.data.as_ints
+            int* levels = self.m.levels.data.as_ints
+            int* reasons = self.m.reasons.data.as_ints
+            int* count = self.level_count.data.as_ints
+            signed char* seen = self.seen.data.as_schars
+            Vec* q = &self.queue # circular buffer, as every variable enters it at most once
+            int cap = self.n_vars + 2
+            int head = 0, n = 0, changes = 0 # change since last seen end
+            int cur = self.dl - LEVEL_BASE
+            int l, k, i, reason
+        reserve(q, cap)
+        self.bumped.size = 0
+        self.marked.size = 0
+        for i in range(self.dl + 1 - LEVEL_BASE):
+            count[i] = 0
+        push1(&self.bumped, conflict)
+        for i in range(conflict + HEADER, conflict + HEADER + lits[conflict]):
+            l = lits[i]
+            q.data[n] = l
+            n += 1
+            seen[var(l)] = 1
+            push1(&self.marked, var(l))
+            count[levels[var(l)] - LEVEL_BASE] += 1
+
+        q.data[n] = END
+        n += 1
         while True:
-            if level_count[self.dl] == 1: break
-            l = frontier.popleft()
-            if l is end and changes == 0:
+            if count[cur] == 1: break
+            l = q.data[head]
+            head = (head + 1) % cap
+            n -= 1
+            if l == END and changes == 0:
                 break
-            
-            if l is end:
+
+            if l == END:
                 changes = 0 # reset
-                frontier.append(end)
+                q.data[(head + n) % cap] = END
+                n += 1
             else:
-                reason = self.m.predecessor(l)
-                if not reason: # decision variable
-                    frontier.append(l)
+                reason = reasons[var(l)]
+                if reason == CREF_UNDEF: # decision variable
+                    q.data[(head + n) % cap] = l
+                    n += 1
                 else:
-                    level_count[self.m.level_of(l)] -= 1
-                    for m in reason:
-                        if m != -l and m not in frontier_set:
-                            frontier.append(m)
-                            frontier_set.add(m)
+                    push1(&self.bumped, reason)
+                    count[levels[var(l)] - LEVEL_BASE] -= 1
+                    for i in range(reason + HEADER, reason + HEADER + lits[reason]):
+                        k = lits[i]
+                        if k != neg(l) and not seen[var(k)]:
+                            q.data[(head + n) % cap] = k
+                            n += 1
+                            seen[var(k)] = 1
+                            push1(&self.marked, var(k))
                             changes += 1
-                            level_count[self.m.level_of(m)] += 1
-        
-        assert(level_count[self.dl] == 1)
-        learned = Clause([l for l in frontier if l is not end])
-        self.INFO(lambda: "Learned {}".format(clause_str(learned)))
-        only_true = next(filter(lambda l: self.m.level_of(l) == self.dl, learned))
-        return learned, only_true
-        
-        
-    def uip(self, conflict):
+                            count[levels[var(k)] - LEVEL_BASE] += 1
 
-        frontier, old_frontier = conflict, None
+        # the literals left, in order, without the end marker
+        self.learnt.size = 0
+        for i in range(n):
+            l = q.data[(head + i) % cap]
+            if l != END:
+                push1(&self.learnt, l)
+        return 0
+
+
+    def uip(self, int conflict):
+
+        frontier, old_frontier = set(self.db.clause(conflict)), None
         at_curr_level = lambda l: self.m.level_of(l) == self.dl
-        clause_str = lambda c: "[" + ",  ".join(["{}  @{}".format(l, self.m.level_of(l)) for l in c]) + "]"
-        self.INFO(lambda: "Conflict frontier {}".format(clause_str(frontier)))
-        
+        if self.log_level <= LVL_INFO:
+            self.INFO(lambda: "Conflict frontier {}".format(self.clause_str(frontier)))
+
         while True:
 
             for l in list(frontier):
                 assert(l in self.m)
                 reason = self.m.predecessor(l)
-                if reason: # not a decision literal
-                    assert(-l in reason)
-                    if reason.singleton:
+                if reason != CREF_UNDEF: # not a decision literal
+                    ls = self.db.clause(reason)
+                    assert(l ^ 1 in ls)
+                    if len(ls) == 1:
                         pass
-                        self.INFO(lambda: "Trace {} to singleton {}".format(-l, clause_str(reason)))
+                        if self.log_level <= LVL_INFO:
+                            self.INFO(lambda: "Trace {} to singleton {}".format(to_dimacs(l ^ 1), self.clause_str(ls)))
                     else:
-                        self.INFO(lambda: "Trace {} to {}".format(-l, clause_str(reason)))
-                        frontier = frontier.resolve(reason, l.var)
-                        self.INFO(lambda: "Resolvent {}".format(clause_str(frontier)))
+                        if self.log_level <= LVL_INFO:
+                            self.INFO(lambda: "Trace {} to {}".format(to_dimacs(l ^ 1), self.clause_str(ls)))
+                        # resolve on the variable of l
+                        frontier = {k for k in chain(frontier, ls) if k >> 1 != l >> 1}
+                        if self.log_level <= LVL_INFO:
+                            self.INFO(lambda: "Resolvent {}".format(self.clause_str(frontier)))
 
             ls_curr = [l for l in frontier if at_curr_level(l)]
-            if old_frontier and old_frontier.equiv(frontier) or len(ls_curr) == 1:
+            if old_frontier == frontier or len(ls_curr) == 1:
                 break
             old_frontier = frontier
-                    
+
             # if not actual.equiv(expected):
             #     self.INFO(lambda: "expected = {}, actual = {}".format(expected, actual))
             #     assert(False)
-        
+
 
         assert(len(ls_curr) == 1)
-        learned = Clause(frontier)
+        learned = list(frontier)
         only_true = ls_curr[0]
-        self.INFO(lambda: "Learned {}".format(clause_str(learned)))
+        if self.log_level <= LVL_INFO:
+            self.INFO(lambda: "Learned {}".format(self.clause_str(learned)))
         return learned, only_true
-    
 
-    def analyze(self, Clause conflict):
+
+    def analyze(self, int conflict):
         """Analyze the conflict and return the level to which to backtrack"""
         cdef:
-            Clause learned
-            Literal only_true
-        learned, only_true = self.uip_fast(conflict)
-        i = learned.index(only_true)
-        
-        if learned.singleton:
-            beta = self.dl - 1
+            list ls
+            int only_true, i, l, beta, learned, glue
+        ls, only_true = self.uip_fast(conflict)
+        ls = self.minimize(ls, only_true)
+        i = ls.index(only_true)
+
+        if len(ls) == 1:
+            beta = 0 # a learned unit holds at the root level
         else:
             # only one literal is true after backjump
-            # put that literal at index 0
-            learned[0], learned[i] = learned[i], learned[0]
+            # put that literal at index 0, and the one that is false at the highest level at index 1
+            ls[0], ls[i] = ls[i], ls[0]
+            i = max(range(1, len(ls)), key=lambda i: self.m.level_of(ls[i]))
+            ls[1], ls[i] = ls[i], ls[1]
+            beta = max(0, self.m.level_of(ls[1]))
+        learned = self.derive(ls)
+        if len(ls) > 1:
             # set up watch list for the newly learned clause
-            for i in range(2):
-                l = learned[i]
-                if l not in self.watched:
-                    self.watched[l] = set()
-                self.watched[l].add(learned)
-            beta = max(0, max([self.m.level_of(l) for l in learned if l != only_true]))
+            self.attach(learned)
+            glue = self.glue(ls)
+            self.learned[learned] = glue
+            self.clause_activity[learned] = self.clause_inc
+            if glue <= CORE_GLUE:
+                self.n_core += 1
+        self.clause_inc /= CLAUSE_DECAY
         return beta, only_true, learned
 
 
+    cdef list minimize(self, list ls, int only_true):
+        """
+        Remove from the learned clause ls the literals that are false at the root level,
+        and those implied false by the other literals through their reason clauses
+        (recursive self-subsumption)
+        """
+        cdef:
+            Model m = self.m
+            signed char* seen = self.seen.data.as_schars
+            int* stamps
+            int stamp = self.new_stamp() # the levels of ls
+            list res = []
+            int l, i
+        stamps = self.level_stamp.data.as_ints
+        # seen holds the variables of ls, and those known to be implied by ls, listed in marked
+        self.marked.size = 0
+        for l in ls:
+            seen[var(l)] = 1
+            push1(&self.marked, var(l))
+            stamps[m.level_of(l) - LEVEL_BASE] = stamp
+        for l in ls:
+            if l == only_true or (m.level_of(l) > 0 and
+                    (m.predecessor(l) == CREF_UNDEF or not self.redundant(l, stamp))):
+                res.append(l)
+        for i in range(self.marked.size):
+            seen[self.marked.data[i]] = 0
+        self.n_minimized += len(ls) - len(res)
+        if len(res) < len(ls) and self.log_level <= LVL_INFO:
+            self.INFO(lambda: "Minimized {}".format(self.clause_str(res)))
+        return res
+
+
+    cdef bint redundant(self, int l, int stamp) except -1 nogil:
+        """Check if the false literal l is implied by the seen variables, the levels of the clause having stamp"""
+        cdef:
+            int* lits = self.db.lits.data.as_ints
+            int* levels = self.m.levels.data.as_ints
+            int* reasons = self.m.reasons.data.as_ints
+            int* stamps = self.level_stamp.data.as_ints
+            signed char* seen = self.seen.data.as_schars
+            Vec* stack = &self.stack
+            int mark = self.marked.size # the variables marked from here on are added by this call
+            int p, c, k, x, i
+        stack.size = 0
+        push1(stack, l)
+        while stack.size > 0:
+            stack.size -= 1
+            p = stack.data[stack.size]
+            c = reasons[var(p)]
+            for i in range(c + HEADER, c + HEADER + lits[c]):
+                k = lits[i]
+                x = var(k)
+                if x == var(p) or seen[x] or levels[x] <= 0:
+                    continue
+                # a literal decided, or implied at a level absent from the clause, cannot be removed
+                if reasons[x] == CREF_UNDEF or stamps[levels[x] - LEVEL_BASE] != stamp:
+                    for i in range(mark, self.marked.size):
+                        seen[self.marked.data[i]] = 0
+                    self.marked.size = mark
+                    return False
+                seen[x] = 1
+                push1(&self.marked, x)
+                push1(stack, k)
+        return True
+
+
+    cdef list analyze_final(self, int p):
+        """Return the assumptions that imply the negation of assumption p, including p"""
+        cdef:
+            Model m = self.m
+            list core = [p]
+            set seen = {var(p)}
+            int* trail = m.trail.data.as_ints
+            int i, l, k, x, reason
+        for i in range(m.size - 1, -1, -1):
+            l = trail[i]
+            if m.level_of(l) <= 0:
+                break
+            x = var(l)
+            if x not in seen:
+                continue
+            reason = m.predecessor(l)
+            if reason == CREF_UNDEF: # decisions above the root are all assumptions here
+                core.append(l)
+            else:
+                for k in self.db.clause(reason):
+                    if m.level_of(k) > 0:
+                        seen.add(var(k))
+        return core
+
+
     def modeled_by(self):
         """Check if the CNF formula is modeled by m"""
-        return all(c.modeled_by(self.m) for c in self.cs)
+        return all(self.db.modeled_by(c, self.m) for c in self.cs)
 
 
     def __str__(self):
-        meta = "p cnf {} {}".format(len(self.vs), len(self.cs0))
-        return "\n".join([meta] + [str(c) + " 0" for c in self.cs0])
-    
+        meta = "p cnf {} {}".format(self.n_vars, len(self.cs0))
+        return "\n".join([meta] + [" ".join(map(str, self.db.to_dimacs(c) + [0])) for c in self.cs0])
+
 
     def __repr__(self):
         return str(self)
 
 
 cdef class Model:
+    """
+    Assignment store. Each variable has a slot in the value/level/reason arrays,
+    and assigned literals are kept on a trail in assignment order, together with
+    the trail index at which each decision level starts.
+    """
     cdef readonly:
-        dict alpha, at_level
-        set dv
-
-    def __init__(self):
-        self.alpha = dict()
-        self.at_level = dict()
-        self.dv = set()
-    
-    def has_var(self, x):
-        return x in self.alpha
-        
-    def __contains__(self, Literal l):
-        return l.var in self.alpha
-    
-    def __getitem__(self, Literal l):
+        array.array vals, levels, reasons
+        array.array trail, lim
+        int size, n_levels # of the trail and of lim, which have room for more
+
+    def __init__(self, int n_vars):
+        self.vals = array.array('b', [UNASSIGNED]) * (n_vars + 1) # 1 if the variable is true, 0 if false
+        self.levels = array.array('i', [0]) * (n_vars + 1)
+        self.reasons = array.array('i', [CREF_UNDEF]) * (n_vars + 1)
+        self.trail = array.array('i', [0]) * (n_vars + 1) # the assigned literals are trail[:size]
+        self.lim = array.array('i') # lim[dl - LEVEL_BASE] is where level dl starts on the trail
+        self.size = 0
+        self.n_levels = 0
+
+    cdef grow(self, int n_vars):
+        """Make room for variables up to n_vars"""
+        cdef int n = n_vars + 1 - len(self.vals)
+        self.vals.extend(array.array('b', [UNASSIGNED]) * n)
+        self.levels.extend(array.array('i', [0]) * n)
+        self.reasons.extend(array.array('i', [CREF_UNDEF]) * n)
+        self.trail.extend(array.array('i', [0]) * n)
+
+    cdef reserve_levels(self, int dl):
+        """Make room in lim for the levels up to dl"""
+        cdef int n = dl + 1 - LEVEL_BASE - len(self.lim)
+        if n > 0:
+            self.lim.extend(array.array('i', [0]) * n)
+
+    def has_var(self, int x):
+        return self.vals.data.as_schars[x] != UNASSIGNED
+
+    def __contains__(self, int l):
+        return self.vals.data.as_schars[var(l)] != UNASSIGNED
+
+    def __getitem__(self, int l):
         """Return the truth value of literal l under this model"""
-        return l.is_neg ^ self.alpha[l.var][0]
+        return (l & 1) ^ self.vals.data.as_schars[var(l)]
 
     def __len__(self):
-        return len(self.alpha)
-    
-
-    cdef Clause predecessor(self, Literal l):
-        _, _, reason = self.alpha[l.var]
-        return reason
-    
-
-    cdef int level_of(self, Literal l):
-        _, dl, _ = self.alpha[l.var]
-        return dl
-
-
-    cdef commit(self, Literal l, dl, reason):
-        """Set literal l to True at level dl according to the given reason clause"""
-        x = l.var
-        assert(x != 0)
-        self.alpha[x] = (l.is_pos, dl, reason)
-        if dl not in self.at_level:
-            self.at_level[dl] = list()
-        self.at_level[dl].append(x)
-        if reason:
-            assert(l in reason)
-    
-
-    cdef assign(self, Literal l, dl):
+        return self.size
+
+
+    cdef int predecessor(self, int l):
+        return self.reasons.data.as_ints[var(l)]
+
+
+    cdef int level_of(self, int l):
+        return self.levels.data.as_ints[var(l)]
+
+
+    cdef void commit(self, int l, int dl, int reason) noexcept nogil:
+        """Set literal l to True at level dl according to the given reason clause; lim must have room for dl"""
+        cdef int x = var(l)
+        # open the trail segment of level dl (and of any skipped level below it)
+        while self.n_levels <= dl - LEVEL_BASE:
+            self.lim.data.as_ints[self.n_levels] = self.size
+            self.n_levels += 1
+        self.vals.data.as_schars[x] = 1 - (l & 1)
+        self.levels.data.as_ints[x] = dl
+        self.reasons.data.as_ints[x] = reason
+        self.trail.data.as_ints[self.size] = l
+        self.size += 1
+
+
+    cdef assign(self, int l, int dl):
         """Mark v as decision variable, and guess it's True"""
-        self.commit(l, dl, None)
-        self.dv.add(l.var)
-        
-    
-    cdef list undo(self, int beta):
+        assert(var(l) != 0)
+        self.reserve_levels(dl)
+        self.commit(l, dl, CREF_UNDEF)
+
+
+    def flip(self, int x):
+        """Negate the value of the assigned variable x, in place on the trail"""
+        cdef int i = self.trail[:self.size].index(2 * x + 1 - self.vals.data.as_schars[x])
+        self.trail.data.as_ints[i] ^= 1
+        self.vals.data.as_schars[x] ^= 1
+
+
+    cdef void undo(self, int beta) noexcept nogil:
         """Undo assignments at level > beta"""
         cdef:
-            list unassigned, levels
-            int lvl, x
-
-        unassigned = list()
-        levels = [level for level in self.at_level if level > beta]
-        for lvl in levels:
-            for x in self.at_level[lvl]:
-                if x in self.dv:
-                    self.dv.remove(x)
-                del(self.alpha[x])
-                unassigned.append(x)
-            del(self.at_level[lvl])
-        return unassigned
-    
+            int k, start, i, x
+            int* trail = self.trail.data.as_ints
+
+        k = beta + 1 - LEVEL_BASE
+        if k >= self.n_levels:
+            return
+        start = self.lim.data.as_ints[k]
+        for i in range(start, self.size):
+            x = var(trail[i])
+            self.vals.data.as_schars[x] = UNASSIGNED
+            self.reasons.data.as_ints[x] = CREF_UNDEF
+        self.size = start
+        self.n_levels = k
+
     def __str__(self):
-        to_lit = lambda x: (1 if self.alpha[x][0] else -1) * x
-        return " ".join(map(str, map(to_lit, self.alpha.keys())))
+        return " ".join(map(str, map(to_dimacs, self.trail[:self.size])))
+
 
-    
     def __repr__(self):
-        is_dv = lambda x: "d" if x in self.dv else ""
-        to_lit = lambda x: (1 if self.alpha[x][0] else -1) * x
+        is_dv = lambda x: "d" if self.reasons[x] == CREF_UNDEF else ""
+        to_lit = lambda x: (1 if self.vals[x] else -1) * x
         sep = ["-"*5 + "(model)" + "-"*5]
-        if len(self.alpha) > 0:
-            return "\n".join(sep + ["{:>3}  @  {:>2}  {}".format(to_lit(x), self.alpha[x][1], is_dv(x)) \
-                for x in sorted(list(self.alpha.keys()))] + sep)
+        if self.size > 0:
+            return "\n".join(sep + ["{:>3}  @  {:>2}  {}".format(to_lit(x), self.levels[x], is_dv(x)) \
+                for x in sorted([var(l) for l in self.trail[:self.size]])] + sep)
         else:
             return "(empty model)"
@@ -1,29 +1,50 @@
 # cython: language_level=3
 # cython: profile=False
 
-cdef class Clause:
+from cpython cimport array
+
+cdef enum:
+    HEADER = 2
+    LEARNED = 1
+    DELETED = 2
+    CREF_UNDEF = -1
+    UNASSIGNED = -1
+
+cdef inline int neg(int l) noexcept nogil:
+    return l ^ 1
+
+cdef inline int var(int l) noexcept nogil:
+    return l >> 1
+
+cpdef int from_dimacs(int n)
+
+cpdef int to_dimacs(int l)
+
+
+cdef class ClauseDB:
     cdef readonly:
-        int id
-        list ls
-        bint singleton
-        bint trivial
-
-    cdef bint has_var(self, int x)
-    
-    cdef list xs(self)
-    
-    cdef list start_watching(self)
-    
-    cdef Literal get_only(self)
-
-    cdef int index(self, Literal l)
-
-
-cdef class Literal:
-    cdef:
-        readonly int var # positive integer representing the variable name
-        bint is_pos
-        bint is_neg
-        int n # +var or -var
-    
-    cdef int sign(self)
\ No newline at end of file
+        array.array lits
+        int n_clauses
+        long wasted
+
+    cpdef int add(self, list ls, bint learned=*)
+
+    cpdef int size(self, int cref)
+
+    cpdef bint is_learned(self, int cref)
+
+    cpdef bint is_deleted(self, int cref)
+
+    cpdef delete(self, int cref)
+
+    cpdef dict collect(self)
+
+    cpdef long memory(self)
+
+    cpdef list clause(self, int cref)
+
+    cpdef list xs(self, int cref)
+
+    cpdef int index(self, int cref, int l)
+
+    cdef void swap(self, int cref, int i, int j)
@@ -0,0 +1,137 @@
+from array import array
+
+# Literals are plain ints: 2 * var + sign, where sign is 1 for a negated variable.
+# Negating a literal flips its lowest bit, and its variable is literal >> 1.
+
+# Every clause in the arena starts with a header of HEADER ints
+#   [size, flags, l_0, l_1, ..., l_{size-1}]
+# and is referenced by the offset of its header (a "cref").
+HEADER = 2
+LEARNED = 1
+DELETED = 2
+
+CREF_UNDEF = -1 # "no clause", e.g. the reason of a decision literal
+UNASSIGNED = -1 # value of a free variable
+
+
+def from_dimacs(n):
+    """Encode a non-zero DIMACS integer as a literal"""
+    return 2 * n if n > 0 else -2 * n + 1
+
+
+def to_dimacs(l):
+    """Decode a literal back into a DIMACS integer"""
+    return -(l >> 1) if l & 1 else l >> 1
+
+
+def normalize(ns):
+    """
+    ns - a list of DIMACS integers
+    Return the duplicate-free literals of the clause, and whether it is trivial
+    (i.e. contains both polarities of a variable)
+    """
+    ls = list()
+    seen = set()
+    trivial = False
+    for n in ns:
+        l = from_dimacs(n)
+        if l in seen:
+            continue
+        seen.add(l)
+        ls.append(l)
+        # check if both n and -n are present
+        if l ^ 1 in seen:
+            trivial = True
+    return ls, trivial
+
+
+class ClauseDB:
+    """Clause arena: all clauses share one contiguous int buffer"""
+
+    def __init__(self):
+        self.lits = array('i')
+        self.n_clauses = 0
+        self.wasted = 0 # ints taken by deleted learned clauses, which collect reclaims
+
+    def add(self, ls, learned=False):
+        """Append the clause with literals ls to the arena and return its cref"""
+        cref = len(self.lits)
+        self.lits.append(len(ls))
+        self.lits.append(LEARNED if learned else 0)
+        self.lits.extend(ls)
+        self.n_clauses += 1
+        return cref
+
+    def size(self, cref):
+        return self.lits[cref]
+
+    def is_learned(self, cref):
+        return self.lits[cref + 1] & LEARNED != 0
+
+    def is_deleted(self, cref):
+        return self.lits[cref + 1] & DELETED != 0
+
+    def delete(self, cref):
+        """Mark the clause as deleted. Its space is reclaimed by collect if it is learned."""
+        self.lits[cref + 1] |= DELETED
+        self.n_clauses -= 1
+        if self.lits[cref + 1] & LEARNED:
+            self.wasted += HEADER + self.lits[cref]
+
+    def collect(self):
+        """
+        Reclaim the space of the deleted learned clauses by moving the other clauses down
+        the arena, in order. Deleted original clauses are kept, as the input formula can
+        still be printed. Return a dict mapping the cref of each clause moved to its new cref.
+        """
+        lits = self.lits
+        moved = dict()
+        n = len(lits)
+        i = j = 0
+        while i < n:
+            end = i + HEADER + lits[i]
+            if lits[i + 1] & (LEARNED | DELETED) != LEARNED | DELETED:
+                if j != i:
+                    lits[j:j + end - i] = lits[i:end]
+                    moved[i] = j
+                j += end - i
+            i = end
+        del lits[j:]
+        self.wasted = 0
+        return moved
+
+    def memory(self):
+        """Bytes taken by the arena"""
+        return len(self.lits) * self.lits.itemsize
+
+    def clause(self, cref):
+        """Return the literals of the clause as a list"""
+        start = cref + HEADER
+        return self.lits[start:start + self.lits[cref]].tolist()
+
+    def xs(self, cref):
+        """Return the variables of the clause"""
+        start = cref + HEADER
+        return [l >> 1 for l in self.lits[start:start + self.lits[cref]]]
+
+    def index(self, cref, l):
+        """Return the position of literal l in the clause"""
+        return self.clause(cref).index(l)
+
+    def swap(self, cref, i, j):
+        """Swap the i-th and j-th literals of the clause"""
+        lits = self.lits
+        i += cref + HEADER
+        j += cref + HEADER
+        lits[i], lits[j] = lits[j], lits[i]
+
+    def modeled_by(self, cref, m):
+        """Determine if the clause can be modeled by m"""
+        # m can always model the clause if it contains free vars not captured by m
+        return any(l not in m or m[l] for l in self.clause(cref))
+
+    def to_dimacs(self, cref):
+        return [to_dimacs(l) for l in self.clause(cref)]
+
+    def __len__(self):
+        return self.n_clauses
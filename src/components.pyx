@@ -1,147 +1,156 @@
 # cython: language_level=3
 # cython: profile=False
 
-clause_counter = 0
+from cpython cimport array
+import array
 
-cdef class Clause:
+# Literals are plain ints: 2 * var + sign, where sign is 1 for a negated variable.
+# Negating a literal flips its lowest bit, and its variable is literal >> 1.
 
-    def __init__(self, ls):
-        global clause_counter
-        self.id = clause_counter
-        clause_counter += 1
+# Every clause in the arena starts with a header of HEADER ints
+#   [size, flags, l_0, l_1, ..., l_{size-1}]
+# and is referenced by the offset of its header (a "cref").
 
-        self.ls = [l for l in ls]
-        self.singleton = len(self.ls) == 1
-        # assume non-triviality
-        self.trivial = False
+cpdef int from_dimacs(int n):
+    """Encode a non-zero DIMACS integer as a literal"""
+    return 2 * n if n > 0 else -2 * n + 1
 
-    @classmethod
-    def from_ns(cls, ns):
-        """ns - a list of integers representing literals"""
+
+cpdef int to_dimacs(int l):
+    """Decode a literal back into a DIMACS integer"""
+    return -(l >> 1) if l & 1 else l >> 1
+
+
+def normalize(ns):
+    """
+    ns - a list of DIMACS integers
+    Return the duplicate-free literals of the clause, and whether it is trivial
+    (i.e. contains both polarities of a variable)
+    """
+    cdef:
+        list ls = list()
+        set seen = set()
+        bint trivial = False
+        int n, l
+    for n in ns:
+        l = from_dimacs(n)
+        if l in seen:
+            continue
+        seen.add(l)
+        ls.append(l)
+        # check if both n and -n are present
+        if neg(l) in seen:
+            trivial = True
+    return ls, trivial
+
+
+cdef class ClauseDB:
+    """Clause arena: all clauses share one contiguous int buffer"""
+
+    def __init__(self):
+        self.lits = array.array('i')
+        self.n_clauses = 0
+        self.wasted = 0 # ints taken by deleted learned clauses, which collect reclaims
+
+    cpdef int add(self, list ls, bint learned=False):
+        """Append the clause with literals ls to the arena and return its cref"""
+        cdef:
+            int cref = len(self.lits)
+            int l
+        self.lits.append(len(ls))
+        self.lits.append(LEARNED if learned else 0)
+        for l in ls:
+            self.lits.append(l)
+        self.n_clauses += 1
+        return cref
+
+    cpdef int size(self, int cref):
+        return self.lits.data.as_ints[cref]
+
+    cpdef bint is_learned(self, int cref):
+        return self.lits.data.as_ints[cref + 1] & LEARNED != 0
+
+    cpdef bint is_deleted(self, int cref):
+        return self.lits.data.as_ints[cref + 1] & DELETED != 0
+
+    cpdef delete(self, int cref):
+        """Mark the clause as deleted. Its space is reclaimed by collect if it is learned."""
+        cdef int* a = self.lits.data.as_ints
+        a[cref + 1] |= DELETED
+        self.n_clauses -= 1
+        if a[cref + 1] & LEARNED:
+            self.wasted += HEADER + a[cref]
+
+    cpdef dict collect(self):
+        """
+        Reclaim the space of the deleted learned clauses by moving the other clauses down
+        the arena, in order. Deleted original clauses are kept, as the input formula can
+        still be printed. Return a dict mapping the cref of each clause moved to its new cref.
+        """
         cdef:
-            Clause c
-            set ls
-            bint trivial
-            Literal l
-
-        ls = set()
-        trivial = False
-        for n in ns:
-            l = Literal(n)
-            ls.add(l)
-            # check if both n and -n are present
-            if -l in ls:
-                trivial = True
-
-        c = cls(ls)
-        c.trivial = trivial
-        return c
-    
-    def resolve(self, Clause other, int on):
+            int* a = self.lits.data.as_ints
+            dict moved = dict()
+            int n = len(self.lits)
+            int i = 0, j = 0, k, end
+        while i < n:
+            end = i + HEADER + a[i]
+            if a[i + 1] & (LEARNED | DELETED) != LEARNED | DELETED:
+                if j != i:
+                    for k in range(end - i):
+                        a[j + k] = a[i + k]
+                    moved[i] = j
+                j += end - i
+            i = end
+        array.resize(self.lits, j)
+        self.wasted = 0
+        return moved
+
+    cpdef long memory(self):
+        """Bytes taken by the arena"""
+        return len(self.lits) * sizeof(int)
+
+    cpdef list clause(self, int cref):
+        """Return the literals of the clause as a list"""
         cdef:
-            set ls = set()
-            Literal l
-        for l in self.ls:
-            if l.var != on:
-                ls.add(l)
-        for l in other.ls:
-            if l.var != on:
-                ls.add(l)
-        return Clause(ls)
-    
-    def equiv(self, other):
-        return len(self) == len(other) and all([l in other for l in self])
-    
-    
-    cdef bint has_var(self, int x):
-        cdef Literal l = Literal(x)
-        return l in self.ls or -l in self.ls
-    
-    cdef list xs(self):
-        cdef Literal l
-        return [l.var for l in self.ls]
-    
-    cdef list start_watching(self):
+            int* a = self.lits.data.as_ints
+            int start = cref + HEADER
+        return [a[k] for k in range(start, start + a[cref])]
+
+    cpdef list xs(self, int cref):
+        """Return the variables of the clause"""
         cdef:
-            list res = list()
-            Literal l
-        for l in self.ls:
-            res.append(l)
-            if len(res) == 2:
-                break
-        assert(len(res) == 2)
-        return res
-    
-    cdef Literal get_only(self):
-        assert(len(self.ls) == 1)
-        return self.ls[0]
-
-    cdef int index(self, Literal l):
-        return self.ls.index(l)
-    
-    def __len__(self):
-        return len(self.ls)
-    
-    def __iter__(self):
-        return iter(self.ls)
-    
-    def __eq__(self, other):
-        return self.id == other.id
-    
-    def __lt__(self, other):
-        return self.id < other.id
-    
-    def __hash__(self):
-        return self.id
-
-    def __getitem__(self, i):
-        return self.ls[i]
-    
-    def __setitem__(self, i, l):
-        self.ls[i] = l
-    
-    def modeled_by(self, m):
-        """Determine if clause c can be modeled by m"""
-        # m can always model clause c if c contains free vars not captured by m
-        return any(l not in m or m[l] for l in self.ls)
-    
-    def modeled_by_modulo(self, m, v):
-        """Determine if clause c could be modeled by m if variable v were absent"""
-        return any(l not in m or m[l] for l in self.ls if l.var != v)
-
-    def __str__(self):
-        return repr(self)
-    
-    def __repr__(self):
-        return repr(self.ls)
-
-
-cdef class Literal:
-    
-    def __init__(self, n):
-        self.n = n
-        self.var = abs(n)
-        self.is_pos = n > 0
-        self.is_neg = n < 0
-    
-    cdef int sign(self):
-        return 1 if self.is_pos else -1
-    
-    def __neg__(self):
-        return Literal(-self.n)
-
-    def __str__(self):
-        return str(self.n)
-    
-    def __repr__(self):
-        return str(self.n)
-    
-    def __eq__(self, Literal other):
-        return self.n == other.n
-    
-    def __lt__(self, Literal other):
-        return self.var < other.var and self.is_neg < other.is_neg
-    
-    def __hash__(self):
-        return self.n
+            int* a = self.lits.data.as_ints
+            int start = cref + HEADER
+        return [var(a[k]) for k in range(start, start + a[cref])]
+
+    cpdef int index(self, int cref, int l):
+        """Return the position of literal l in the clause"""
+        cdef:
+            int* a = self.lits.data.as_ints
+            int k
+        for k in range(a[cref]):
+            if a[cref + HEADER + k] == l:
+                return k
+        raise ValueError("{} is not in clause {}".format(l, cref))
+
+    cdef void swap(self, int cref, int i, int j):
+        """Swap the i-th and j-th literals of the clause"""
+        cdef:
+            int* a = self.lits.data.as_ints
+            int t
+        i += cref + HEADER
+        j += cref + HEADER
+        t = a[i]
+        a[i] = a[j]
+        a[j] = t
 
+    def modeled_by(self, int cref, m):
+        """Determine if the clause can be modeled by m"""
+        # m can always model the clause if it contains free vars not captured by m
+        return any(l not in m or m[l] for l in self.clause(cref))
+
+    def to_dimacs(self, int cref):
+        return [to_dimacs(l) for l in self.clause(cref)]
+
+    def __len__(self):
+        return self.n_clauses
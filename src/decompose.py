@@ -0,0 +1,235 @@
+import multiprocessing as mp
+import os
+import signal
+import time
+from collections import defaultdict
+
+from cdcl import CDCL
+
+PARALLEL_CLAUSES = 2000 # components with at least this many clauses are solved in worker processes
+POLL_INTERVAL = 0.1 # seconds between checks for an interrupt while workers are solving
+
+
+def propagate_units(nss):
+    """
+    Assign the literals of the unit clauses of nss (lists of DIMACS integers), and those they
+    imply, up to a fixpoint. Return (facts, clauses): the literals assigned, and the clauses
+    they do not satisfy, without their false literals. Return (None, None) if one is falsified.
+    """
+    clauses = []
+    for ns in nss:
+        c = list(set(ns))
+        if len(c) == 0:
+            return None, None
+        if not any(-n in c for n in c[1:]):
+            clauses.append(c)
+    occurs = defaultdict(list) # clauses of each literal
+    for i, c in enumerate(clauses):
+        for n in c:
+            occurs[n].append(i)
+    left = [len(c) for c in clauses] # literals not yet false
+    satisfied = [False] * len(clauses)
+    facts = set()
+    units = [c[0] for c in clauses if len(c) == 1]
+    while units:
+        n = units.pop()
+        if n in facts:
+            continue
+        if -n in facts:
+            return None, None
+        facts.add(n)
+        for i in occurs[n]:
+            satisfied[i] = True
+        for i in occurs[-n]:
+            if satisfied[i]:
+                continue
+            left[i] -= 1
+            if left[i] == 0:
+                return None, None
+            if left[i] == 1:
+                units.append(next(k for k in clauses[i] if -k not in facts))
+    return facts, [[n for n in c if -n not in facts] for c, s in zip(clauses, satisfied) if not s]
+
+
+def components(nss):
+    """Partition the clauses nss into groups with no variable in common, by union-find over the variables"""
+    parent = dict()
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    for ns in nss:
+        r = find(abs(ns[0]))
+        for n in ns[1:]:
+            s = find(abs(n))
+            if s != r:
+                parent[s] = r
+    groups = defaultdict(list)
+    for ns in nss:
+        groups[find(abs(ns[0]))].append(ns)
+    return list(groups.values())
+
+
+def build(nss, log_file, config):
+    """Return a solver for the clauses of a component, renumbered from 1 so that it is sized by the component, and its variables"""
+    xs = sorted({abs(n) for ns in nss for n in ns})
+    index = {x: i + 1 for i, x in enumerate(xs)}
+    cnf = CDCL(len(xs), ([n // abs(n) * index[abs(n)] for n in ns] for ns in nss), log_file, solve=False, **config)
+    return cnf, xs
+
+
+def search(cnf, xs, limits):
+    """
+    Solve cnf within limits, (max_conflicts, max_propagations, deadline as a time.time, local).
+    Return (sat, model, conflicts, propagations), the model as DIMACS integers over the variables xs.
+    """
+    max_conflicts, max_propagations, deadline, local = limits
+    sat = cnf.solve(max_conflicts=max_conflicts, max_propagations=max_propagations,
+                    max_time=None if deadline is None else deadline - time.time(), local=local)
+    model = [n // abs(n) * xs[abs(n) - 1] for n in map(int, str(cnf.m).split())] if sat else None
+    return sat, model, cnf.n_conflicts, cnf.n_propagations
+
+
+def solve_component(task):
+    """Solve a component in a worker process, see search"""
+    nss, log_file, config, limits = task
+    cnf, xs = build(nss, log_file, config)
+    return search(cnf, xs, limits)
+
+
+def ignore_interrupts():
+    """
+    Leave SIGINT to the parent process, which stops the workers itself, with SIGTERM: the
+    handler that a forked worker may have inherited for it must not keep it alive
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+class Decomposition:
+    """
+    Solver of formulas by parts: after unit propagation, the clauses are split into components
+    sharing no variable, each given to its own CDCL, built with the keyword arguments config.
+    The components of at least PARALLEL_CLAUSES clauses are solved on jobs processes, after
+    the others, and the first unsat one ends the search. max_memory, in config, is split
+    evenly between the processes.
+    """
+
+    def __init__(self, jobs=1, log_file=os.devnull, config=None):
+        self.jobs = jobs
+        self.log_file = log_file
+        self.config = dict(config or dict())
+        self.cnf = None # the solver running in this process
+        self.interrupted = False
+        self.n_components = 0
+        # totals over the components of the last call to solve
+        self.n_conflicts = 0
+        self.n_propagations = 0
+
+    def interrupt(self):
+        """Make the running call to solve, or else the next one, give up as soon as possible"""
+        self.interrupted = True
+        if self.cnf is not None:
+            self.cnf.interrupt()
+
+    def solve(self, nss, max_conflicts=None, max_propagations=None, max_time=None, local=False):
+        """
+        Solve the clauses nss, lists of DIMACS integers. The limits, those of CDCL.solve, bound
+        the whole search: the components solved in this process share them, in turn, and
+        those solved in parallel split what is left of the conflicts and propagations.
+        Return (sat, model), the model as DIMACS integers sorted by variable, which gives
+        false to the variables left free; sat is None if a solver gave up or on interrupt,
+        unless a component is unsat.
+        """
+        nss = [list(ns) for ns in nss]
+        facts, rest = propagate_units(nss)
+        self.n_conflicts = self.n_propagations = 0
+        if facts is None:
+            self.interrupted = False
+            return False, None
+        parts = sorted(components(rest), key=len)
+        self.n_components = len(parts)
+        small = [p for p in parts if len(p) < PARALLEL_CLAUSES]
+        large = parts[len(small):]
+        n_local = len(small) if self.jobs > 1 and len(large) > 1 else len(parts)
+        deadline = None if max_time is None else time.time() + max_time
+        model = list(facts)
+        unknown = False
+        try:
+            for p in parts[:n_local]:
+                if self.interrupted:
+                    break
+                cnf, xs = build(p, self.log_file, self.config)
+                self.cnf = cnf
+                if self.interrupted: # before self.cnf was set
+                    cnf.interrupt()
+                sat, m, conflicts, propagations = search(cnf, xs, (max_conflicts, max_propagations, deadline, local))
+                self.cnf = None
+                self.n_conflicts += conflicts
+                self.n_propagations += propagations
+                if sat is False:
+                    return False, None
+                if sat is None:
+                    unknown = True
+                else:
+                    model.extend(m)
+                if max_conflicts is not None:
+                    max_conflicts = max(0, max_conflicts - conflicts)
+                if max_propagations is not None:
+                    max_propagations = max(0, max_propagations - propagations)
+            pooled = parts[n_local:]
+            if pooled and not self.interrupted:
+                config = dict(self.config)
+                if config.get('max_memory') is not None:
+                    config['max_memory'] //= self.jobs
+                limits = (None if max_conflicts is None else max_conflicts // len(pooled),
+                          None if max_propagations is None else max_propagations // len(pooled), deadline, local)
+                results = self.solve_pooled([(p, self.log_file, config, limits) for p in pooled])
+                try:
+                    for sat, m, conflicts, propagations in results:
+                        self.n_conflicts += conflicts
+                        self.n_propagations += propagations
+                        if sat is False:
+                            return False, None
+                        if sat is None:
+                            unknown = True
+                        else:
+                            model.extend(m)
+                finally:
+                    results.close() # terminates the solvers still running
+            if unknown or self.interrupted:
+                return None, None
+        finally:
+            self.cnf = None
+            self.interrupted = False
+        # variables whose clauses are all satisfied by the facts, or tautologies
+        xs = {abs(n) for n in model}
+        model.extend(-x for x in {abs(n) for ns in nss for n in ns} - xs)
+        return True, sorted(model, key=abs)
+
+    def solve_pooled(self, tasks):
+        """Yield the results of solve_component on tasks as they complete, until an interrupt"""
+        with mp.get_context().Pool(min(self.jobs, len(tasks)), initializer=ignore_interrupts) as pool:
+            # leaving the block terminates the solvers still running
+            results = pool.imap_unordered(solve_component, tasks)
+            for _ in tasks:
+                while True:
+                    if self.interrupted:
+                        return
+                    try:
+                        yield results.next(POLL_INTERVAL)
+                        break
+                    except mp.TimeoutError:
+                        pass
+
+
+def solve_components(nss, jobs=1, log_file=os.devnull, config=None, limits=None):
+    """
+    Solve the clauses nss by parts, see Decomposition, within limits, the keyword arguments of
+    CDCL.solve. Return (sat, model, number of components).
+    """
+    d = Decomposition(jobs, log_file, config)
+    sat, model = d.solve(nss, **(limits or dict()))
+    return sat, model, d.n_components
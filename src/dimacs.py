@@ -0,0 +1,128 @@
+import bz2
+import gzip
+import lzma
+import mmap
+import re
+from array import array
+
+BLOCK_SIZE = 1 << 20
+
+# compressed formats, recognized by their magic bytes
+OPENERS = [
+    (b'\x1f\x8b', gzip.open),
+    (b'BZh', bz2.open),
+    (b'\xfd7zXZ\x00', lzma.open),
+]
+
+HEADER = re.compile(rb'^[ \t]*p[ \t]+cnf[ \t]+(\d+)[ \t]+(\d+)', re.M)
+COMMENT = re.compile(rb'^[ \t]*[cp].*$', re.M) # comment and header lines
+END = re.compile(rb'^[ \t]*%', re.M) # SATLIB files end the formula with a '%' line
+SPECIAL = re.compile(rb'^[ \t]*[cp%]', re.M)
+
+
+class DimacsReader:
+    """
+    Streaming reader for DIMACS CNF files, plain or compressed with gzip, bzip2 or xz.
+
+    The header is parsed on construction, and iterating over the reader yields the
+    clauses one at a time, so the formula never exists as a list of lists.
+    Clauses may span several lines.
+    """
+
+    def __init__(self, path, block_size=BLOCK_SIZE):
+        self.path = path
+        self.n_vars = None
+        self.n_clauses = None
+        self.blocks = self.read_blocks(path, block_size)
+        self.pending = b'' # text of the first blocks after the header
+        for block in self.blocks:
+            m = HEADER.search(block)
+            if m is None:
+                if COMMENT.sub(b'', block).strip():
+                    raise ValueError("{}: clauses before the 'p cnf' header".format(path))
+                continue
+            if COMMENT.sub(b'', block[:m.start()]).strip():
+                raise ValueError("{}: clauses before the 'p cnf' header".format(path))
+            self.n_vars, self.n_clauses = int(m.group(1)), int(m.group(2))
+            self.pending = block[m.end():]
+            break
+        if self.n_vars is None:
+            raise ValueError("{}: missing 'p cnf' header".format(path))
+
+
+    @staticmethod
+    def read_blocks(path, block_size):
+        """Yield the content of the file in blocks that end on a line boundary"""
+        with open(path, 'rb') as f:
+            magic = f.read(6)
+            opener = next((op for m, op in OPENERS if magic.startswith(m)), None)
+            if opener is None:
+                if len(magic) == 0:
+                    return
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    start, size = 0, len(mm)
+                    while start < size:
+                        end = mm.find(b'\n', min(start + block_size, size))
+                        end = size if end < 0 else end + 1
+                        yield mm[start:end]
+                        start = end
+                return
+
+        with opener(path, 'rb') as f:
+            carry = b''
+            while True:
+                chunk = f.read(block_size)
+                if not chunk:
+                    break
+                chunk = carry + chunk
+                cut = chunk.rfind(b'\n') + 1
+                carry = chunk[cut:]
+                if cut > 0:
+                    yield chunk[:cut]
+            if carry:
+                yield carry
+
+
+    def numbers(self):
+        """Yield the DIMACS integers of the formula block by block"""
+        blocks = self.blocks
+        block = self.pending
+        self.pending = b''
+        while True:
+            if SPECIAL.search(block):
+                m = END.search(block)
+                if m is not None:
+                    block = block[:m.start()]
+                    blocks.close() # ignore the rest of the file
+                    blocks = iter(())
+                block = COMMENT.sub(b'', block)
+            nums = array('i', list(map(int, block.split())))
+            if len(nums) > 0: # variables beyond the header are accepted, as solvers grow to fit them
+                self.n_vars = max(self.n_vars, max(nums), -min(nums))
+            yield nums
+            block = next(blocks, None)
+            if block is None:
+                return
+
+
+    def __iter__(self):
+        """Yield each clause as an array of non-zero DIMACS integers"""
+        carry = array('i')
+        for nums in self.numbers():
+            start = 0
+            while True:
+                try:
+                    end = nums.index(0, start)
+                except ValueError:
+                    break
+                if len(carry) > 0:
+                    carry.extend(nums[start:end])
+                    yield carry
+                    carry = array('i')
+                else:
+                    yield nums[start:end]
+                start = end + 1
+            carry.extend(nums[start:])
+        # the last clause may omit its terminating 0
+        if len(carry) > 0:
+            yield carry
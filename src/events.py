@@ -0,0 +1,44 @@
+import struct
+
+BUFFER_SIZE = 1 << 20 # bytes kept in memory before writing to the file
+MAGIC = b'SATTRACE'
+
+EVENTS = ['assign', 'conflict', 'learn', 'backjump', 'restart']
+ASSIGN, CONFLICT, LEARN, BACKJUMP, RESTART = range(len(EVENTS))
+
+RECORD = struct.Struct('<Biii')
+
+
+class EventTrace:
+    """
+    Binary trace of the search, for offline analysis. After MAGIC, each event is a
+    13-byte little-endian record: its kind, an index of EVENTS, then three ints:
+      assign    literal, decision level, reason clause (-1 for decisions and assumptions)
+      conflict  clause, decision level, conflicts so far
+      learn     clause, size, glue
+      backjump  decision level, level jumped to, literal asserted
+      restart   decision level kept, restarts so far, 0
+    Literals are DIMACS integers, clauses are references into the clause arena of the solver.
+    """
+
+    def __init__(self, path):
+        self.out = open(path, 'wb', buffering=BUFFER_SIZE)
+        self.out.write(MAGIC)
+        self.n_events = 0
+
+    def event(self, kind, a, b=0, c=0):
+        self.n_events += 1
+        self.out.write(RECORD.pack(kind, a, b, c))
+
+    def close(self):
+        self.out.close()
+
+
+def read(path):
+    """Yield the events of the trace in the file path as (name, a, b, c) tuples"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError("{} is not an event trace".format(path))
+    for kind, a, b, c in RECORD.iter_unpack(memoryview(data)[len(MAGIC):]):
+        yield EVENTS[kind], a, b, c
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+import argparse
+import multiprocessing as mp
+import os
+from array import array
+
+import numpy as np
+
+from cdcl import CDCL
+
+P_K2 = 0.3 # probability that a clause gets a second literal before the geometric tail
+P_GEO = 0.4 # parameter of the geometric number of further literals
+BATCH_SIZE = 256 # clauses sampled at once
+
+NAME_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks', 'groups', 'group')
+FILE_NAME = "sr_n={:04d}_pk2={:.2f}_pg={:.2f}_t={}_sat={}.dimacs"
+
+
+def parseArg():
+    """
+    CMD argument parsing
+    :return: the parser
+    """
+    parser = argparse.ArgumentParser(description='Generate pairs of sat and unsat random formulas, as in NeuroSAT')
+    parser.add_argument('out', help='directory receiving the sat and unsat sub-directories')
+    parser.add_argument('--pairs', type=int, default=100)
+    parser.add_argument('--min-n', type=int, default=10, help='fewest variables of a pair')
+    parser.add_argument('--max-n', type=int, default=40, help='most variables of a pair')
+    parser.add_argument('--p-k2', type=float, default=P_K2)
+    parser.add_argument('--p-geo', type=float, default=P_GEO)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count())
+    parser.add_argument('--manifest', metavar='NAME',
+                        help='also list the instances in NAME_s and NAME_u, in benchmarks/groups/group by default')
+    parser.add_argument('--manifest-dir', default=NAME_DIR)
+    return parser
+
+
+def sample_clauses(rng, n, count, p_k2=P_K2, p_geo=P_GEO):
+    """
+    Sample count clauses over the variables 1..n, as lists of DIMACS integers. A clause has
+    1 + Bernoulli(p_k2) + Geometric(p_geo) distinct variables, at most n, with random signs.
+    """
+    widths = np.minimum(1 + rng.binomial(1, p_k2, count) + rng.geometric(p_geo, count), n)
+    k = int(widths.max())
+    cols = np.arange(k)
+    if k * k > n: # repeated variables would be frequent: take the start of random permutations
+        vs = rng.permuted(np.tile(np.arange(1, n + 1), (count, 1)), axis=1)[:, :k]
+    else:
+        vs = rng.integers(1, n + 1, (count, k))
+    while True:
+        # resample the clauses with a repeated variable; columns past the width never repeat
+        s = np.sort(np.where(cols < widths[:, None], vs, -1 - cols), axis=1)
+        repeated = (s[:, 1:] == s[:, :-1]).any(axis=1)
+        if not repeated.any():
+            break
+        vs[repeated] = rng.integers(1, n + 1, (int(repeated.sum()), k))
+    lits = (vs * (2 * rng.integers(0, 2, (count, k)) - 1)).tolist()
+    return [ls[:w] for ls, w in zip(lits, widths.tolist())]
+
+
+def make_pair(rng, n, p_k2=P_K2, p_geo=P_GEO):
+    """
+    Sample clauses over n variables until they become unsatisfiable. Return (sat, unsat):
+    unsat holds every clause sampled, and sat the same but with the first literal of the
+    last one negated, which any model of the others satisfies.
+    A single solver takes the clauses one by one, and only solves again when a clause is
+    falsified by the last model found.
+    """
+    solver = CDCL(n, solve=False, seed=0)
+    clauses = []
+    model = None
+    while True:
+        for c in sample_clauses(rng, n, BATCH_SIZE, p_k2, p_geo):
+            clauses.append(c)
+            solver.add_clause(c)
+            if model is not None and any(model[abs(k)] == (k > 0) for k in c):
+                continue
+            if not solver.solve():
+                return clauses[:-1] + [[-c[0]] + c[1:]], clauses
+            model = array('b', solver.m.vals) # the next add_clause undoes it
+
+
+def write_dimacs(path, n_vars, clauses):
+    with open(path, 'w') as f:
+        f.write("p cnf {} {}\n".format(n_vars, len(clauses)))
+        for c in clauses:
+            f.write(" ".join(map(str, c)) + " 0\n")
+
+
+def generate(task):
+    """Write pair t of the corpus, whose sampling only depends on seed and t. Return the file names."""
+    out, t, seed, min_n, max_n, p_k2, p_geo = task
+    rng = np.random.default_rng([seed, t])
+    n = int(rng.integers(min_n, max_n + 1))
+    names = []
+    for clauses, sat in zip(make_pair(rng, n, p_k2, p_geo), (1, 0)):
+        name = FILE_NAME.format(n, p_k2, p_geo, t, sat)
+        write_dimacs(os.path.join(out, 'sat' if sat else 'unsat', name), n, clauses)
+        names.append(name)
+    return names
+
+
+def generate_all(out, pairs, min_n, max_n, p_k2=P_K2, p_geo=P_GEO, seed=0, jobs=1):
+    """
+    Write pairs sat/unsat pairs under out/sat and out/unsat, the number of variables of each
+    being uniform in [min_n, max_n]. Yield the names of the files of each pair, in order.
+    """
+    for d in ('sat', 'unsat'):
+        os.makedirs(os.path.join(out, d), exist_ok=True)
+    tasks = [(out, t, seed, min_n, max_n, p_k2, p_geo) for t in range(pairs)]
+    if jobs <= 1:
+        yield from map(generate, tasks)
+        return
+    with mp.get_context().Pool(jobs) as pool:
+        yield from pool.imap(generate, tasks)
+
+
+if __name__ == '__main__':
+    args = parseArg().parse_args()
+    if not 1 <= args.min_n <= args.max_n:
+        exit("need 1 <= --min-n <= --max-n")
+    sat_names, unsat_names = [], []
+    for t, (sat, unsat) in enumerate(generate_all(args.out, args.pairs, args.min_n, args.max_n, args.p_k2,
+                                                  args.p_geo, args.seed, args.jobs)):
+        sat_names.append(sat)
+        unsat_names.append(unsat)
+        print(t, sat, unsat, flush=True)
+    if args.manifest:
+        for suffix, names in (('_s', sat_names), ('_u', unsat_names)):
+            with open(os.path.join(args.manifest_dir, args.manifest + suffix), 'w') as f:
+                f.writelines(name + "\n" for name in sorted(names))
@@ -1,9 +1,19 @@
 #!/usr/bin/env python3
 
 import argparse
+import signal
+import sys
 import cProfile, pstats, io
 from pstats import SortKey
-from cdcl import CDCL
+from cdcl import CDCL, PROBE_BUDGET, RESTART_MULTIPLIER
+from sls import SLS_FLIPS
+from dimacs import DimacsReader
+from portfolio import solve_portfolio
+from decompose import Decomposition
+from restarts import POLICIES
+from stats import Progress
+from proof import DRAT
+from events import EventTrace
 
 
 def parseArg():
@@ -14,32 +24,136 @@ def parseArg():
     parser = argparse.ArgumentParser(description='SAT solver')
     parser.add_argument('infile')
     parser.add_argument('--profile')
+    parser.add_argument('--engine', choices=['cdcl', 'sls'], default='cdcl',
+                        help='sls only looks for a model by local search, and answers unknown instead of unsat')
+    parser.add_argument('--warm-start', action='store_true',
+                        help='set the saved phases by local search before the search and between restarts')
+    parser.add_argument('--sls-flips', type=int, default=SLS_FLIPS, metavar='N', help='flips allowed to each local search')
+    parser.add_argument('--all', action='store_true', help='print every model, one per line, as they are found')
+    parser.add_argument('--max-models', type=int, metavar='N', help='stop --all after N models')
+    parser.add_argument('--project', metavar='VARS', type=lambda s: [int(x) for x in s.split(',')],
+                        help='with --all, enumerate the models over these comma-separated variables only')
+    parser.add_argument('--jobs', type=int, default=1, help='number of diversified solvers to race')
+    parser.add_argument('--decompose', action='store_true',
+                        help='solve the parts of the formula sharing no variable separately, on --jobs processes')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--restart', choices=POLICIES, help='restart policy, luby by default; with --jobs, each '
+                        'solver has its own unless this is given')
+    parser.add_argument('--restart-unit', type=float,
+                        help='scale of the luby and geometric restart intervals, in conflicts ({} by default)'.format(
+                            RESTART_MULTIPLIER))
+    parser.add_argument('--reuse-trail', action='store_true',
+                        help='keep the decisions that would be made again on restarts')
+    parser.add_argument('--probe-budget', type=int, default=PROBE_BUDGET, help='propagations allowed for failed literal probing')
+    parser.add_argument('--probe-time', type=float, default=None, help='seconds allowed for failed literal probing')
+    parser.add_argument('--no-simplify', dest='simplify', action='store_false',
+                        help='skip subsumption and variable elimination before the search')
+    parser.add_argument('--proof', metavar='FILE', help='write a DRAT proof of unsatisfiability to FILE')
+    parser.add_argument('--binary-proof', action='store_true', help='write the proof in the binary DRAT format')
+    parser.add_argument('--max-conflicts', type=int, metavar='N', help='give up with unknown after N conflicts')
+    parser.add_argument('--max-propagations', type=int, metavar='N', help='give up with unknown after N propagations')
+    parser.add_argument('--time-limit', type=float, metavar='SECONDS', help='give up with unknown after SECONDS of search')
+    parser.add_argument('--max-memory', type=float, metavar='MB',
+                        help='forget learned clauses to keep the clauses, watch lists and trail under MB mebibytes')
+    parser.add_argument('--trace', metavar='FILE', help='write a binary trace of the search events to FILE')
+    parser.add_argument('--stats', action='store_true', help='print the solver statistics to stderr')
+    parser.add_argument('--progress', type=float, metavar='SECONDS', help='report the statistics to stderr periodically')
+    parser.add_argument('--progress-json', metavar='FILE', help='report the statistics periodically as JSON lines in FILE')
     return parser
 
 
-def parse_input(f):
-    with open(f,'r') as f:
-        nss = []
-        for line in f:
-            line = line.strip()
-            if line[0] == 'c':
-                pass
-            elif line[0] == 'p':
-                _, _, n_vars, _ = line.split()
-            else:
-                ns = [int(n) for n in line.split() if n != '0']
-                nss.append(ns)
-        return int(n_vars), nss
+def interrupt_on_signals(cnf):
+    """
+    Make SIGINT and SIGTERM stop the search of cnf, a CDCL or anything with an interrupt method,
+    with unknown; a second signal kills the process
+    """
+    def handler(signum, frame):
+        signal.signal(signum, signal.SIG_DFL)
+        cnf.interrupt()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, handler)
 
 
 if __name__ == '__main__':
-    args = parseArg().parse_args()
-    n_vars, nss = parse_input(args.infile)
+    parser = parseArg()
+    args = parser.parse_args()
+    max_memory = int(args.max_memory * 2**20) if args.max_memory is not None else None
+    limits = dict(max_conflicts=args.max_conflicts, max_propagations=args.max_propagations, max_time=args.time_limit)
+    # keyword arguments of CDCL given to every solver; the restart options only when set, as the portfolio varies them
+    shared = dict(probe_budget=args.probe_budget, probe_time=args.probe_time, simplify=args.simplify,
+                  reuse_trail=args.reuse_trail)
+    if args.restart is not None:
+        shared['restart'] = args.restart
+    if args.restart_unit is not None:
+        shared['restart_multiplier'] = args.restart_unit
+    config = dict(shared, seed=args.seed, max_memory=max_memory, warm_start=args.warm_start, sls_flips=args.sls_flips)
+    if args.jobs > 1 and args.proof:
+        parser.error("--proof is not supported with --jobs")
+    if args.jobs > 1 and args.trace:
+        parser.error("--trace is not supported with --jobs")
+    if args.decompose and (args.proof or args.trace or args.all):
+        parser.error("--decompose is not supported with --proof, --trace or --all")
+    if args.jobs > 1 and not args.decompose and (args.engine == 'sls' or args.warm_start):
+        parser.error("local search is not supported with --jobs")
+    if (args.jobs > 1 or args.decompose) and (args.stats or args.progress is not None or args.progress_json):
+        parser.error("--stats and --progress are not supported with --jobs or --decompose")
+    if (args.jobs > 1 or args.decompose) and args.profile:
+        parser.error("--profile is not supported with --jobs or --decompose")
+    if args.all and (args.jobs > 1 or args.proof or args.engine == 'sls'):
+        parser.error("--all is not supported with --jobs, --proof or --engine sls")
+    if not args.all and (args.max_models is not None or args.project is not None):
+        parser.error("--max-models and --project only apply to --all")
+    if args.decompose:
+        decomposition = Decomposition(args.jobs, "dpll.log", config)
+        interrupt_on_signals(decomposition)
+        sat, model = decomposition.solve(DimacsReader(args.infile), local=args.engine == 'sls', **limits)
+        if sat:
+            print("sat")
+            print(" ".join(map(str, model)))
+        elif sat is None:
+            print("unknown")
+        else:
+            print("unsat")
+        exit(0)
+    if args.jobs > 1:
+        sat, model, _ = solve_portfolio(args.infile, args.jobs, seed=args.seed or 0, log_file="dpll.log",
+                                        max_memory=max_memory, limits=limits, config=shared)
+        if sat:
+            print("sat")
+            print(model)
+        elif sat is None:
+            print("unknown")
+        else:
+            print("unsat")
+        exit(0)
+
+    reader = DimacsReader(args.infile)
     if args.profile:
         pr = cProfile.Profile()
         pr.enable()
     
-    cnf = CDCL(n_vars, nss, "dpll.log")
+    cnf = CDCL(reader.n_vars, reader, "dpll.log", solve=False,
+               proof=DRAT(args.proof, args.binary_proof) if args.proof else None,
+               trace=EventTrace(args.trace) if args.trace else None, **config)
+    if args.progress is not None or args.progress_json is not None:
+        cnf.progress = Progress(args.progress or 1.0, args.progress_json)
+    interrupt_on_signals(cnf)
+    if args.all:
+        n_models = 0
+        for model in cnf.models(args.project, args.max_models, **limits):
+            n_models += 1
+            print(" ".join(map(str, model)), flush=True)
+        res = None
+    else:
+        res = cnf.solve(local=args.engine == 'sls', **limits)
+    if cnf.proof is not None:
+        cnf.proof.close()
+    if cnf.trace is not None:
+        cnf.trace.close()
+    if cnf.progress is not None:
+        cnf.progress.close()
+    if args.stats:
+        print(cnf.stats, file=sys.stderr)
 
     if args.profile:
         pr.disable()
@@ -52,9 +166,16 @@ if __name__ == '__main__':
         else:
             with open(args.profile, "w") as outfile:
                 outfile.write(s.getvalue())
+    elif args.all:
+        if cnf.unknown:
+            print("unknown")
+        print("models", n_models)
     else:
-        if cnf.sat:
+        if res:
             print("sat")
             print(str(cnf.m))
+        elif res is None: # the partial assignment reached
+            print("unknown")
+            print(" ".join(map(str, cnf.partial)))
         else:
             print("unsat")
\ No newline at end of file
@@ -0,0 +1,90 @@
+import multiprocessing as mp
+import os
+from queue import Empty
+
+from cdcl import CDCL
+from dimacs import DimacsReader
+
+# (restart policy, restart multiplier, ERMA alpha) triples, cycled through by the workers
+STRATEGIES = [
+    ('luby', 1, 0.4),
+    ('glucose', 1, 0.3),
+    ('luby', 4, 0.5),
+    ('geometric', 1, 0.2),
+    ('luby', 8, 0.4),
+    ('glucose', 1, 0.6),
+]
+
+
+def configs(jobs, seed=0):
+    """Return the keyword arguments of CDCL for each of the diversified workers"""
+    res = []
+    for i in range(jobs):
+        restart, restart_multiplier, alpha = STRATEGIES[i % len(STRATEGIES)]
+        res.append(dict(seed=seed + i, restart=restart, restart_multiplier=restart_multiplier, erma_alpha=alpha))
+    return res
+
+
+def drain(inbox):
+    """Return the clauses waiting in inbox without blocking"""
+    ns = []
+    while True:
+        try:
+            ns.append(inbox.get_nowait())
+        except Empty:
+            return ns
+
+
+def worker(i, infile, config, log_file, results, inboxes, limits):
+    """Solve infile with one configuration and report (i, sat, model) to results; sat is None if it gave up"""
+    reader = DimacsReader(infile)
+    cnf = CDCL(reader.n_vars, reader, log_file, solve=False, **config)
+    if inboxes is not None:
+        outboxes = [q for j, q in enumerate(inboxes) if j != i]
+        def export_clause(ns):
+            for q in outboxes:
+                q.put(ns)
+        cnf.export_clause = export_clause
+        cnf.import_clauses = lambda: drain(inboxes[i])
+    sat = cnf.solve(**limits)
+    results.put( (i, sat, str(cnf.m) if sat else None) )
+
+
+def solve_portfolio(infile, jobs, seed=0, share=True, log_file=os.devnull, max_memory=None, limits=None, config=None):
+    """
+    Race jobs differently configured solvers on infile, one process each.
+    Short learned clauses are passed between the workers if share is set.
+    config holds keyword arguments of CDCL given to every worker, which override those
+    of its strategy: the restart policy is only diversified if config does not set it.
+    max_memory, in bytes, is split evenly between the workers, and limits are the keyword
+    arguments of CDCL.solve that bound the search of each.
+    Return (sat, model, index of the winning worker) from the first one to answer;
+    the others are terminated. sat is None if every worker gave up.
+    """
+    ctx = mp.get_context()
+    results = ctx.Queue()
+    inboxes = [ctx.Queue() for _ in range(jobs)] if share else None
+    budget = None if max_memory is None else max_memory // jobs
+    procs = [ctx.Process(target=worker, args=(i, infile, dict(c, max_memory=budget, **(config or dict())), log_file,
+        results, inboxes, limits or dict()), daemon=True) for i, c in enumerate(configs(jobs, seed))]
+    for p in procs:
+        p.start()
+    unknown = 0 # workers that gave up
+    try:
+        while True:
+            try:
+                i, sat, model = results.get(timeout=0.1)
+                if sat is not None:
+                    break
+                unknown += 1
+                if unknown == jobs:
+                    break
+            except Empty:
+                if not any(p.is_alive() for p in procs) and results.empty():
+                    raise RuntimeError("every solver process exited without an answer")
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.join()
+    return sat, model, i
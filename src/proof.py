@@ -0,0 +1,42 @@
+from components import to_dimacs
+
+BUFFER_SIZE = 1 << 20 # bytes kept in memory before writing to the file
+
+
+class DRAT:
+    """
+    Writer of a DRAT proof: the clauses derived and deleted by the solver, in order, which a
+    checker such as drat-trim verifies against the original formula when it is unsat.
+    Clauses are lists of literals in the solver's encoding. The binary format writes 'a' or
+    'd', then each literal as 2 * variable + sign in 7-bit variable-length chunks, then a 0 byte.
+    """
+
+    def __init__(self, path, binary=False):
+        self.out = open(path, 'wb', buffering=BUFFER_SIZE)
+        self.binary = binary
+        self.n_added = 0
+        self.n_deleted = 0
+
+    def add(self, ls):
+        self.n_added += 1
+        self.out.write(self.encode(b'a', b'', ls))
+
+    def delete(self, ls):
+        self.n_deleted += 1
+        self.out.write(self.encode(b'd', b'd ', ls))
+
+    def encode(self, tag, text_tag, ls):
+        if not self.binary:
+            return text_tag + " ".join([str(to_dimacs(l)) for l in ls] + ["0\n"]).encode()
+        # the solver encodes literals as 2 * variable + sign already
+        res = bytearray(tag)
+        for l in ls:
+            while l > 127:
+                res.append(l & 127 | 128)
+                l >>= 7
+            res.append(l)
+        res.append(0)
+        return res
+
+    def close(self):
+        self.out.close()
@@ -0,0 +1,31 @@
+# cython: language_level=3
+# cython: profile=False
+
+cdef class RestartPolicy:
+    cdef readonly:
+        long conflicts
+
+    cpdef after_conflict(self, int glue, int trail_size)
+
+    cpdef bint should_restart(self)
+
+    cpdef on_restart(self)
+
+
+cdef class Luby(RestartPolicy):
+    cdef readonly:
+        double unit
+        long u, v
+
+
+cdef class Geometric(RestartPolicy):
+    cdef readonly:
+        double limit, factor
+
+
+cdef class Glucose(RestartPolicy):
+    cdef readonly:
+        double margin, block
+        long min_conflicts, block_after
+        long n
+        double fast, slow, trail
@@ -0,0 +1,105 @@
+GEOMETRIC_FIRST = 100 # conflicts before the first geometric restart, times the unit
+GEOMETRIC_FACTOR = 1.5
+GLUCOSE_MARGIN = 1.25 # restart when the recent glue exceeds the long-run glue by this factor
+GLUCOSE_MIN_CONFLICTS = 50 # conflicts between two glucose restarts, at least
+GLUCOSE_BLOCK = 1.4 # postpone restarts when the trail is longer than its average by this factor
+GLUCOSE_BLOCK_AFTER = 10000 # conflicts before restarts can be postponed
+FAST_ALPHA = 1 / 32 # smoothing of the recent averages
+SLOW_ALPHA = 1 / 4096 # smoothing of the long-run averages
+
+POLICIES = ['luby', 'geometric', 'glucose']
+
+
+class RestartPolicy:
+    """
+    When to restart. The solver calls after_conflict with the glue of each learned clause
+    and the trail length at the conflict, asks should_restart after each conflict analysis,
+    and calls on_restart when it restarts. The base policy never restarts.
+    """
+
+    def __init__(self):
+        self.conflicts = 0 # since the last restart
+
+    def after_conflict(self, glue, trail_size):
+        self.conflicts += 1
+
+    def should_restart(self):
+        return False
+
+    def on_restart(self):
+        self.conflicts = 0
+
+
+class Luby(RestartPolicy):
+    """Restart after unit times 1, 1, 2, 1, 1, 2, 4, ... conflicts, following Knuth's reluctant doubling"""
+
+    def __init__(self, unit=1):
+        super().__init__()
+        self.unit = unit
+        self.u, self.v = 1, 1
+
+    def should_restart(self):
+        return self.conflicts >= self.v * self.unit
+
+    def on_restart(self):
+        super().on_restart()
+        u, v = self.u, self.v
+        self.u, self.v = (u+1,1) if (u & -u == v) else (u,2*v)
+
+
+class Geometric(RestartPolicy):
+    """Restart after first conflicts, then after factor times as many as the previous time"""
+
+    def __init__(self, first=GEOMETRIC_FIRST, factor=GEOMETRIC_FACTOR):
+        super().__init__()
+        self.limit = first
+        self.factor = factor
+
+    def should_restart(self):
+        return self.conflicts >= self.limit
+
+    def on_restart(self):
+        super().on_restart()
+        self.limit *= self.factor
+
+
+class Glucose(RestartPolicy):
+    """
+    Restart when the glue of the recently learned clauses is high compared to the
+    long-run average, which suggests the search is stuck in a bad region. Restarts are
+    postponed while the trail is much longer than usual, as the solver may be close to a model.
+    """
+
+    def __init__(self, margin=GLUCOSE_MARGIN, min_conflicts=GLUCOSE_MIN_CONFLICTS,
+                 block=GLUCOSE_BLOCK, block_after=GLUCOSE_BLOCK_AFTER):
+        super().__init__()
+        self.margin = margin
+        self.min_conflicts = min_conflicts
+        self.block = block
+        self.block_after = block_after
+        self.n = 0 # conflicts in total
+        self.fast = self.slow = self.trail = 0.0
+
+    def after_conflict(self, glue, trail_size):
+        super().after_conflict(glue, trail_size)
+        self.n += 1
+        # exponential moving averages, which start as the plain mean of the first values
+        self.fast += max(FAST_ALPHA, 1 / self.n) * (glue - self.fast)
+        self.slow += max(SLOW_ALPHA, 1 / self.n) * (glue - self.slow)
+        if self.n > self.block_after and trail_size > self.block * self.trail:
+            self.conflicts = 0
+        self.trail += max(SLOW_ALPHA, 1 / self.n) * (trail_size - self.trail)
+
+    def should_restart(self):
+        return self.conflicts >= self.min_conflicts and self.fast > self.margin * self.slow
+
+
+def make_policy(name, unit=1):
+    """Build the restart policy called name; unit scales the intervals of luby and geometric"""
+    if name == 'luby':
+        return Luby(unit)
+    if name == 'geometric':
+        return Geometric(GEOMETRIC_FIRST * unit)
+    if name == 'glucose':
+        return Glucose()
+    raise ValueError("unknown restart policy {}, expected one of {}".format(name, ", ".join(POLICIES)))
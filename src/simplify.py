@@ -0,0 +1,181 @@
+RESOLVENT_LIMIT = 20 # longest resolvent allowed when eliminating a variable
+OCCURRENCE_LIMIT = 16 # variables occurring more often than this in both polarities are kept
+SIMPLIFY_BUDGET = 10**6 # clause visits allowed for subsumption and elimination
+
+
+class Simplifier:
+    """
+    Subsumption, self-subsuming resolution and bounded variable elimination on a set of
+    clauses, given as lists of literals, using an occurrence list per literal.
+
+    The clauses removed by elimination are kept on a stack of (pivot, clause) pairs:
+    going through it backwards and making the pivot true whenever its clause is false
+    extends a model of the simplified clauses to a model of the original ones.
+    Frozen variables are never eliminated. If given a proof (see proof.DRAT), the clauses
+    derived and removed are written to it. stop, if given, is called between steps, and ends
+    the simplification early when it returns True: the clauses are then only partly simplified.
+    """
+
+    def __init__(self, n_vars, clauses, frozen=(), budget=SIMPLIFY_BUDGET, proof=None, stop=None):
+        self.clauses = dict() # clause id -> sorted list of literals
+        self.occurs = [set() for _ in range(2 * n_vars + 2)] # literal -> ids of the clauses containing it
+        self.frozen = set(frozen)
+        self.budget = budget
+        self.proof = proof
+        self.stop = stop
+        self.stack = list()
+        self.eliminated = list()
+        self.queue = list() # clauses to check for backward subsumption
+        self.n_subsumed = 0
+        self.n_strengthened = 0
+        self.unsat = False
+        self.next_id = 0
+        for ls in clauses:
+            self.add(ls)
+
+
+    def add(self, ls):
+        i = self.next_id
+        self.next_id += 1
+        self.clauses[i] = sorted(ls)
+        for l in ls:
+            self.occurs[l].add(i)
+        self.queue.append(i)
+        if len(ls) == 0:
+            self.unsat = True
+        return i
+
+
+    def remove(self, i):
+        if self.proof is not None:
+            self.proof.delete(self.clauses[i])
+        for l in self.clauses.pop(i):
+            self.occurs[l].discard(i)
+
+
+    def strengthen(self, i, l):
+        """Remove literal l from clause i"""
+        if self.proof is not None:
+            self.proof.add([k for k in self.clauses[i] if k != l])
+            self.proof.delete(self.clauses[i])
+        self.clauses[i].remove(l)
+        self.occurs[l].discard(i)
+        self.queue.append(i)
+        self.n_strengthened += 1
+        if len(self.clauses[i]) == 0:
+            self.unsat = True
+
+
+    def backward(self, i):
+        """Remove the clauses subsumed by clause i, and strengthen those it self-subsumes"""
+        c = self.clauses.get(i)
+        if c is None:
+            return
+        occurs = self.occurs
+        # a clause subsumed by c contains the least frequent variable of c
+        x = min(c, key=lambda l: len(occurs[l]) + len(occurs[l ^ 1])) >> 1
+        for j in list(occurs[2 * x] | occurs[2 * x + 1]):
+            d = self.clauses.get(j)
+            if j == i or d is None or len(d) < len(c):
+                continue
+            self.budget -= 1
+            ds = set(d)
+            flipped = None # the only literal of c that occurs negated in d
+            for l in c:
+                if l in ds:
+                    continue
+                if flipped is None and l ^ 1 in ds:
+                    flipped = l ^ 1
+                    continue
+                break
+            else:
+                if flipped is None:
+                    self.remove(j)
+                    self.n_subsumed += 1
+                else:
+                    self.strengthen(j, flipped)
+
+
+    def subsume(self):
+        """Apply subsumption and self-subsuming resolution until the queue is empty"""
+        while len(self.queue) > 0 and self.budget > 0 and not self.unsat and not self.stopped():
+            self.backward(self.queue.pop())
+        self.queue = list()
+
+
+    def stopped(self):
+        return self.stop is not None and self.stop()
+
+
+    def resolve(self, a, b, x):
+        """Return the resolvent of clauses a and b on variable x, or None if it is trivial"""
+        ls = set(l for l in a if l >> 1 != x)
+        for l in b:
+            if l >> 1 == x:
+                continue
+            if l ^ 1 in ls:
+                return None
+            ls.add(l)
+        return sorted(ls)
+
+
+    def eliminate_var(self, x):
+        """Replace the clauses of x by their resolvents, if that does not add clauses. Return whether it did."""
+        pos, neg = list(self.occurs[2 * x]), list(self.occurs[2 * x + 1])
+        if len(pos) + len(neg) == 0 or min(len(pos), len(neg)) > OCCURRENCE_LIMIT:
+            return False
+        resolvents = list()
+        for i in pos:
+            for j in neg:
+                self.budget -= 1
+                r = self.resolve(self.clauses[i], self.clauses[j], x)
+                if r is None:
+                    continue
+                if len(r) > RESOLVENT_LIMIT or len(resolvents) == len(pos) + len(neg):
+                    return False
+                resolvents.append(r)
+
+        # keep the clauses of the smaller side, and default x to the other polarity
+        pivot, side = (2 * x, pos) if len(pos) <= len(neg) else (2 * x + 1, neg)
+        for i in side:
+            self.stack.append( (pivot, self.clauses[i]) )
+        self.stack.append( (pivot ^ 1, [pivot ^ 1]) )
+        self.eliminated.append(x)
+        if self.proof is not None: # the resolvents are derived before their antecedents are removed
+            for r in resolvents:
+                self.proof.add(r)
+        for i in pos + neg:
+            self.remove(i)
+        for r in resolvents:
+            self.add(r)
+        return True
+
+
+    def eliminate(self):
+        """Eliminate variables, cheapest first, interleaved with subsumption of the resolvents"""
+        occurs = self.occurs
+        xs = [x for x in range(1, len(occurs) // 2) if x not in self.frozen]
+        xs.sort(key=lambda x: len(occurs[2 * x]) * len(occurs[2 * x + 1]))
+        for x in xs:
+            if self.budget <= 0 or self.unsat or self.stopped():
+                return
+            if self.eliminate_var(x):
+                self.subsume()
+
+
+    def run(self):
+        """Simplify the clauses. Return False if they are found unsatisfiable."""
+        self.subsume()
+        self.eliminate()
+        return not self.unsat
+
+
+    @staticmethod
+    def extend(stack, m):
+        """
+        Make the model m of the simplified clauses a model of the original clauses, by
+        flipping eliminated variables. m needs to support m[l] and m.flip(x).
+        """
+        for pivot, ls in reversed(stack):
+            if not any(m[l] for l in ls):
+                m.flip(pivot >> 1)
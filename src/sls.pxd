@@ -0,0 +1,26 @@
+# cython: language_level=3
+# cython: profile=False
+
+from cpython cimport array
+
+cdef enum:
+    MAX_BREAK = 64 # higher break counts get the weight of this one
+
+cdef class SLS:
+    cdef readonly:
+        int n_vars
+        long n_flips
+        array.array start, size, fixed, best
+
+    cdef:
+        array.array lits, first, occ, vals, n_true, crit, breaks, unsat, where
+        int n_unsat
+        unsigned long long state
+
+    cdef bint search(self, long max_flips) noexcept nogil
+
+    cdef unsigned long long random(self) noexcept nogil
+
+    cdef int pick(self, int i) noexcept nogil
+
+    cdef void flip(self, int x) noexcept nogil
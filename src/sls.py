@@ -0,0 +1,136 @@
+from array import array
+from components import HEADER, UNASSIGNED
+
+SLS_FLIPS = 30000 # flips allowed to each local search
+CB = 2.38 # weight of the break count in probSAT's polynomial distribution, tuned for random 3-SAT
+EPS = 1.0
+MAX_BREAK = 64 # higher break counts get the weight of this one
+
+WEIGHTS = [(EPS + b) ** -CB for b in range(MAX_BREAK + 1)]
+
+
+class SLS:
+    """
+    probSAT local search over clauses of a ClauseDB. From a full assignment, it repeatedly
+    flips a variable of a random falsified clause, picked with a probability that decreases
+    with its break count: the number of clauses that the flip would falsify.
+    Break counts are kept up to date incrementally, as each clause records how many of its
+    literals are true and the xor of their variables, which is the critical variable when
+    there is only one. Variables assigned in fixed (an array of values by variable, like
+    Model.vals) are never flipped, and the clauses they satisfy or falsify are left out.
+    """
+
+    def __init__(self, n_vars, db, cs, fixed, rng):
+        lits = db.lits
+        self.n_vars = n_vars
+        self.lits = lits
+        self.fixed = fixed
+        self.rng = rng
+        self.n_flips = 0
+        # the clauses, by the offset of their first literal in lits
+        self.start = array('i')
+        self.size = array('i')
+        for c in cs:
+            ls = lits[c + HEADER:c + HEADER + lits[c]]
+            if UNASSIGNED in (fixed[l >> 1] for l in ls) and not any(fixed[l >> 1] == 1 - (l & 1) for l in ls):
+                self.start.append(c + HEADER)
+                self.size.append(lits[c])
+        # map literal l to the indices of the clauses containing it
+        self.occ = [[] for _ in range(2 * n_vars + 2)]
+        for i, k in enumerate(self.start):
+            for l in lits[k:k + self.size[i]]:
+                self.occ[l].append(i)
+        self.best = None
+
+
+    def run(self, phases, max_flips):
+        """
+        Search from the assignment given by phases (1 for true, -1 for false, other values for a
+        random one) for at most max_flips flips. Return True if a model is found. The assignment
+        falsifying the fewest clauses is left in best, 1 for true and 0 for false.
+        """
+        lits, fixed, rng = self.lits, self.fixed, self.rng
+        n = len(self.start)
+        self.vals = vals = array('b', [0]) * (self.n_vars + 1)
+        for x in range(1, self.n_vars + 1):
+            if fixed[x] != UNASSIGNED:
+                vals[x] = fixed[x]
+            elif phases[x] == 1 or phases[x] == -1:
+                vals[x] = phases[x] > 0
+            else:
+                vals[x] = rng.getrandbits(1)
+        self.n_true = array('i', [0]) * n
+        self.crit = array('i', [0]) * n
+        self.breaks = array('i', [0]) * (self.n_vars + 1)
+        self.unsat = array('i') # the falsified clauses
+        self.where = array('i', [-1]) * n # position of each clause in unsat, or -1
+        for i in range(n):
+            k = self.start[i]
+            for l in lits[k:k + self.size[i]]:
+                if vals[l >> 1] == 1 - (l & 1):
+                    self.n_true[i] += 1
+                    self.crit[i] ^= l >> 1
+            if self.n_true[i] == 0:
+                self.where[i] = len(self.unsat)
+                self.unsat.append(i)
+            elif self.n_true[i] == 1:
+                self.breaks[self.crit[i]] += 1
+
+        self.best = array('b', vals)
+        best_unsat = len(self.unsat)
+        flips = 0
+        while len(self.unsat) > 0 and flips < max_flips:
+            self.flip(self.pick(self.unsat[rng.randrange(len(self.unsat))]))
+            flips += 1
+            if len(self.unsat) < best_unsat:
+                best_unsat = len(self.unsat)
+                self.best = array('b', vals)
+        self.n_flips += flips
+        return best_unsat == 0
+
+
+    def pick(self, i):
+        """Choose the variable to flip in the falsified clause i"""
+        k, fixed, breaks = self.start[i], self.fixed, self.breaks
+        xs = [l >> 1 for l in self.lits[k:k + self.size[i]] if fixed[l >> 1] == UNASSIGNED]
+        ws = [WEIGHTS[min(breaks[x], MAX_BREAK)] for x in xs]
+        r = self.rng.random() * sum(ws)
+        for x, w in zip(xs, ws):
+            r -= w
+            if r < 0:
+                return x
+        return xs[-1]
+
+
+    def flip(self, x):
+        """Negate the value of x, and update the clauses containing it"""
+        vals, n_true, crit, breaks = self.vals, self.n_true, self.crit, self.breaks
+        vals[x] ^= 1
+        now_true = 2 * x + 1 - vals[x]
+        for i in self.occ[now_true]:
+            n_true[i] += 1
+            if n_true[i] == 1: # satisfied again, by x alone
+                self.remove(i)
+                breaks[x] += 1
+            elif n_true[i] == 2: # crit[i] is no longer critical
+                breaks[crit[i]] -= 1
+            crit[i] ^= x
+        for i in self.occ[now_true ^ 1]:
+            n_true[i] -= 1
+            crit[i] ^= x
+            if n_true[i] == 0: # falsified
+                self.where[i] = len(self.unsat)
+                self.unsat.append(i)
+                breaks[x] -= 1
+            elif n_true[i] == 1: # the last true literal becomes critical
+                breaks[crit[i]] += 1
+
+
+    def remove(self, i):
+        """Take clause i out of unsat, moving the last one in its place"""
+        unsat, where = self.unsat, self.where
+        last = unsat.pop()
+        if last != i:
+            unsat[where[i]] = last
+            where[last] = where[i]
+        where[i] = -1
@@ -0,0 +1,212 @@
+# cython: language_level=3
+# cython: profile=False
+# cython: cdivision=True
+
+from cpython cimport array
+import array
+from libc.string cimport memcpy
+from components cimport ClauseDB, HEADER, UNASSIGNED, var
+
+SLS_FLIPS = 30000 # flips allowed to each local search
+
+cdef:
+    double CB = 2.38 # weight of the break count in probSAT's polynomial distribution, tuned for random 3-SAT
+    double EPS = 1.0
+    double WEIGHTS[MAX_BREAK + 1]
+
+for b in range(MAX_BREAK + 1):
+    WEIGHTS[b] = (EPS + b) ** -CB
+
+
+cdef class SLS:
+    """
+    probSAT local search over clauses of a ClauseDB. From a full assignment, it repeatedly
+    flips a variable of a random falsified clause, picked with a probability that decreases
+    with its break count: the number of clauses that the flip would falsify.
+    Break counts are kept up to date incrementally, as each clause records how many of its
+    literals are true and the xor of their variables, which is the critical variable when
+    there is only one. Variables assigned in fixed (an array of values by variable, like
+    Model.vals) are never flipped, and the clauses they satisfy or falsify are left out.
+    Random numbers come from a xorshift generator seeded by rng.
+    """
+
+    def __init__(self, int n_vars, ClauseDB db, cs, array.array fixed, rng):
+        cdef:
+            int* lits = db.lits.data.as_ints
+            signed char* f = fixed.data.as_schars
+            int c, i, k, l, n
+            bint satisfied, free
+        self.n_vars = n_vars
+        self.lits = db.lits
+        self.fixed = fixed
+        self.state = rng.getrandbits(64) | 1
+        self.n_flips = 0
+        # the clauses, by the offset of their first literal in lits
+        self.start = array.array('i')
+        self.size = array.array('i')
+        for c in cs:
+            satisfied = False
+            free = False
+            for k in range(c + HEADER, c + HEADER + lits[c]):
+                if f[var(lits[k])] == UNASSIGNED:
+                    free = True
+                elif f[var(lits[k])] == 1 - (lits[k] & 1):
+                    satisfied = True
+                    break
+            if free and not satisfied:
+                self.start.append(c + HEADER)
+                self.size.append(lits[c])
+        # the clauses containing literal l are occ[first[l]:first[l + 1]]
+        n = len(self.start)
+        self.first = array.array('i', [0]) * (2 * n_vars + 3)
+        cdef int* first = self.first.data.as_ints
+        for i in range(n):
+            for k in range(self.start.data.as_ints[i], self.start.data.as_ints[i] + self.size.data.as_ints[i]):
+                first[lits[k] + 1] += 1
+        for l in range(2 * n_vars + 2):
+            first[l + 1] += first[l]
+        self.occ = array.array('i', [0]) * first[2 * n_vars + 2]
+        cdef array.array fill = array.array('i', self.first)
+        for i in range(n):
+            for k in range(self.start.data.as_ints[i], self.start.data.as_ints[i] + self.size.data.as_ints[i]):
+                self.occ.data.as_ints[fill.data.as_ints[lits[k]]] = i
+                fill.data.as_ints[lits[k]] += 1
+        self.best = None
+
+
+    def run(self, phases, long max_flips):
+        """
+        Search from the assignment given by phases (1 for true, -1 for false, other values for a
+        random one) for at most max_flips flips. Return True if a model is found. The assignment
+        falsifying the fewest clauses is left in best, 1 for true and 0 for false.
+        """
+        cdef:
+            int n = len(self.start)
+            int x, p, i, k, l
+            int* lits = self.lits.data.as_ints
+            signed char* fixed = self.fixed.data.as_schars
+            signed char* vals
+            bint found
+        self.vals = array.array('b', [0]) * (self.n_vars + 1)
+        vals = self.vals.data.as_schars
+        for x in range(1, self.n_vars + 1):
+            p = phases[x]
+            if fixed[x] != UNASSIGNED:
+                vals[x] = fixed[x]
+            elif p == 1 or p == -1:
+                vals[x] = p > 0
+            else:
+                vals[x] = self.random() & 1
+        self.n_true = array.array('i', [0]) * n
+        self.crit = array.array('i', [0]) * n
+        self.breaks = array.array('i', [0]) * (self.n_vars + 1)
+        self.unsat = array.array('i', [0]) * n # the falsified clauses are unsat[:n_unsat]
+        self.where = array.array('i', [-1]) * n # position of each clause in unsat, or -1
+        self.n_unsat = 0
+        for i in range(n):
+            for k in range(self.start.data.as_ints[i], self.start.data.as_ints[i] + self.size.data.as_ints[i]):
+                l = lits[k]
+                if vals[var(l)] == 1 - (l & 1):
+                    self.n_true.data.as_ints[i] += 1
+                    self.crit.data.as_ints[i] ^= var(l)
+            if self.n_true.data.as_ints[i] == 0:
+                self.where.data.as_ints[i] = self.n_unsat
+                self.unsat.data.as_ints[self.n_unsat] = i
+                self.n_unsat += 1
+            elif self.n_true.data.as_ints[i] == 1:
+                self.breaks.data.as_ints[self.crit.data.as_ints[i]] += 1
+
+        self.best = array.array('b', self.vals)
+        with nogil:
+            found = self.search(max_flips)
+        return found
+
+
+    cdef bint search(self, long max_flips) noexcept nogil:
+        """Flip until no clause is falsified or after max_flips flips, keeping the best assignment"""
+        cdef:
+            int best_unsat = self.n_unsat
+            long flips = 0
+        while self.n_unsat > 0 and flips < max_flips:
+            self.flip(self.pick(self.unsat.data.as_ints[self.random() % self.n_unsat]))
+            flips += 1
+            if self.n_unsat < best_unsat:
+                best_unsat = self.n_unsat
+                memcpy(self.best.data.as_schars, self.vals.data.as_schars, self.n_vars + 1)
+        self.n_flips += flips
+        return best_unsat == 0
+
+
+    cdef unsigned long long random(self) noexcept nogil:
+        """xorshift64*"""
+        self.state ^= self.state >> 12
+        self.state ^= self.state << 25
+        self.state ^= self.state >> 27
+        return self.state * 2685821657736338717ULL
+
+
+    cdef int pick(self, int i) noexcept nogil:
+        """Choose the variable to flip in the falsified clause i"""
+        cdef:
+            int* lits = self.lits.data.as_ints
+            int* breaks = self.breaks.data.as_ints
+            signed char* fixed = self.fixed.data.as_schars
+            int k0 = self.start.data.as_ints[i]
+            int k1 = k0 + self.size.data.as_ints[i]
+            int k, x
+            int last = 0
+            double total = 0
+            double r
+        for k in range(k0, k1):
+            x = var(lits[k])
+            if fixed[x] == UNASSIGNED:
+                total += WEIGHTS[min(breaks[x], <int> MAX_BREAK)]
+        r = (self.random() >> 11) * (1.0 / 9007199254740992.0) * total
+        for k in range(k0, k1):
+            x = var(lits[k])
+            if fixed[x] == UNASSIGNED:
+                last = x
+                r -= WEIGHTS[min(breaks[x], <int> MAX_BREAK)]
+                if r < 0:
+                    return x
+        return last
+
+
+    cdef void flip(self, int x) noexcept nogil:
+        """Negate the value of x, and update the clauses containing it"""
+        cdef:
+            signed char* vals = self.vals.data.as_schars
+            int* n_true = self.n_true.data.as_ints
+            int* crit = self.crit.data.as_ints
+            int* breaks = self.breaks.data.as_ints
+            int* occ = self.occ.data.as_ints
+            int* first = self.first.data.as_ints
+            int* unsat = self.unsat.data.as_ints
+            int* where = self.where.data.as_ints
+            int now_true, j, i, last
+        vals[x] ^= 1
+        now_true = 2 * x + 1 - vals[x]
+        for j in range(first[now_true], first[now_true + 1]):
+            i = occ[j]
+            n_true[i] += 1
+            if n_true[i] == 1: # satisfied again, by x alone
+                self.n_unsat -= 1
+                last = unsat[self.n_unsat]
+                unsat[where[i]] = last
+                where[last] = where[i]
+                where[i] = -1
+                breaks[x] += 1
+            elif n_true[i] == 2: # crit[i] is no longer critical
+                breaks[crit[i]] -= 1
+            crit[i] ^= x
+        for j in range(first[now_true ^ 1], first[(now_true ^ 1) + 1]):
+            i = occ[j]
+            n_true[i] -= 1
+            crit[i] ^= x
+            if n_true[i] == 0: # falsified
+                where[i] = self.n_unsat
+                unsat[self.n_unsat] = i
+                self.n_unsat += 1
+                breaks[x] -= 1
+            elif n_true[i] == 1: # the last true literal becomes critical
+                breaks[crit[i]] += 1
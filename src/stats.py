@@ -0,0 +1,97 @@
+import json
+import sys
+import time
+
+PHASES = ['preprocess', 'unit_prop', 'analyze', 'forget', 'simplify', 'local_search']
+MEMORY = ['clauses', 'watches', 'trail']
+
+
+class Stats:
+    """
+    Snapshot of the cumulative statistics of a solver.
+    Times are in seconds; the time spent in unit_prop during preprocessing counts
+    towards both preprocess and unit_prop. Memory is in bytes, the peaks being
+    sampled at each reduction of the learned clauses.
+    """
+
+    def __init__(self, cnf):
+        self.elapsed = time.perf_counter() - cnf.start_time
+        self.decisions = cnf.n_decisions
+        self.propagations = cnf.n_propagations
+        self.conflicts = cnf.n_conflicts
+        self.restarts = cnf.n_restarts
+        self.reused_levels = cnf.n_reused
+        self.learned = cnf.n_learned
+        self.forgotten = cnf.n_forgotten
+        self.kept = len(cnf.learned)
+        self.minimized = cnf.n_minimized
+        self.avg_learned_len = cnf.learned_lits / cnf.n_learned if cnf.n_learned > 0 else 0.0
+        self.preprocess_iterations = cnf.n_iter
+        self.failed_literals = cnf.n_failed
+        self.necessary = cnf.n_necessary
+        self.equivalences = len(cnf.equivalences)
+        self.eliminated = len(cnf.eliminated)
+        self.subsumed = cnf.n_subsumed
+        self.strengthened = cnf.n_strengthened
+        self.local_searches = cnf.n_local_searches
+        self.flips = cnf.n_flips
+        self.time = dict(zip(PHASES, cnf.phase_time))
+        self.memory = cnf.memory()
+        self.peak_memory = dict(cnf.peak_memory)
+        self.collections = cnf.n_collections
+
+    def as_dict(self):
+        return dict(vars(self), time=dict(self.time), memory=dict(self.memory), peak_memory=dict(self.peak_memory))
+
+    def __str__(self):
+        res = ["Statistics"]
+        res.append("Time: %.3f s" % self.elapsed)
+        res.append("Pre-processing iterations: %d" % self.preprocess_iterations)
+        res.append("Probing: %d failed literals, %d necessary assignments, %d equivalences"
+                   % (self.failed_literals, self.necessary, self.equivalences))
+        res.append("Simplification: %d eliminated variables, %d subsumed and %d strengthened clauses"
+                   % (self.eliminated, self.subsumed, self.strengthened))
+        res.append("Decisions: %d" % self.decisions)
+        res.append("Propagations: %d" % self.propagations)
+        res.append("Conflicts: %d" % self.conflicts)
+        res.append("Restarts: %d (%d decision levels reused)" % (self.restarts, self.reused_levels))
+        res.append("Learned clauses: %d (%d forgotten, %d kept), %.1f literals on average"
+                   % (self.learned, self.forgotten, self.kept, self.avg_learned_len))
+        res.append("Literals removed by minimization: %d" % self.minimized)
+        res.append("Local search: %d runs, %d flips" % (self.local_searches, self.flips))
+        for phase in PHASES:
+            res.append("Time in %s: %.3f s" % (phase, self.time[phase]))
+        for k in MEMORY:
+            res.append("Memory for %s: %d KiB (peak %d KiB)" % (k, self.memory[k] // 1024, self.peak_memory[k] // 1024))
+        res.append("Clause arena compactions: %d" % self.collections)
+        return "\n".join(res)
+
+
+class Progress:
+    """
+    Periodic report of the statistics of a running solver, at most every interval
+    seconds, as text lines on stderr or as JSON lines in a file.
+    """
+
+    def __init__(self, interval=1.0, json_file=None):
+        self.interval = interval
+        self.out = sys.stderr if json_file is None else open(json_file, 'w')
+        self.json = json_file is not None
+        self.last = time.perf_counter()
+
+    def __call__(self, cnf, force=False):
+        now = time.perf_counter()
+        if not force and now - self.last < self.interval:
+            return
+        self.last = now
+        s = cnf.stats
+        if self.json:
+            self.out.write(json.dumps(s.as_dict()) + "\n")
+        else:
+            self.out.write("c {:8.1f}s  {:>10} decisions  {:>10} conflicts  {:>6} restarts  {:>8} learned  {:>8} kept\n".format(
+                s.elapsed, s.decisions, s.conflicts, s.restarts, s.learned, s.kept))
+        self.out.flush()
+
+    def close(self):
+        if self.json:
+            self.out.close()
@@ -0,0 +1,75 @@
+import os
+import sys
+from random import Random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from cache import ENTRY_OVERHEAD, Formula, ResultCache
+from cdcl import CDCL
+
+
+def random_formula(rng, n):
+    return [[rng.choice((1, -1)) * rng.randint(1, n) for _ in range(3)] for _ in range(4 * n)]
+
+
+def renamed(rng, nss, n):
+    """nss with its variables permuted, its clauses and their literals shuffled"""
+    xs = list(range(1, n + 1))
+    rng.shuffle(xs)
+    res = [[n // abs(n) * xs[abs(n) - 1] for n in ns] for ns in nss]
+    for ns in res:
+        rng.shuffle(ns)
+    rng.shuffle(res)
+    return res
+
+
+def solve(nss, n):
+    s = CDCL(n, nss, solve=False)
+    return s.solve(), [int(k) for k in str(s.m).split()]
+
+
+def test_canonical_form():
+    rng = Random(0)
+    nss = random_formula(rng, 20)
+    other = renamed(rng, nss, 20)
+    # the order of clauses and literals, duplicates and tautologies never matter
+    assert Formula(nss).digest == Formula(list(reversed(nss)) + [nss[0][::-1], [1, -1]]).digest
+    assert Formula(nss).digest != Formula(other).digest
+    assert Formula(nss, rename=True).digest == Formula(other, rename=True).digest
+    assert Formula(nss, rename=True).digest != Formula(nss[1:], rename=True).digest
+
+
+def test_hits_across_renamings(tmp_path):
+    rng = Random(1)
+    cache = ResultCache(str(tmp_path / 'cache.db'), rename=True)
+    for _ in range(10):
+        nss = random_formula(rng, 20)
+        f = cache.formula(nss)
+        assert cache.get(f) is None
+        sat, model = solve(nss, 20)
+        cache.put(f, sat, model if sat else None)
+        other = renamed(rng, nss, 20)
+        g = cache.formula(other)
+        hit = cache.get(g)
+        assert hit is not None and hit[0] == sat
+        if sat: # the model comes back in the variables of the renamed formula
+            assert g.satisfied_by(hit[1])
+    assert (cache.n_hits, cache.n_misses) == (10, 10)
+    cache.close()
+    # the store outlives the process that wrote it
+    assert ResultCache(str(tmp_path / 'cache.db'), rename=True).get(g) is not None
+
+
+def test_wrong_models_and_eviction(tmp_path):
+    # room for the models of the last three formulas, 1 2 3, 1 2 3 4 and 1 2 3 4 5
+    cache = ResultCache(str(tmp_path / 'cache.db'), max_bytes=3 * ENTRY_OVERHEAD + 21)
+    f = cache.formula([[1, 2], [-1]])
+    cache.put(f, True, [1, -2]) # not a model
+    assert cache.get(f) is None
+    assert cache.get(f) is None # and dropped
+    fs = [cache.formula([[x] for x in range(1, k + 1)]) for k in range(1, 6)]
+    for k, g in enumerate(fs, 1):
+        cache.put(g, True, list(range(1, k + 1)))
+        assert cache.get(g) == (True, list(range(1, k + 1)))
+    # the least recently used entries make room for the others
+    assert [cache.get(g) is not None for g in fs] == [False, False, True, True, True]
@@ -0,0 +1,104 @@
+import os
+import sys
+import threading
+import time
+from random import Random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import decompose
+from cdcl import CDCL
+from decompose import Decomposition, components, propagate_units, solve_components
+
+
+def pigeonhole(holes, offset=0):
+    """The unsat clauses putting holes + 1 pigeons in holes holes, over variables past offset"""
+    p = lambda i, j: offset + i * holes + j + 1
+    nss = [[p(i, j) for j in range(holes)] for i in range(holes + 1)]
+    nss += [[-p(i, j), -p(k, j)] for j in range(holes) for i in range(holes + 1) for k in range(i)]
+    return nss
+
+
+def random_formula(rng, n, offset):
+    return [[rng.choice((1, -1)) * (offset + rng.randint(1, n)) for _ in range(3)] for _ in range(rng.randint(1, 5 * n))]
+
+
+def check_model(nss, model):
+    assert len(model) == len({abs(n) for n in model})
+    true = set(model)
+    assert all(any(n in true for n in ns) for ns in nss)
+
+
+def test_propagate_units_and_components():
+    facts, rest = propagate_units([[1], [-1, 2], [-2, 3, 4], [-3], [5, 6]])
+    assert facts == {1, 2, -3, 4}
+    assert rest == [[5, 6]]
+    assert propagate_units([[1], [-1]]) == (None, None)
+    assert propagate_units([[]]) == (None, None)
+    parts = components([[1, 2], [3], [2, -4], [5, -3]])
+    assert sorted(parts) == [[[1, 2], [2, -4]], [[3], [5, -3]]]
+
+
+def test_same_answer_as_a_single_solver():
+    rng = Random(0)
+    for _ in range(50):
+        nss = []
+        for k in range(rng.randint(1, 4)):
+            nss += random_formula(rng, 8, 8 * k)
+        nss.append([rng.randint(1, 32)])
+        sat, model, _ = solve_components(nss)
+        assert sat == CDCL(32, nss, solve=False).solve()
+        if sat:
+            check_model(nss, model)
+            assert {abs(n) for n in model} == {abs(n) for ns in nss for n in ns}
+
+
+def test_variables_only_in_satisfied_clauses_get_a_value():
+    sat, model, n_components = solve_components([[1], [1, 2], [3, -3], [4, 5]])
+    assert sat
+    assert sorted(map(abs, model)) == [1, 2, 3, 4, 5]
+    assert n_components == 1
+
+
+def test_first_unsat_component_decides(monkeypatch):
+    monkeypatch.setattr(decompose, 'PARALLEL_CLAUSES', 20)
+    nss = pigeonhole(3) + pigeonhole(3, 12) + [[25, 26], [-25, 27]]
+    for jobs in (1, 2):
+        sat, model, n_components = solve_components(nss, jobs)
+        assert sat is False and n_components == 3
+
+
+def test_parallel_components(monkeypatch):
+    monkeypatch.setattr(decompose, 'PARALLEL_CLAUSES', 5)
+    rng = Random(1)
+    nss = []
+    for k in range(4):
+        nss += random_formula(rng, 6, 6 * k)
+    sat, model, _ = solve_components(nss, 2)
+    assert sat == CDCL(24, nss, solve=False).solve()
+    if sat:
+        check_model(nss, model)
+
+
+def test_limits_bound_the_whole_search():
+    nss = [ns for k in range(6) for ns in pigeonhole(9, 90 * k)]
+    d = Decomposition(config=dict(simplify=True))
+    assert d.solve(nss, max_conflicts=300) == (None, None)
+    assert d.n_components == 6
+    assert d.n_conflicts <= 300 + d.n_components
+    start = time.perf_counter()
+    assert d.solve(nss, max_time=0.2) == (None, None)
+    assert time.perf_counter() - start < 1.5
+
+
+def test_interrupt():
+    nss = [ns for k in range(6) for ns in pigeonhole(9, 90 * k)]
+    d = Decomposition()
+    timer = threading.Timer(0.2, d.interrupt)
+    timer.start()
+    start = time.perf_counter()
+    assert d.solve(nss) == (None, None)
+    assert time.perf_counter() - start < 2
+    timer.join()
+    # the interrupt only stops that call
+    assert d.solve(pigeonhole(2)) == (False, None)
@@ -0,0 +1,61 @@
+import bz2
+import gzip
+import lzma
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from dimacs import DimacsReader
+
+TEXT = b"""c a comment before the header
+p cnf 5 4
+1 -2
+ 3 0 -4 0
+c a comment between clauses
+5 -1 0 2
+3
+"""
+CLAUSES = [[1, -2, 3], [-4], [5, -1], [2, 3]] # the last one without its 0
+
+
+def read(path, **kwargs):
+    return [list(c) for c in DimacsReader(str(path), **kwargs)]
+
+
+def test_clauses_spanning_and_sharing_lines(tmp_path):
+    path = tmp_path / 'f.cnf'
+    path.write_bytes(TEXT)
+    reader = DimacsReader(str(path))
+    assert (reader.n_vars, reader.n_clauses) == (5, 4)
+    assert [list(c) for c in reader] == CLAUSES
+    # blocks end on line boundaries, so a clause can span any number of them
+    for block_size in (1, 2, 5, 16):
+        assert read(path, block_size=block_size) == CLAUSES
+
+
+@pytest.mark.parametrize('opener', [gzip.open, bz2.open, lzma.open])
+def test_compressed(tmp_path, opener):
+    path = tmp_path / 'f.cnf.z' # recognized by the content, not the name
+    with opener(path, 'wb') as f:
+        f.write(TEXT)
+    assert read(path) == CLAUSES
+    assert read(path, block_size=3) == CLAUSES
+
+
+def test_end_marker_and_variables_beyond_the_header(tmp_path):
+    path = tmp_path / 'f.cnf'
+    path.write_bytes(b"p cnf 2 2\n1 -2 0\n-7 0\n%\n0\n")
+    reader = DimacsReader(str(path))
+    assert [list(c) for c in reader] == [[1, -2], [-7]]
+    assert reader.n_vars == 7
+
+
+@pytest.mark.parametrize('text', [b"", b"c no header\n", b"1 2 0\np cnf 2 1\n"])
+def test_missing_or_late_header(tmp_path, text):
+    path = tmp_path / 'f.cnf'
+    path.write_bytes(text)
+    with pytest.raises(ValueError):
+        DimacsReader(str(path))
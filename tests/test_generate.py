@@ -0,0 +1,44 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from cdcl import CDCL
+from dimacs import DimacsReader
+from generate import generate_all, make_pair, sample_clauses
+
+
+def test_sampled_clauses():
+    rng = np.random.default_rng(0)
+    for n in (1, 3, 40):
+        for c in sample_clauses(rng, n, 500):
+            assert 1 <= len(c) <= n
+            assert len({abs(k) for k in c}) == len(c)
+            assert all(1 <= abs(k) <= n for k in c)
+
+
+def test_pairs_differ_by_one_literal():
+    rng = np.random.default_rng(1)
+    for n in (5, 10, 20):
+        sat, unsat = make_pair(rng, n)
+        assert sat[:-1] == unsat[:-1]
+        assert sat[-1] == [-unsat[-1][0]] + unsat[-1][1:]
+        assert CDCL(n, sat, solve=False).solve() is True
+        assert CDCL(n, unsat, solve=False).solve() is False
+        assert CDCL(n, unsat[:-1], solve=False).solve() is True
+
+
+def test_labels_of_the_files(tmp_path):
+    names = list(generate_all(str(tmp_path), 4, 10, 20, seed=3))
+    for sat_name, unsat_name in names:
+        assert sat_name.endswith("_sat=1.dimacs") and unsat_name.endswith("_sat=0.dimacs")
+        for d, name, expected in (('sat', sat_name, True), ('unsat', unsat_name, False)):
+            reader = DimacsReader(str(tmp_path / d / name))
+            assert CDCL(reader.n_vars, reader, solve=False).solve() is expected
+    # a pair only depends on the seed and its index
+    again = list(generate_all(str(tmp_path / 'again'), 2, 10, 20, seed=3))
+    assert again == names[:2]
+    for d, name in (('sat', names[1][0]), ('unsat', names[1][1])):
+        assert (tmp_path / d / name).read_bytes() == (tmp_path / 'again' / d / name).read_bytes()
@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from cdcl import CDCL
+
+# unsat, but not refuted before the search: the conflict that proves it happens at the root level
+ROOT_UNSAT = [[2, 3, -1], [1, 3, 2], [1, 2, 3], [-1, 2, -3], [-2, 1, -3], [3, 1, 2], [-3, 2, 1], [-3, -1, -2],
+              [2, -3, 1], [3, -2, -1], [1, 2, 3], [1, -3, -2], [-1, -2, 3], [3, -2, 1]]
+
+
+def test_solve_again_after_unsat():
+    s = CDCL(3, ROOT_UNSAT, solve=False)
+    assert s.solve() is False
+    assert s.solve() is False
+    assert s.solve(assumptions=[1]) is False
+    assert s.core == []
+    assert s.solve(assumptions=[-2, 3]) is False
+    assert s.core == []
@@ -0,0 +1,82 @@
+import os
+import sys
+import threading
+import time
+from random import Random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from cdcl import CDCL
+
+
+def pigeonhole(holes):
+    """Clauses putting holes + 1 pigeons in holes holes, one per hole: unsat"""
+    x = lambda p, h: p * holes + h + 1
+    nss = [[x(p, h) for h in range(holes)] for p in range(holes + 1)]
+    for h in range(holes):
+        for p in range(holes + 1):
+            for q in range(p):
+                nss.append([-x(p, h), -x(q, h)])
+    return (holes + 1) * holes, nss
+
+
+def random_formula(n, ratio, seed):
+    rng = Random(seed)
+    return [[rng.choice((1, -1)) * rng.randint(1, n) for _ in range(3)] for _ in range(int(ratio * n))]
+
+
+def test_conflict_and_propagation_limits():
+    n, nss = pigeonhole(7)
+    s = CDCL(n, nss, solve=False)
+    assert s.solve(max_conflicts=100) is None
+    assert s.unknown
+    assert s.n_conflicts <= 100 + 1
+    propagations = s.n_propagations
+    assert s.solve(max_propagations=1000) is None
+    assert s.n_propagations - propagations <= 1000 + n
+    # the limits only apply to the call that gives them
+    assert s.solve() is False
+
+
+def test_time_limit():
+    n, nss = pigeonhole(9)
+    s = CDCL(n, nss, solve=False)
+    t = time.time()
+    assert s.solve(max_time=0.2) is None
+    assert time.time() - t < 1.5
+
+
+def test_interrupt():
+    n, nss = pigeonhole(9)
+    s = CDCL(n, nss, solve=False)
+    timer = threading.Timer(0.2, s.interrupt)
+    timer.start()
+    t = time.time()
+    assert s.solve() is None
+    assert time.time() - t < 1.5
+    timer.join()
+    # the interrupt is consumed by the call it stopped
+    n, nss = pigeonhole(3)
+    s = CDCL(n, nss, solve=False)
+    s.interrupt()
+    assert s.solve() is None
+    assert s.solve() is False
+
+
+def test_limits_stop_preprocessing():
+    nss = random_formula(200, 3.0, 0)
+    # an interrupt before solve stops probing before any propagation
+    s = CDCL(200, nss, solve=False, simplify=False)
+    s.interrupt()
+    assert s.solve() is None
+    assert s.n_propagations == 0
+    assert s.solve() is True
+    # and the simplification before its first subsumption
+    subsumed = [ns + [201] for ns in nss[:10]]
+    s = CDCL(201, nss + subsumed, solve=False, simplify=True)
+    s.interrupt()
+    assert s.solve() is None
+    assert s.n_subsumed == 0
+    s = CDCL(201, nss + subsumed, solve=False, simplify=True)
+    assert s.solve() is True
+    assert s.n_subsumed >= 10
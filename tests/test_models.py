@@ -0,0 +1,50 @@
+import os
+import sys
+from itertools import product
+from random import Random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from cdcl import CDCL
+
+
+def brute_force(n_vars, nss, xs):
+    """The distinct restrictions to xs of the models of nss"""
+    res = set()
+    for bits in product((False, True), repeat=n_vars):
+        if all(any(bits[abs(n) - 1] == (n > 0) for n in ns) for ns in nss):
+            res.add(tuple(x if bits[x - 1] else -x for x in xs))
+    return res
+
+
+def random_formula(rng):
+    n = rng.randint(1, 7)
+    nss = [[rng.choice((1, -1)) * rng.randint(1, n) for _ in range(rng.randint(1, 3))] for _ in range(rng.randint(0, 3 * n))]
+    return n, nss
+
+
+def test_models_match_brute_force():
+    rng = Random(0)
+    for _ in range(300):
+        n, nss = random_formula(rng)
+        projection = rng.sample(range(1, n + 1), rng.randint(1, n)) if rng.random() < 0.5 else None
+        s = CDCL(n, nss, solve=False, simplify=rng.random() < 0.5)
+        models = [tuple(model) for model in s.models(projection)]
+        assert len(models) == len(set(models))
+        assert set(models) == brute_force(n, nss, projection or range(1, n + 1))
+        assert not s.unknown
+
+
+def test_variables_in_no_clause_take_both_values():
+    assert sorted(CDCL(2, [[2]], solve=False).models(projection=[1, 2])) == [[-1, 2], [1, 2]]
+    assert len(list(CDCL(3, [[1, -1]], solve=False).models())) == 8
+
+
+def test_limit_and_assumptions():
+    rng = Random(1)
+    for _ in range(100):
+        n, nss = random_formula(rng)
+        expected = brute_force(n, nss + [[1]], range(1, n + 1))
+        models = list(CDCL(n, nss, solve=False).models(limit=3, assumptions=[1]))
+        assert len(models) == min(3, len(expected))
+        assert {tuple(model) for model in models} <= expected
@@ -0,0 +1,23 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from cdcl import CDCL
+
+
+def test_failed_literal_in_a_cycle():
+    # 1, 2 and 3 imply each other, so none is a root of the binary implication graph, and 1 fails
+    nss = [[-1, 2], [-2, 3], [-3, 1], [-1, -2, 4], [-1, -3, -4]]
+    s = CDCL(4, nss, solve=False)
+    assert s.solve() is True
+    assert s.n_failed == 1
+    assert {'-1', '-2', '-3'} <= set(str(s.m).split())
+
+
+def test_equivalences_of_a_cycle_are_found_once():
+    # no edge leaves the cycle of 1 and 2, so both their polarities are probed
+    nss = [[-1, 2], [-2, 1], [1, 3, 4], [-1, -3, 4]]
+    s = CDCL(4, nss, solve=False)
+    assert s.solve() is True
+    assert all({a >> 1, b >> 1} != {1, 2} for a, b in s.equivalences)
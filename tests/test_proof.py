@@ -0,0 +1,106 @@
+import os
+import sys
+from collections import Counter
+from random import Random
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from cdcl import CDCL
+from components import to_dimacs
+from proof import DRAT
+
+
+def pigeonhole(holes):
+    x = lambda p, h: p * holes + h + 1
+    nss = [[x(p, h) for h in range(holes)] for p in range(holes + 1)]
+    for h in range(holes):
+        for p in range(holes + 1):
+            for q in range(p):
+                nss.append([-x(p, h), -x(q, h)])
+    return (holes + 1) * holes, nss
+
+
+def random_unsat(rng):
+    while True:
+        n = rng.randint(5, 25)
+        nss = [[rng.choice((1, -1)) * rng.randint(1, n) for _ in range(3)] for _ in range(6 * n)]
+        if CDCL(n, nss, solve=False).solve() is False:
+            return n, nss
+
+
+def parse_text(data):
+    for line in data.decode().splitlines():
+        ns = line.split()
+        delete = ns[0] == 'd'
+        yield delete, [int(n) for n in ns[delete:-1]]
+
+
+def parse_binary(data):
+    i = 0
+    while i < len(data):
+        delete = data[i] == ord('d')
+        i += 1
+        ls = []
+        while data[i] != 0:
+            l = shift = 0
+            while True:
+                l |= (data[i] & 127) << shift
+                shift += 7
+                i += 1
+                if data[i - 1] < 128:
+                    break
+            ls.append(to_dimacs(l))
+        i += 1
+        yield delete, ls
+
+
+def implied(clauses, ns):
+    """Check that unit propagation on clauses and the negations of ns reaches a conflict"""
+    true = {-n for n in ns}
+    changed = True
+    while changed:
+        changed = False
+        for c in clauses:
+            if any(n in true for n in c):
+                continue
+            free = [n for n in c if -n not in true]
+            if len(free) == 0:
+                return True
+            if len(free) == 1:
+                true.add(free[0])
+                changed = True
+    return False
+
+
+def check_drat(nss, steps):
+    """Check every added clause by reverse unit propagation, and that the empty clause is added"""
+    clauses = Counter(tuple(sorted(set(ns))) for ns in nss)
+    for delete, ns in steps:
+        c = tuple(sorted(set(ns)))
+        if delete:
+            clauses[c] -= 1
+            if clauses[c] <= 0:
+                del clauses[c]
+            continue
+        assert implied(list(clauses), c), "{} is not implied".format(c)
+        if len(c) == 0:
+            return True
+        clauses[c] += 1
+    return False
+
+
+@pytest.mark.parametrize('binary', [False, True])
+@pytest.mark.parametrize('simplify', [False, True])
+def test_proofs_of_unsatisfiability(tmp_path, binary, simplify):
+    rng = Random(0)
+    for formula in [pigeonhole(4)] + [random_unsat(rng) for _ in range(5)]:
+        n, nss = formula
+        path = str(tmp_path / 'proof')
+        s = CDCL(n, nss, solve=False, simplify=simplify, proof=DRAT(path, binary))
+        assert s.solve() is False
+        s.proof.close()
+        with open(path, 'rb') as f:
+            data = f.read()
+        assert check_drat(nss, (parse_binary if binary else parse_text)(data))
@@ -0,0 +1,70 @@
+import os
+import sys
+from random import Random
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from cdcl import CDCL
+from restarts import POLICIES, Geometric, Glucose, Luby, make_policy
+
+
+def intervals(policy, count):
+    """The numbers of conflicts between the first count restarts of policy, at glue 2"""
+    res = []
+    for _ in range(count):
+        n = 0
+        while not policy.should_restart():
+            policy.after_conflict(2, 10)
+            n += 1
+        res.append(n)
+        policy.on_restart()
+    return res
+
+
+def test_luby_and_geometric():
+    assert intervals(Luby(), 15) == [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
+    assert intervals(Luby(3), 4) == [3, 3, 6, 3]
+    assert intervals(Geometric(100, 1.5), 4) == [100, 150, 225, 338]
+    assert isinstance(make_policy('geometric', 2), Geometric)
+    with pytest.raises(ValueError):
+        make_policy('never')
+
+
+def test_glucose_restarts_when_the_glue_rises():
+    policy = Glucose(min_conflicts=50)
+    for _ in range(1000):
+        policy.after_conflict(2, 10)
+        assert not policy.should_restart()
+    policy.on_restart()
+    n = 0
+    while not policy.should_restart():
+        policy.after_conflict(10, 10)
+        n += 1
+    assert n == 50
+
+
+def random_formula(rng, n):
+    return [[rng.choice((1, -1)) * rng.randint(1, n) for _ in range(3)] for _ in range(int(4.26 * n))]
+
+
+@pytest.mark.parametrize('restart', POLICIES)
+@pytest.mark.parametrize('reuse_trail', [False, True])
+def test_same_verdicts(restart, reuse_trail):
+    rng = Random(0)
+    restarts = reused = 0
+    for _ in range(10):
+        nss = random_formula(rng, 60)
+        sat = CDCL(60, nss, solve=False).solve()
+        # frequent restarts, as these formulas take few conflicts
+        policy = Glucose(margin=1, min_conflicts=5) if restart == 'glucose' else make_policy(restart, 0.1)
+        s = CDCL(60, nss, solve=False, restart=policy, reuse_trail=reuse_trail)
+        assert s.solve() == sat
+        if sat:
+            model = set(map(int, str(s.m).split()))
+            assert all(any(n in model for n in ns) for ns in nss)
+        restarts += s.stats.restarts
+        reused += s.stats.reused_levels
+    assert restarts > 0
+    assert (reused > 0) == reuse_trail
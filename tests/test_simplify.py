@@ -0,0 +1,66 @@
+import os
+import sys
+from itertools import product
+from random import Random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from cdcl import CDCL
+from components import from_dimacs
+from simplify import Simplifier
+
+
+class Assignment:
+    """The interface of a model that Simplifier.extend needs, over a dict of variable values"""
+
+    def __init__(self, values):
+        self.values = values
+
+    def __getitem__(self, l):
+        return self.values.get(l >> 1, False) != bool(l & 1)
+
+    def flip(self, x):
+        self.values[x] = not self.values.get(x, False)
+
+
+def satisfies(values, nss):
+    return all(any(values.get(abs(n), False) == (n > 0) for n in ns) for ns in nss)
+
+
+def random_formula(rng):
+    n = rng.randint(1, 8)
+    nss = [[rng.choice((1, -1)) * rng.randint(1, n) for _ in range(rng.randint(1, 4))] for _ in range(rng.randint(1, 4 * n))]
+    return n, [sorted(set(ns)) for ns in nss if not any(-k in ns for k in ns)]
+
+
+def test_extension_of_every_model():
+    rng = Random(0)
+    for _ in range(300):
+        n, nss = random_formula(rng)
+        frozen = set(rng.sample(range(1, n + 1), rng.randint(0, n)))
+        s = Simplifier(n, [[from_dimacs(k) for k in ns] for ns in nss], frozen)
+        ok = s.run()
+        assert frozen.isdisjoint(s.eliminated)
+        models = [dict(zip(range(1, n + 1), bits)) for bits in product((False, True), repeat=n)]
+        assert ok or not any(satisfies(values, nss) for values in models)
+        simplified = [[k >> 1 if k & 1 == 0 else -(k >> 1) for k in ls] for ls in s.clauses.values()]
+        for values in models:
+            if not satisfies(values, simplified):
+                continue
+            m = Assignment(dict(values))
+            Simplifier.extend(s.stack, m)
+            assert satisfies(m.values, nss)
+            # the variables that were not eliminated keep their values
+            assert all(m.values[x] == values[x] for x in range(1, n + 1) if x not in s.eliminated)
+
+
+def test_solver_models_and_verdicts():
+    rng = Random(1)
+    for _ in range(300):
+        n, nss = random_formula(rng)
+        sat = CDCL(n, nss, solve=False).solve()
+        s = CDCL(n, nss, solve=False, simplify=True)
+        assert s.solve() == sat
+        if sat:
+            model = {abs(k): k > 0 for k in map(int, str(s.m).split())}
+            assert satisfies(model, nss)